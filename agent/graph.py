@@ -9,9 +9,73 @@ from .nodes import (
 
 from .states import State
 
-from storage import LocalCheckpointSaver
+from storage import (
+    CheckpointCompactor,
+    DeferredCheckpointSaver,
+    LocalCheckpointSaver,
+    RetentionPolicy,
+    SessionCollector,
+    SqliteCheckpointSaver,
+)
+from config import get_settings
+
+from pathlib import Path
+
+settings = get_settings()
+
+
+def session_fields(checkpoint_ns: str, checkpoint: dict, metadata: dict) -> dict:
+    """Fields of a session kept in the checkpointer's thread index for each
+    stored checkpoint, searched by `/sessions` without reading checkpoints."""
+    fields = {}
+    if metadata.get("user_id") is not None:
+        fields["user_id"] = metadata["user_id"]
+
+    channel_values = checkpoint["channel_values"]
+    if not checkpoint_ns:
+        # e.g. "Execute->CheckHumanApproval" while waiting for an approval
+        fields["last_node"] = channel_values.get("previous_node")
+    if "approval_status" in channel_values:
+        fields["pending_approval"] = channel_values["approval_status"] == "pending"
+    return fields
+
+
+if settings.CHECKPOINT_BACKEND == "sqlite":
+    checkpointer = SqliteCheckpointSaver(
+        db_path=str(Path(settings.CHECKPOINT_DB_PATH) / "checkpoints.sqlite"),
+        session_fields=session_fields)
+elif settings.CHECKPOINT_BACKEND == "local":
+    checkpointer = LocalCheckpointSaver(
+        db_path=settings.CHECKPOINT_DB_PATH,
+        snapshot_interval=settings.CHECKPOINT_SNAPSHOT_INTERVAL,
+        record_format=settings.CHECKPOINT_RECORD_FORMAT,
+        compress_threshold=settings.CHECKPOINT_COMPRESS_THRESHOLD,
+        session_fields=session_fields)
+else:
+    raise ValueError(
+        f"Unsupported CHECKPOINT_BACKEND: `{settings.CHECKPOINT_BACKEND}`")
+
+# Started by the app when a retention policy / session TTL is configured
+compactor = CheckpointCompactor(
+    checkpointer,
+    RetentionPolicy(
+        keep_last=settings.CHECKPOINT_RETENTION_KEEP_LAST,
+        max_age=settings.CHECKPOINT_RETENTION_MAX_AGE or None),
+    interval=settings.CHECKPOINT_COMPACTION_INTERVAL)
+session_collector = SessionCollector(
+    checkpointer,
+    ttl=settings.SESSION_TTL,
+    interval=settings.SESSION_GC_INTERVAL,
+    batch_size=settings.SESSION_GC_BATCH_SIZE,
+    batch_pause=settings.SESSION_GC_BATCH_PAUSE)
 
-local_checkpointer = LocalCheckpointSaver(db_path="./dev_db")
+# The graph's own writes are queued and stored in the background, the
+# maintenance tasks above keep working on the store directly
+if settings.CHECKPOINT_DURABILITY == "deferred":
+    checkpointer = DeferredCheckpointSaver(checkpointer)
+elif settings.CHECKPOINT_DURABILITY != "sync":
+    raise ValueError(
+        f"Unsupported CHECKPOINT_DURABILITY: `{settings.CHECKPOINT_DURABILITY}`")
 
 # define the nodes
 workflow = StateGraph(State)
@@ -47,4 +111,4 @@ workflow.add_conditional_edges(
 workflow.add_edge("Response", END)
 workflow.add_edge("Execute", END)
 
-graph = workflow.compile(checkpointer=local_checkpointer)
+graph = workflow.compile(checkpointer=checkpointer)
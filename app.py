@@ -6,6 +6,9 @@ import uvicorn
 from loguru import logger
 import asyncio
 from config import get_settings
+from agent.graph import checkpointer, compactor, session_collector
+from storage import DeferredCheckpointSaver
+from utils.metrics import metrics
 from dotenv import load_dotenv
 load_dotenv(".env")
 settings = get_settings()
@@ -20,6 +23,15 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to start MCP client: {e}")
 
+    metrics.register("checkpoint_compaction", compactor.stats)
+    metrics.register("session_gc", session_collector.stats)
+    if isinstance(checkpointer, DeferredCheckpointSaver):
+        metrics.register("checkpoint_writer", checkpointer.stats)
+    if compactor.policy.enabled:
+        compactor.start()
+    if session_collector.enabled:
+        session_collector.start()
+
 
 async def shutdown_event():
     try:
@@ -31,6 +43,15 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"Error during MCP client shutdown: {e}")
 
+    await compactor.stop()
+    await session_collector.stop()
+    if isinstance(checkpointer, DeferredCheckpointSaver):
+        try:
+            await checkpointer.aflush()
+        except Exception as e:
+            logger.error(f"Failed to store deferred checkpoints: {e}")
+    checkpointer.close()
+
 
 def create_app():
 
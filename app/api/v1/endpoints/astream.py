@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from fastapi.responses import StreamingResponse
 
 from langchain_core.messages import AIMessage, HumanMessage
@@ -10,34 +10,134 @@ from agent.graph import graph
 from app.schemas.chat_request import ChatRequest
 from app.schemas.message import Message
 
+from storage import DeferredCheckpointSaver
+
+from typing import AsyncIterator
+import asyncio
 import uuid
-from utils import convert_to_sse_format
+from utils.metrics import metrics
+from utils.sse import COALESCED_EVENT_TYPES, ResponseStream, SSEEncoder, coalesce_events
+from config import get_settings
 from loguru import logger
 
 # Create a router instance
 router = APIRouter()
 
+settings = get_settings()
+
+# Shared by the responses, caches the encoded constant parts of the events
+sse_encoder = SSEEncoder(settings.SSE_JSON_BACKEND)
+
+# Node state that only matters within the run that produced it
+NON_RESUMABLE_NODE_KEYS = ("messages", "tool_outputs")
+
+# Nodes running a subgraph with its own checkpoints, stored under the node name
+SUBGRAPH_NAMESPACES = ("Plan", "Execute")
+
+
+def node_change_event(node: str | None) -> dict:
+    return {
+        "content": f"**[Transitioned to {node} Node]**",
+        "type": "node_change",
+        "node": node,
+        "previous_node": node
+    }
+
+
+async def flush_on_exit(events: AsyncIterator, thread_id: str) -> AsyncIterator:
+    """Yield the events of a graph run, then wait until the checkpoints it
+    queued are stored, whether the run ended, paused for approval or failed."""
+    try:
+        async for event in events:
+            yield event
+    finally:
+        if isinstance(graph.checkpointer, DeferredCheckpointSaver):
+            try:
+                # Shielded, a run cancelled on disconnect is still stored
+                await asyncio.shield(graph.checkpointer.aflush(thread_id))
+            except Exception as e:
+                logger.error(f"Failed to store checkpoints of thread `{thread_id}`: {e}")
+
+
+def record_run(status: str, thread_id: str, tokens: int) -> None:
+    """Count a finished run and, for a cancelled one, estimate the tokens it
+    did not generate from the average length of the completed runs."""
+    metrics.increment(f"astream_{status}_runs")
+    metrics.increment(f"astream_{status}_tokens", tokens)
+    if status == "cancelled":
+        completed_runs = metrics.counter("astream_completed_runs")
+        if completed_runs:
+            average = metrics.counter("astream_completed_tokens") / completed_runs
+            metrics.increment("astream_tokens_saved", max(average - tokens, 0))
+        logger.info(
+            f"Run of session `{thread_id}` cancelled after {tokens} streamed token(s)")
+
+
+async def cancel_on_disconnect(
+    events: AsyncIterator[dict],
+    http_request: Request,
+    thread_id: str,
+) -> AsyncIterator[dict]:
+    """Yield the events of a run until the client disconnects, then cancel it.
+
+    The connection is checked every `SSE_DISCONNECT_POLL_INTERVAL` seconds,
+    whether the run is producing events or not. Cancelling the run stops the
+    graph at its current step: the checkpoints of the steps already done
+    (and the writes of the tasks already finished) stay stored, so the next
+    request resumes from the last completed step. Streamed chunks (about
+    one token each) are counted in the `astream_*` metrics.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    next_event = None
+    status, tokens = "cancelled", 0
+    next_poll = loop.time() + settings.SSE_DISCONNECT_POLL_INTERVAL
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait(
+                {next_event}, timeout=max(next_poll - loop.time(), 0))
+            if loop.time() >= next_poll:
+                if await http_request.is_disconnected():
+                    logger.warning(f"Client of session `{thread_id}` disconnected")
+                    return
+                next_poll = loop.time() + settings.SSE_DISCONNECT_POLL_INTERVAL
+            if not done:
+                continue
+
+            task, next_event = next_event, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                status = "completed"
+                return
+            except Exception:
+                status = "failed"
+                raise
+            if event["type"] in COALESCED_EVENT_TYPES:
+                tokens += 1
+            yield event
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+        record_run(status, thread_id, tokens)
+        if next_event is not None:
+            await asyncio.wait({next_event})
+        else:
+            await iterator.aclose()
+
 
 # Define routes within the router
 @router.post("/astream")
 async def astream(
-    request: ChatRequest
+    request: ChatRequest,
+    http_request: Request
 ):
     logger.debug(f"Received request: {request}")
 
-    config = {
-        "configurable": {
-            "thread_id": request.session_id
-        }
-    }
-
-    all_checkpoints = list(
-        graph.checkpointer.list(
-            config,
-        )
-    )
-
-    last_checkpoint = all_checkpoints[-1] if all_checkpoints else None
+    # Newest checkpoint of the session, looked up without reading its history
+    last_checkpoint = await graph.checkpointer.aget_latest(request.session_id)
     last_state = {
         "previous_node": None,
         "current_plan": "",
@@ -48,21 +148,24 @@ async def astream(
 
         last_node = last_state.get("previous_node", None)
         last_node_state = {}
-        if last_node:
-            node_checkpoints = list(
-                graph.checkpointer.list(
-                    config,
-                    filter={"checkpoint_ns": last_node}
-                )
-            )
-            last_node_checkpoint = node_checkpoints[-1] if node_checkpoints else None
+        # e.g. "Execute->CheckHumanApproval" resumes from the "Execute" subgraph
+        namespace = next(
+            (name for name in SUBGRAPH_NAMESPACES if last_node and name in last_node),
+            None
+        )
+        if namespace:
+            last_node_checkpoint = await graph.checkpointer.aget_latest(
+                request.session_id, namespace)
 
             logger.info(
                 f"Last node: {last_node}, Last node checkpoint: {last_node_checkpoint}"
             )
 
             if last_node_checkpoint:
-                last_node_state = last_node_checkpoint.checkpoint["channel_values"]
+                last_node_state = {
+                    k: v for k, v in last_node_checkpoint.checkpoint["channel_values"].items()
+                    if k not in NON_RESUMABLE_NODE_KEYS
+                }
         last_state["metadata"] = {
             **last_state["metadata"],
             **{k: v for k, v in last_node_state.items() if k not in last_state}
@@ -78,6 +181,9 @@ async def astream(
                 messages.append(HumanMessage(content=msg.get("content", "")))
             elif msg.get("role") == "assistant":
                 messages.append(AIMessage(content=msg.get("content", "")))
+    else:
+        # The checkpointer persists the conversation, resume from it
+        messages = list(last_state.get("messages", []))
 
     # Add the current message if it's not already in the history
     current_message = HumanMessage(content=request.message)
@@ -97,51 +203,67 @@ async def astream(
 
     langfuse_handler = CallbackHandler()
 
-    async def wrapped_streaming_tokens():
-        full_response = ""
+    async def agent_events():
         current_node = None
 
         # Send initial status
-        yield convert_to_sse_format({
+        yield {
             "content": "Agent is thinking...",
             "type": "status",
             "node": "starting"
-        })
+        }
+
+        # The plan is sent again only when its content changes
+        plan_hash = None
+
+        def plan_event(current_plan: str) -> dict | None:
+            nonlocal plan_hash
+            if not current_plan or hash(current_plan) == plan_hash:
+                return None
+            plan_hash = hash(current_plan)
+            return {
+                "content": f"Plan updated: {current_plan}",
+                "type": "plan",
+                "node": "Plan"
+            }
+
+        # The state the run resumes from, the graph only streams what changes
+        previous_node = inputs.get("previous_node")
+        event = plan_event(inputs.get("current_plan", ""))
+        if event:
+            yield event
+        if previous_node is not None:
+            yield node_change_event(previous_node)
 
         # try:
-        previous_node = None
         # Stream response from graph similar to Streamlit app
-        async for subgraph, mode, state in graph.astream(
+        async for subgraph, mode, state in flush_on_exit(graph.astream(
             inputs,
             subgraphs=True,
-            stream_mode=["messages", "values", "custom"],
+            stream_mode=["messages", "updates", "custom"],
             config={
                 "configurable": {
                     "thread_id": thread_id
                 },
+                # Stored with the checkpoints, indexed for `/sessions`
+                "metadata": {"user_id": request.user_id},
                 "callbacks": [langfuse_handler]
             }
-        ):
-
-            if mode == "values":
-                # Handle state updates
-                current_plan = state.get("current_plan", "")
-                if current_plan:
-                    yield convert_to_sse_format({
-                        "content": f"Plan updated: {current_plan}",
-                        "type": "plan",
-                        "node": "Plan"
-                    })
-
-                # Update previous_node
-                if previous_node != state.get("previous_node", None):
-                    previous_node = state.get("previous_node", None)
-                    yield convert_to_sse_format({
-                        "content": f"**[Transitioned to {previous_node} Node]**",
-                        "type": "node_change",
-                        "node": previous_node,
-                        "previous_node": previous_node
-                    })
+        ), thread_id):
+
+            if mode == "updates":
+                # Handle the state updates of the nodes that just ran
+                for update in state.values():
+                    if not isinstance(update, dict):
+                        continue
+                    event = plan_event(update.get("current_plan", ""))
+                    if event:
+                        yield event
+
+                    # Update previous_node
+                    if "previous_node" in update and update["previous_node"] != previous_node:
+                        previous_node = update["previous_node"]
+                        yield node_change_event(previous_node)
                 # if previous_node:
                 #     current_node = previous_node
 
@@ -165,47 +287,42 @@ async def astream(
                     # Send message content
                     if msg.content:
                         if isinstance(msg, AIMessage):
-                            full_response += msg.content
-                            yield convert_to_sse_format({
+                            yield {
                                 "content": msg.content,
                                 "type": "message",
                                 "node": node,
-                                "previous_node": previous_node,
-                                "full_response": full_response
-                            })
+                                "previous_node": previous_node
+                            }
                         else:
-                            yield convert_to_sse_format({
+                            yield {
                                 "content": msg.content,
                                 "type": "thinking",
                                 "node": node,
                                 "previous_node": previous_node
-                            })
+                            }
             elif mode == "custom":
                 msg = state
                 if msg.content:
                     if isinstance(msg, AIMessage):
-                        full_response += msg.content
-                        yield convert_to_sse_format({
+                        yield {
                             "content": msg.content,
                             "type": "message",
                             "node": node,
-                            "previous_node": previous_node,
-                            "full_response": full_response
-                        })
+                            "previous_node": previous_node
+                        }
                     else:
-                        yield convert_to_sse_format({
+                        yield {
                             "content": msg.content,
                             "type": "thinking",
                             "node": node,
                             "previous_node": previous_node
-                        })
+                        }
 
         # Send completion signal
-        yield convert_to_sse_format({
+        yield {
             "content": "Response complete",
-            "type": "complete",
-            "full_response": full_response
-        })
+            "type": "complete"
+        }
 
         # except Exception as e:
         #     logger.error(f"Error during streaming: {e}")
@@ -214,6 +331,16 @@ async def astream(
         #         "type": "error"
         #     })
 
+    async def wrapped_streaming_tokens():
+        stream = ResponseStream(request.stream_version, encoder=sse_encoder)
+        # Token-sized events are merged before being encoded and written
+        async for event in coalesce_events(
+            cancel_on_disconnect(agent_events(), http_request, thread_id),
+            window=settings.SSE_COALESCE_WINDOW_MS / 1000,
+            max_bytes=settings.SSE_COALESCE_MAX_BYTES
+        ):
+            yield stream.event(event)
+
     return StreamingResponse(
         wrapped_streaming_tokens(),
         media_type="text/event-stream",
@@ -221,6 +348,7 @@ async def astream(
             "X-Content-Type-Options": "nosniff",
             "X-Accel-Buffering": "no",
             "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive"
+            "Connection": "keep-alive",
+            "X-Stream-Version": str(request.stream_version)
         }
     )
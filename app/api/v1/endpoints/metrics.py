@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from utils.metrics import metrics as registry
+
+# Create a router instance
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    return registry.collect()
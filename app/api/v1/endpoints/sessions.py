@@ -0,0 +1,204 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from langchain_core.messages import message_to_dict
+
+from agent.graph import graph
+
+from app.schemas.session import SessionList, SessionSummary
+
+from typing import AsyncIterator, Optional
+from utils import convert_to_ndjson_format
+from loguru import logger
+
+# Create a router instance
+router = APIRouter()
+
+# Checkpoints or messages read from the store at a time, bounds the memory of an export
+EXPORT_PAGE_SIZE = 50
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+@router.get("/sessions", response_model=SessionList)
+async def list_sessions(
+    user_id: Optional[str] = Query(None, description="Only sessions of this user"),
+    last_node: Optional[str] = Query(None, description='Only sessions paused in this node, e.g. "Execute->CheckHumanApproval"'),
+    pending_approval: Optional[bool] = Query(None, description="Only sessions (not) waiting for a tool call approval"),
+    updated_before: Optional[float] = Query(None, description="Only sessions last written before this UNIX time"),
+    before_session_id: Optional[str] = Query(None, description="With `updated_before`, also the sessions last written at that time whose ID sorts before this one"),
+    limit: int = Query(50, ge=1, le=1000, description="Maximum number of sessions to return"),
+):
+    """List sessions most recently active first.
+
+    Served from the checkpointer's thread index, which is updated on every
+    checkpoint write, so no checkpoint is read. Sessions written at the same
+    time are ordered by ID, and the scan stops at the page's last session.
+    Pass `next_updated_before` as `updated_before` and
+    `next_before_session_id` as `before_session_id` to get the next page.
+    """
+    def match(entry: dict) -> bool:
+        if user_id is not None and entry.get("user_id") != user_id:
+            return False
+        if last_node is not None and entry.get("last_node") != last_node:
+            return False
+        if (pending_approval is not None
+                and bool(entry.get("pending_approval")) != pending_approval):
+            return False
+        return True
+
+    filtered = user_id is not None or last_node is not None or pending_approval is not None
+    entries = await graph.checkpointer.alist_threads(
+        match=match if filtered else None,
+        before=(updated_before, before_session_id) if updated_before is not None else None,
+        limit=limit + 1,
+    )
+    sessions = [
+        SessionSummary(
+            session_id=entry["thread_id"],
+            user_id=entry.get("user_id"),
+            last_node=entry.get("last_node"),
+            pending_approval=bool(entry.get("pending_approval")),
+            updated_at=entry.get("updated_at"),
+            checkpoint_id=entry.get("checkpoint_id"),
+        )
+        for entry in entries[:limit]
+    ]
+
+    has_more = len(entries) > limit
+    return SessionList(
+        sessions=sessions,
+        next_updated_before=(sessions[-1].updated_at or 0) if has_more else None,
+        next_before_session_id=sessions[-1].session_id if has_more else None,
+    )
+
+
+def _checkpoint_line(checkpoint_tuple) -> dict:
+    configurable = checkpoint_tuple.config["configurable"]
+    parent = (checkpoint_tuple.parent_config or {}).get("configurable", {})
+    return {
+        "type": "checkpoint",
+        "checkpoint_id": configurable["checkpoint_id"],
+        "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+        "parent_checkpoint_id": parent.get("checkpoint_id"),
+        "ts": checkpoint_tuple.checkpoint["ts"],
+        "metadata": checkpoint_tuple.metadata,
+        "channel_values": checkpoint_tuple.checkpoint["channel_values"],
+        "pending_writes": checkpoint_tuple.pending_writes or [],
+    }
+
+
+async def _list_page(session_id: str, before: Optional[str], limit: int) -> list:
+    return [
+        checkpoint_tuple async for checkpoint_tuple in graph.checkpointer.alist(
+            {"configurable": {"thread_id": session_id}},
+            before={"configurable": {"checkpoint_id": before}} if before else None,
+            limit=limit,
+        )
+    ]
+
+
+@router.get("/sessions/{session_id}/checkpoints")
+async def export_checkpoints(
+    session_id: str,
+    before: Optional[str] = Query(None, description="Only export checkpoints older than this checkpoint ID"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of checkpoints to export"),
+):
+    """Stream the checkpoints of a session as NDJSON, newest first.
+
+    The store is read one page of `EXPORT_PAGE_SIZE` checkpoints at a time,
+    so the memory used does not grow with the length of the session. The
+    last line is `{"type": "end", "count": ..., "next_before": ...}`, where
+    `next_before` is the cursor to pass as `before` for the next page, or
+    null once the oldest checkpoint was exported.
+    """
+    first_page = await _list_page(
+        session_id, before, min(limit or EXPORT_PAGE_SIZE, EXPORT_PAGE_SIZE))
+    if not first_page and before is None:
+        raise HTTPException(status_code=404, detail=f"Session `{session_id}` not found")
+
+    async def stream_checkpoints() -> AsyncIterator[str]:
+        page, count, cursor = first_page, 0, before
+        try:
+            while page:
+                for checkpoint_tuple in page:
+                    yield convert_to_ndjson_format(_checkpoint_line(checkpoint_tuple))
+                count += len(page)
+                cursor = page[-1].config["configurable"]["checkpoint_id"]
+
+                page_size = min(limit - count, EXPORT_PAGE_SIZE) if limit else EXPORT_PAGE_SIZE
+                if page_size <= 0 or len(page) < EXPORT_PAGE_SIZE:
+                    break
+                page = await _list_page(session_id, cursor, page_size)
+        except Exception as e:
+            logger.error(f"Failed to export checkpoints of session `{session_id}`: {e}")
+            yield convert_to_ndjson_format({"type": "error", "content": str(e)})
+            return
+
+        yield convert_to_ndjson_format({
+            "type": "end",
+            "count": count,
+            "next_before": cursor if limit and count >= limit else None,
+        })
+
+    return StreamingResponse(stream_checkpoints(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/sessions/{session_id}/messages")
+async def export_messages(
+    session_id: str,
+    before: Optional[int] = Query(None, ge=0, description="Only export messages before this index"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of messages to export"),
+):
+    """Stream the message history of a session as NDJSON, newest first.
+
+    The messages are the ones of the newest checkpoint of the root graph.
+    They are read `EXPORT_PAGE_SIZE` at a time from that checkpoint (the
+    local store only loads the messages of the page, the SQLite store
+    decodes the message list once per page), so the response does not hold
+    the whole conversation. Each line holds the message's `index` in the
+    conversation, and the last line is
+    `{"type": "end", "count": ..., "next_before": ...}`, where
+    `next_before` is the index to pass as `before` for the next page.
+    """
+    latest = await graph.checkpointer.aget_list_page(
+        {"configurable": {"thread_id": session_id, "checkpoint_ns": ""}}, "messages", 0, 0)
+    if latest is None:
+        raise HTTPException(status_code=404, detail=f"Session `{session_id}` not found")
+    # Later pages are read from the same checkpoint, even if the session goes on
+    checkpoint_config, length, _ = latest
+
+    end = length if before is None else min(before, length)
+    start = max(end - limit, 0) if limit else 0
+
+    async def stream_messages() -> AsyncIterator[str]:
+        page_end = end
+        try:
+            while page_end > start:
+                page_start = max(page_end - EXPORT_PAGE_SIZE, start)
+                page = await graph.checkpointer.aget_list_page(
+                    checkpoint_config, "messages", page_start, page_end)
+                if page is None:
+                    raise LookupError(
+                        f"Checkpoint `{checkpoint_config['configurable']['checkpoint_id']}` "
+                        f"was removed during the export")
+                messages = page[2]
+                for offset in range(len(messages) - 1, -1, -1):
+                    yield convert_to_ndjson_format({
+                        "type": "message",
+                        "index": page_start + offset,
+                        "message": message_to_dict(messages[offset]),
+                    })
+                page_end = page_start
+        except Exception as e:
+            logger.error(f"Failed to export messages of session `{session_id}`: {e}")
+            yield convert_to_ndjson_format({"type": "error", "content": str(e)})
+            return
+
+        yield convert_to_ndjson_format({
+            "type": "end",
+            "count": end - start,
+            "next_before": start if start > 0 else None,
+        })
+
+    return StreamingResponse(stream_messages(), media_type=NDJSON_MEDIA_TYPE)
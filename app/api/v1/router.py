@@ -1,5 +1,7 @@
 from fastapi import APIRouter
-from .endpoints import astream
+from .endpoints import astream, metrics, sessions
 
 api_router = APIRouter()
 api_router.include_router(astream.router, prefix="", tags=["core"])
+api_router.include_router(sessions.router, prefix="", tags=["sessions"])
+api_router.include_router(metrics.router, prefix="", tags=["monitoring"])
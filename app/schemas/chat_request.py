@@ -43,6 +43,15 @@ class ChatRequest(BaseModel):
         description='The current plan being executed by the agent',
         example='Analyze user request and provide response'
     )
+    stream_version: int = Field(
+        default=1,
+        ge=1,
+        le=2,
+        title='Stream Protocol Version',
+        description='1 repeats the whole answer as `full_response` in every message event, '
+                    '2 only sends deltas numbered by `seq` with periodic checksum events',
+        example=2
+    )
     params: dict = Field(
         default={},
         title='Parameters',
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class SessionSummary(BaseModel):
+    session_id: str
+    user_id: Optional[str] = None
+    last_node: Optional[str] = Field(
+        default=None,
+        description='Last node of the session, e.g. "Execute->CheckHumanApproval"'
+    )
+    pending_approval: bool = False
+    updated_at: Optional[float] = Field(
+        default=None,
+        description='UNIX time of the last checkpoint write'
+    )
+    checkpoint_id: Optional[str] = None
+
+
+class SessionList(BaseModel):
+    sessions: List[SessionSummary]
+    next_updated_before: Optional[float] = Field(
+        default=None,
+        description='Cursor to pass as `updated_before` for the next page, null on the last page'
+    )
+    next_before_session_id: Optional[str] = Field(
+        default=None,
+        description='Cursor to pass as `before_session_id` for the next page, null on the last page'
+    )
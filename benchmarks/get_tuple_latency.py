@@ -0,0 +1,99 @@
+"""Benchmark `LocalCheckpointSaver.get_tuple` latency against thread length.
+
+Fills one thread per size with synthetic checkpoints and reports the median
+latency of fetching the newest checkpoint, next to the cost of the previous
+read path (`json.load` of the whole thread history) for the same data.
+
+Usage:
+    python -m benchmarks.get_tuple_latency --sizes 10 100 1000 5000
+"""
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+from loguru import logger
+
+from storage import LocalCheckpointSaver
+
+
+def make_checkpoint(step: int) -> dict:
+    return {
+        "v": 4,
+        "id": str(uuid.uuid4()),
+        "ts": "2025-01-01T00:00:00+00:00",
+        "channel_values": {
+            "session_id": "session_bench",
+            "previous_node": "Execute->CheckHumanApproval",
+            "next_node": "END",
+            "current_plan": "1. Add the numbers\n2. Multiply the result\n" * 8,
+            "approval_status": "pending",
+            "step": step,
+        },
+        "channel_versions": {"messages": step, "current_plan": step},
+        "versions_seen": {"Orchestrate": {"messages": step}},
+        "updated_channels": ["messages"],
+    }
+
+
+def fill_thread(saver: LocalCheckpointSaver, thread_id: str, count: int) -> list[dict]:
+    entries = []
+    parent_id = None
+    for step in range(count):
+        checkpoint = make_checkpoint(step)
+        config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": "",
+                "checkpoint_id": parent_id,
+            }
+        }
+        metadata = {"source": "loop", "step": step, "parents": {}}
+        saver.put(config, checkpoint, metadata, {})
+        entries.append({"checkpoint": checkpoint, "metadata": metadata})
+        parent_id = checkpoint["id"]
+    return entries
+
+
+def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    logger.remove()
+    db_path = tempfile.mkdtemp(prefix="bench_get_tuple_")
+    try:
+        saver = LocalCheckpointSaver(db_path=db_path)
+
+        print(f"{'checkpoints':>12} {'get_tuple ms':>14} {'full json.load ms':>18}")
+        for size in args.sizes:
+            thread_id = f"thread_{size}"
+            entries = fill_thread(saver, thread_id, size)
+            config = {"configurable": {"thread_id": thread_id}}
+
+            # The previous read path parsed the whole thread array every call
+            legacy_blob = json.dumps(entries, indent=4, ensure_ascii=False)
+
+            get_ms = median_ms(lambda: saver.get_tuple(config), args.repeat)
+            legacy_ms = median_ms(lambda: json.loads(legacy_blob)[-1], args.repeat)
+            print(f"{size:>12} {get_ms:>14.3f} {legacy_ms:>18.3f}")
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
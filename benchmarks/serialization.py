@@ -0,0 +1,155 @@
+"""Compare the record formats of `LocalCheckpointSaver` on message-heavy states.
+
+Stores the same conversation (human, AI with tool calls and tool messages,
+plus a plan and the other channels of the agent state) with every record
+format / compression setting and reports the bytes on disk, the time to
+write it and the time to read it back. The records of each run are also
+encoded and decoded on their own, next to the pretty-printed JSON
+(`indent=4`) the saver used to write, to isolate the cost of the codec.
+
+Usage:
+    python -m benchmarks.serialization --turns 50
+"""
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from loguru import logger
+
+from storage import LocalCheckpointSaver
+
+
+CONFIGURATIONS = [
+    ("json", 0),
+    ("json", 1024),
+    ("msgpack", 0),
+    ("msgpack", 1024),
+]
+
+THREAD_ID = "bench"
+
+
+def make_messages(turn: int) -> list:
+    call_id = f"call_{turn}"
+    return [
+        HumanMessage(content=f"Turn {turn}: add 3 and 4, then multiply the result by {turn}."),
+        AIMessage(content="", tool_calls=[
+            {"name": "add", "args": {"a": 3, "b": 4}, "id": call_id},
+        ]),
+        ToolMessage(content="7", tool_call_id=call_id),
+        AIMessage(content=(
+            f"The sum of 3 and 4 is 7, multiplied by {turn} it gives {7 * turn}. "
+            "Let me know if you want me to go on with another calculation.\n") * 3),
+    ]
+
+
+def fill_thread(saver: LocalCheckpointSaver, turns: int) -> None:
+    messages = []
+    parent_id = None
+    for turn in range(turns):
+        messages = messages + make_messages(turn)
+        checkpoint = {
+            "v": 4,
+            "id": str(uuid.uuid4()),
+            "ts": "2025-01-01T00:00:00+00:00",
+            "channel_values": {
+                "messages": messages,
+                "session_id": "session_bench",
+                "previous_node": "Execute->CheckHumanApproval",
+                "current_plan": "1. Add the numbers\n2. Multiply the result\n" * 8,
+                "tool_outputs": [{"tool": "add", "output": 7, "turn": turn}],
+                "approval_status": "approved",
+            },
+            "channel_versions": {
+                "messages": turn + 1, "tool_outputs": turn + 1, "current_plan": 1},
+            "versions_seen": {"Execute": {"messages": turn}},
+            "updated_channels": ["messages", "tool_outputs"],
+        }
+        config = {"configurable": {
+            "thread_id": THREAD_ID, "checkpoint_ns": "", "checkpoint_id": parent_id}}
+        new_versions = {"messages": turn + 1, "tool_outputs": turn + 1}
+        if turn == 0:
+            new_versions["current_plan"] = 1
+        saver.put(config, checkpoint, {"source": "loop", "step": turn}, new_versions)
+        parent_id = checkpoint["id"]
+
+
+def thread_bytes(db_path: str) -> int:
+    saver = LocalCheckpointSaver(db_path)
+    size = saver._thread_size(THREAD_ID)
+    saver.close()
+    return size
+
+
+def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--snapshot-interval", type=int, default=16)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'format':>10} {'zlib >':>7} {'disk bytes':>11} {'record bytes':>13} {'put ms':>8} "
+          f"{'get_tuple ms':>13} {'list ms':>8} {'encode ms':>10} {'decode ms':>10}")
+
+    records = None
+    for record_format, threshold in CONFIGURATIONS:
+        db_path = tempfile.mkdtemp(prefix="bench_serialization_")
+        try:
+            kwargs = {
+                "record_format": record_format,
+                "compress_threshold": threshold,
+                "snapshot_interval": args.snapshot_interval,
+            }
+            saver = LocalCheckpointSaver(db_path, cache_size=0, **kwargs)
+            start = time.perf_counter()
+            fill_thread(saver, args.turns)
+            put_ms = (time.perf_counter() - start) * 1000 / args.turns
+
+            config = {"configurable": {"thread_id": THREAD_ID}}
+            get_ms = median_ms(lambda: saver.get_tuple(config), args.repeat)
+            list_ms = median_ms(lambda: list(saver.list(config)), args.repeat)
+
+            log = saver._thread_log(THREAD_ID)
+            records = list(log.iter_records())
+            lines = [saver.codec.encode(record) for record in records]
+            encode_ms = median_ms(
+                lambda: [saver.codec.encode(record) for record in records], args.repeat)
+            decode_ms = median_ms(
+                lambda: [saver.codec.decode(line) for line in lines], args.repeat)
+            saver.close()
+
+            record_bytes = sum(len(line) for line in lines)
+            print(f"{record_format:>10} {threshold or '-':>7} {thread_bytes(db_path):>11} "
+                  f"{record_bytes:>13} "
+                  f"{put_ms:>8.3f} {get_ms:>13.3f} {list_ms:>8.3f} "
+                  f"{encode_ms:>10.3f} {decode_ms:>10.3f}")
+        finally:
+            shutil.rmtree(db_path, ignore_errors=True)
+
+    # The pretty-printed JSON the saver wrote before, for the same records
+    pretty = [json.dumps(record, indent=4, ensure_ascii=False) for record in records]
+    encode_ms = median_ms(
+        lambda: [json.dumps(record, indent=4, ensure_ascii=False) for record in records],
+        args.repeat)
+    decode_ms = median_ms(lambda: [json.loads(text) for text in pretty], args.repeat)
+    print(f"{'indent=4':>10} {'-':>7} {'':>11} {sum(len(text.encode()) for text in pretty):>13} "
+          f"{'':>8} {'':>13} {'':>8} {encode_ms:>10.3f} {decode_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
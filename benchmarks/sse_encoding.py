@@ -0,0 +1,98 @@
+"""Compare the SSE encoders of the `/astream` events.
+
+Replays the events of a streamed answer (status, plan, node changes and one
+`message` event per token, with the cumulative `full_response` of protocol
+version 1 or the `seq` of version 2) through `utils.convert_to_sse_format`
+and through `utils.sse.SSEEncoder` with every available JSON backend, and
+reports the encoding time per event and the bytes produced. The frames of
+every encoder are decoded and checked against those of
+`convert_to_sse_format` first.
+
+Usage:
+    python -m benchmarks.sse_encoding --tokens 2000
+    python -m benchmarks.sse_encoding --tokens 500 --version 1
+"""
+import argparse
+import json
+import time
+
+from utils import convert_to_sse_format
+from utils.sse import JSON_BACKENDS, SSEEncoder, orjson
+
+
+TOKENS = ("The", " sum", " of", " 3", " and", " 4", " is", " 7", ",", " multiplied",
+          " by", " 2", " it", " gives", " 14", ".", " Résultat", " ✓", "\n")
+
+
+def make_events(tokens: int, version: int) -> list[dict]:
+    events = [
+        {"content": "Agent is thinking...", "type": "status", "node": "starting"},
+        {"content": "Plan updated: 1. Add the numbers\n2. Multiply the result\n",
+         "type": "plan", "node": "Plan"},
+        {"content": "**[Transitioned to Execute Node]**", "type": "node_change",
+         "node": "Execute", "previous_node": "Execute"},
+    ]
+    full_response = ""
+    for index in range(tokens):
+        token = TOKENS[index % len(TOKENS)]
+        event = {"content": token, "type": "message", "node": "LLM", "previous_node": "Execute"}
+        full_response += token
+        if version == 1:
+            event["full_response"] = full_response
+        events.append(event)
+    events.append({"content": "Response complete", "type": "complete",
+                   **({"full_response": full_response} if version == 1 else {})})
+    if version >= 2:
+        for seq, event in enumerate(events, start=1):
+            event["seq"] = seq
+    return events
+
+
+def best_us_per_event(encode, events: list[dict], repeat: int) -> float:
+    # Best of `repeat` runs, after a warm-up run (template caches, CPU clock)
+    for event in events:
+        encode(event)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for event in events:
+            encode(event)
+        timings.append((time.perf_counter() - start) * 1e6 / len(events))
+    return min(timings)
+
+
+def decode(frame: str) -> dict:
+    assert frame.startswith("data: ") and frame.endswith("\n\n"), frame
+    return json.loads(frame[len("data: "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--version", type=int, choices=(1, 2), default=2,
+                        help="Stream protocol version of the events")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    events = make_events(args.tokens, args.version)
+    encoders = [("convert_to_sse_format", convert_to_sse_format)]
+    for backend in JSON_BACKENDS:
+        if backend == "orjson" and orjson is None:
+            continue
+        encoders.append((f"SSEEncoder({backend})", SSEEncoder(backend).encode))
+
+    reference = [convert_to_sse_format(event) for event in events]
+    print(f"{len(events)} events, protocol version {args.version}")
+    print(f"{'encoder':>22} {'us/event':>9} {'speedup':>8} {'bytes':>10}")
+    baseline = None
+    for name, encode in encoders:
+        frames = [encode(event) for event in events]
+        assert [decode(frame) for frame in frames] == [decode(frame) for frame in reference], name
+        us = best_us_per_event(encode, events, args.repeat)
+        baseline = baseline or us
+        print(f"{name:>22} {us:>9.3f} {baseline / us:>7.2f}x "
+              f"{sum(len(frame.encode('utf-8')) for frame in frames):>10}")
+
+
+if __name__ == "__main__":
+    main()
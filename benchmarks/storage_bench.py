@@ -0,0 +1,355 @@
+"""Benchmark suite of the checkpoint savers of the `storage` package.
+
+Generates synthetic sessions whose checkpoints alternate between the root
+graph (`State` channels) and the `Execute` subgraph (`ExecutionState`
+channels: plan, steps, tool calls and tool outputs, approval status), with
+a growing conversation and the pending writes of every step. For every
+backend and thread size it measures:
+
+- `put` while filling the thread, and `aput` of `--concurrency` sessions at once
+- `get_tuple` of the newest checkpoint, also as concurrent `aget_tuple` calls
+- `list` of the whole thread, of the last 10 checkpoints, past a `before`
+  cursor, and with metadata filters
+- `delete_thread`
+
+Everything runs offline on temporary directories. The results are written
+as JSON (one entry per backend / size / operation / concurrency, with the
+latency percentiles) so that runs of different commits can be compared,
+e.g. with `--compare`.
+
+Usage:
+    python -m benchmarks.storage_bench --sizes 10 100 1000 10000 --output bench.json
+    python -m benchmarks.storage_bench --backends local --sizes 100 --concurrency 1 8
+    python -m benchmarks.storage_bench --sizes 10 100 --compare bench.json --output new.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from loguru import logger
+
+from storage import LocalCheckpointSaver, SqliteCheckpointSaver
+
+
+BACKENDS = ("local", "sqlite")
+
+PLAN = (
+    "1. Add 3 and 4 with the `add` tool\n"
+    "2. Multiply the result by the step number with the `multiply` tool\n"
+    "3. Report the result to the user\n"
+)
+
+
+def make_saver(backend: str, db_path: str, args):
+    if backend == "local":
+        return LocalCheckpointSaver(
+            db_path,
+            snapshot_interval=args.snapshot_interval,
+            record_format=args.record_format,
+            compress_threshold=args.compress_threshold,
+        )
+    return SqliteCheckpointSaver(str(Path(db_path) / "checkpoints.sqlite"))
+
+
+def make_turn(step: int) -> list:
+    call_id = f"call_{step}"
+    return [
+        HumanMessage(content=f"Add 3 and 4, then multiply the result by {step}."),
+        AIMessage(content="", tool_calls=[
+            {"name": "add", "args": {"a": 3, "b": 4}, "id": call_id},
+        ]),
+        ToolMessage(content="7", tool_call_id=call_id),
+        AIMessage(content=f"3 + 4 = 7, and 7 x {step} = {7 * step}."),
+    ]
+
+
+class SessionGenerator:
+    """Produces the checkpoints of a synthetic session, root graph and
+    `Execute` subgraph in turn, keeping the last `max_messages` messages."""
+
+    def __init__(self, thread_id: str, max_messages: int):
+        self.thread_id = thread_id
+        self.max_messages = max_messages
+        self.messages: list = []
+        self.parents = {"": None, "Execute": None}
+        self.step = 0
+
+    def next(self) -> tuple[dict, dict, dict, dict, list]:
+        """Return the config, checkpoint, metadata, new versions and pending
+        writes of the next checkpoint."""
+        step = self.step
+        self.step += 1
+        checkpoint_ns = "Execute" if step % 2 else ""
+        if step % 4 == 0:
+            self.messages = (self.messages + make_turn(step))[-self.max_messages:]
+
+        if checkpoint_ns:
+            channel_values = {
+                "messages": self.messages,
+                "session_id": self.thread_id,
+                "previous_node": "Execute->CheckHumanApproval",
+                "next_node": "ExecuteTool",
+                "plan": PLAN,
+                "steps": PLAN.strip().splitlines(),
+                "current_step": step % 3,
+                "approval_status": ("pending", "approved", "not_requested")[step % 3],
+                "tool_message": self.messages[-3] if len(self.messages) >= 3 else None,
+                "is_tool_calling": step % 3 == 1,
+                "tool_outputs": [ToolMessage(content=str(7 * step), tool_call_id=f"call_{step}")],
+            }
+        else:
+            channel_values = {
+                "messages": self.messages,
+                "session_id": self.thread_id,
+                "previous_node": "Plan",
+                "next_node": "Execute",
+                "current_plan": PLAN,
+                "metadata": {"user_id": "bench", "turn": step // 4},
+            }
+
+        new_versions = {
+            "messages": step + 1, "previous_node": step + 1, "next_node": step + 1}
+        if checkpoint_ns:
+            new_versions.update(
+                {"current_step": step + 1, "approval_status": step + 1, "tool_outputs": step + 1})
+        checkpoint = {
+            "v": 4,
+            "id": str(uuid.uuid4()),
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "channel_values": channel_values,
+            "channel_versions": {key: step + 1 for key in channel_values},
+            "versions_seen": {"Execute" if checkpoint_ns else "Orchestrate": {"messages": step}},
+            "updated_channels": list(new_versions),
+        }
+        metadata = {
+            "source": "input" if step % 8 == 0 else "loop",
+            "step": step,
+            "parents": {},
+            "writes": {"Execute" if checkpoint_ns else "Plan": {"previous_node": "Plan"}},
+        }
+        config = {"configurable": {
+            "thread_id": self.thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": self.parents[checkpoint_ns],
+        }}
+        self.parents[checkpoint_ns] = checkpoint["id"]
+        writes = [
+            ("messages", [AIMessage(content=f"Step {step} done.")]),
+            ("previous_node", "Execute->ExecuteTool" if checkpoint_ns else "Plan"),
+        ]
+        return config, checkpoint, metadata, new_versions, writes
+
+
+def store_next(saver, generator: SessionGenerator) -> None:
+    config, checkpoint, metadata, new_versions, writes = generator.next()
+    next_config = saver.put(config, checkpoint, metadata, new_versions)
+    saver.put_writes(next_config, writes, str(uuid.uuid4()))
+
+
+async def astore_next(saver, generator: SessionGenerator) -> None:
+    config, checkpoint, metadata, new_versions, writes = generator.next()
+    next_config = await saver.aput(config, checkpoint, metadata, new_versions)
+    await saver.aput_writes(next_config, writes, str(uuid.uuid4()))
+
+
+def summarize(timings: list[float], total_seconds: float) -> dict:
+    """Latency percentiles in milliseconds and throughput of a series."""
+    ordered = sorted(timings)
+    count = len(ordered)
+    percentiles = (
+        statistics.quantiles(ordered, n=100, method="inclusive")
+        if count > 1 else ordered * 99
+    )
+    return {
+        "count": count,
+        "total_seconds": round(total_seconds, 6),
+        "ops_per_second": round(count / total_seconds, 3) if total_seconds else None,
+        "mean_ms": round(1000 * statistics.fmean(ordered), 4),
+        "p50_ms": round(1000 * percentiles[49], 4),
+        "p95_ms": round(1000 * percentiles[94], 4),
+        "p99_ms": round(1000 * percentiles[98], 4),
+        "max_ms": round(1000 * ordered[-1], 4),
+    }
+
+
+def timed(fn, repeat: int) -> dict:
+    timings = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call_start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - call_start)
+    return summarize(timings, time.perf_counter() - start)
+
+
+async def atimed(make_call, concurrency: int, repeat: int) -> dict:
+    """Run `repeat` calls per worker on `concurrency` concurrent workers."""
+    timings = []
+
+    async def worker(index: int):
+        for _ in range(repeat):
+            call_start = time.perf_counter()
+            await make_call(index)
+            timings.append(time.perf_counter() - call_start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return summarize(timings, time.perf_counter() - start)
+
+
+def bench_size(backend: str, size: int, args) -> list[dict]:
+    results = []
+
+    def record(operation: str, stats: dict, concurrency: int = 1, **params):
+        results.append({
+            "backend": backend,
+            "size": size,
+            "operation": operation,
+            "concurrency": concurrency,
+            **({"params": params} if params else {}),
+            **stats,
+        })
+        logger.info(
+            f"{backend:>6} {size:>6} {operation:<22} x{concurrency:<3} "
+            f"p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+            f"{stats['ops_per_second'] or 0:>10.1f} ops/s")
+
+    db_path = tempfile.mkdtemp(prefix=f"bench_storage_{backend}_")
+    saver = make_saver(backend, db_path, args)
+    try:
+        thread_id = f"session_{size}"
+        generator = SessionGenerator(thread_id, args.max_messages)
+        record("put", timed(lambda: store_next(saver, generator), size))
+
+        config = {"configurable": {"thread_id": thread_id}}
+        middle = next(
+            saver.list(config, filter={"step": size // 2}), None) if size > 1 else None
+        record("get_tuple", timed(lambda: saver.get_tuple(config), args.repeat))
+        list_repeat = max(1, min(args.repeat, 10_000 // size))
+        record("list", timed(lambda: list(saver.list(config)), list_repeat))
+        record("list_limit", timed(
+            lambda: list(saver.list(config, limit=10)), args.repeat), limit=10)
+        if middle is not None:
+            record("list_before", timed(
+                lambda: list(saver.list(config, before=middle.config, limit=10)),
+                args.repeat), limit=10)
+        record("list_filter_source", timed(
+            lambda: list(saver.list(config, filter={"source": "input"})), list_repeat),
+            filter={"source": "input"})
+        record("list_filter_step", timed(
+            lambda: list(saver.list(config, filter={"step": size // 2}, limit=1)),
+            list_repeat), filter={"step": size // 2}, limit=1)
+
+        async def run_concurrent(concurrency: int):
+            generators = [
+                SessionGenerator(f"session_{size}_aput_{concurrency}_{index}", args.max_messages)
+                for index in range(concurrency)
+            ]
+            record("aput", await atimed(
+                lambda index: astore_next(saver, generators[index]),
+                concurrency, min(size, args.concurrent_ops)), concurrency)
+            record("aget_tuple", await atimed(
+                lambda index: saver.aget_tuple(config),
+                concurrency, args.repeat), concurrency)
+
+        for concurrency in args.concurrency:
+            asyncio.run(run_concurrent(concurrency))
+
+        record("delete_thread", timed(lambda: saver.delete_thread(thread_id), 1))
+    finally:
+        saver.close()
+        shutil.rmtree(db_path, ignore_errors=True)
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    """Log the p50 latency of each measurement next to a previous run."""
+    def key(result):
+        return result["backend"], result["size"], result["operation"], result["concurrency"]
+
+    previous_results = json.loads(Path(baseline_path).read_text())["results"]
+    baseline = {key(result): result for result in previous_results}
+    logger.info(f"Compared with `{baseline_path}` (p50, current / baseline):")
+    for result in results:
+        previous = baseline.get(key(result))
+        if previous is None or not previous["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / previous["p50_ms"]
+        logger.info(
+            f"{result['backend']:>6} {result['size']:>6} {result['operation']:<22} "
+            f"x{result['concurrency']:<3} {previous['p50_ms']:>9.3f} -> "
+            f"{result['p50_ms']:>9.3f} ms  ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="Calls per measurement (per worker when concurrent)")
+    parser.add_argument("--concurrent-ops", type=int, default=100,
+                        help="Checkpoints written per worker by the concurrent aput")
+    parser.add_argument("--max-messages", type=int, default=40,
+                        help="Messages kept in the synthetic conversation")
+    parser.add_argument("--snapshot-interval", type=int, default=16)
+    parser.add_argument("--record-format", default="json")
+    parser.add_argument("--compress-threshold", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO", format="{message}",
+               filter=lambda record: record["name"] == __name__)
+
+    results = []
+    for backend in args.backends:
+        for size in args.sizes:
+            results.extend(bench_size(backend, size, args))
+
+    report = {
+        "benchmark": "storage",
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "results": results,
+    }
+    if args.compare:
+        compare(results, args.compare)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        logger.info(f"Results written to `{args.output}`")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
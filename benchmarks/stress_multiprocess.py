@@ -0,0 +1,252 @@
+"""Multi-process stress test of `LocalCheckpointSaver` on a shared directory.
+
+Several writer processes store checkpoints (with pending writes and
+non-primitive channel values) on the same thread id while reader processes
+keep calling `get_tuple` and `list`, like uvicorn workers serving one
+session. Afterwards the directory is checked: every checkpoint of every
+writer must be listed exactly once with its own values and writes, every
+record must be complete, every index entry must point at the record it
+names and `before` cursors must page through the whole history.
+
+With `--compact-keep N`, another process keeps compacting the thread down
+to its last N checkpoints meanwhile. Readers must still never fail, and the
+checkpoints that survive must be complete and correct, the newest one
+being the last checkpoint of a writer.
+
+Usage:
+    python -m benchmarks.stress_multiprocess --processes 4 --checkpoints 200
+    python -m benchmarks.stress_multiprocess --compact-keep 20
+"""
+import argparse
+import json
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage
+from loguru import logger
+
+from storage import LocalCheckpointSaver, RetentionPolicy
+
+
+THREAD_ID = "stress"
+
+
+def checkpoint_id(worker: int, step: int) -> str:
+    return f"{worker:03d}-{step:06d}"
+
+
+def make_checkpoint(worker: int, step: int) -> dict:
+    return {
+        "v": 4,
+        "id": checkpoint_id(worker, step),
+        "ts": "2025-01-01T00:00:00+00:00",
+        "channel_values": {
+            "worker": worker,
+            "step": step,
+            "messages": [
+                HumanMessage(content=f"{worker}/{i}") for i in range(step % 5 + 1)
+            ],
+        },
+        "channel_versions": {"worker": 1, "step": step + 1, "messages": step + 1},
+        "versions_seen": {},
+        "updated_channels": ["step", "messages"],
+    }
+
+
+def check_values(worker: int, step: int, channel_values: dict) -> None:
+    assert channel_values["worker"] == worker, channel_values
+    assert channel_values["step"] == step, channel_values
+    assert [message.content for message in channel_values["messages"]] == [
+        f"{worker}/{i}" for i in range(step % 5 + 1)
+    ], channel_values
+
+
+def parse_id(value: str) -> tuple[int, int]:
+    worker, step = value.split("-")
+    return int(worker), int(step)
+
+
+def writer(db_path: str, worker: int, checkpoints: int) -> None:
+    logger.remove()
+    saver = LocalCheckpointSaver(db_path, snapshot_interval=4)
+    parent_id = None
+    for step in range(checkpoints):
+        checkpoint = make_checkpoint(worker, step)
+        config = {"configurable": {
+            "thread_id": THREAD_ID,
+            "checkpoint_ns": "",
+            "checkpoint_id": parent_id,
+        }}
+        new_versions = {"step": step + 1, "messages": step + 1}
+        if step == 0:
+            new_versions["worker"] = 1
+        next_config = saver.put(config, checkpoint, {"step": step}, new_versions)
+        saver.put_writes(next_config, [("out", step)], f"task-{worker}")
+        parent_id = checkpoint["id"]
+    saver.close()
+
+
+def reader(db_path: str, stop, errors) -> None:
+    logger.remove()
+    saver = LocalCheckpointSaver(db_path)
+    config = {"configurable": {"thread_id": THREAD_ID}}
+    while not stop.is_set():
+        try:
+            latest = saver.get_tuple(config)
+            if latest is not None:
+                check_values(*parse_id(latest.checkpoint["id"]),
+                             latest.checkpoint["channel_values"])
+            for checkpoint_tuple in saver.list(config, limit=5):
+                check_values(*parse_id(checkpoint_tuple.checkpoint["id"]),
+                             checkpoint_tuple.checkpoint["channel_values"])
+        except Exception as error:
+            errors.put(f"reader: {error!r}")
+            return
+    saver.close()
+
+
+def compactor(db_path: str, keep_last: int, stop, errors) -> None:
+    logger.remove()
+    saver = LocalCheckpointSaver(db_path)
+    policy = RetentionPolicy(keep_last=keep_last)
+    while not stop.is_set():
+        try:
+            saver.compact_thread(THREAD_ID, policy)
+        except Exception as error:
+            errors.put(f"compactor: {error!r}")
+            return
+        time.sleep(0.01)
+    saver.close()
+
+
+def verify(db_path: str, processes: int, checkpoints: int, compacted: bool) -> list[str]:
+    failures = []
+    saver = LocalCheckpointSaver(db_path, cache_size=0)
+    config = {"configurable": {"thread_id": THREAD_ID}}
+
+    listed = list(saver.list(config))
+    ids = [checkpoint_tuple.checkpoint["id"] for checkpoint_tuple in listed]
+    expected = {
+        checkpoint_id(worker, step)
+        for worker in range(processes) for step in range(checkpoints)
+    }
+    if len(ids) != len(set(ids)):
+        failures.append(f"{len(ids) - len(set(ids))} duplicated checkpoints")
+    if compacted:
+        last = {checkpoint_id(worker, checkpoints - 1) for worker in range(processes)}
+        if not ids or ids[0] not in last:
+            failures.append(f"newest checkpoint {ids[:1]} is not the last of a writer")
+        if not set(ids) <= expected:
+            failures.append(f"{len(set(ids) - expected)} unexpected checkpoints")
+    elif set(ids) != expected:
+        failures.append(
+            f"{len(expected - set(ids))} lost and {len(set(ids) - expected)} unexpected checkpoints")
+
+    for checkpoint_tuple in listed:
+        worker, step = parse_id(checkpoint_tuple.checkpoint["id"])
+        try:
+            check_values(worker, step, checkpoint_tuple.checkpoint["channel_values"])
+        except AssertionError as error:
+            failures.append(f"wrong values for {checkpoint_tuple.checkpoint['id']}: {error}")
+        writes = [(channel, value) for _, channel, value in checkpoint_tuple.pending_writes]
+        if writes != [("out", step)]:
+            failures.append(f"wrong writes for {checkpoint_tuple.checkpoint['id']}: {writes}")
+
+    log = saver._thread_log(THREAD_ID)
+    for path in log.segments():
+        with open(path, "rb") as segment_file:
+            for number, line in enumerate(segment_file, 1):
+                if not line.endswith(b"\n"):
+                    failures.append(f"torn record in `{path}` line {number}")
+
+    # Every index line must point at the record it names
+    with open(saver._checkpoint_index(THREAD_ID).path, "rb") as index_file:
+        for line in index_file:
+            entry = json.loads(line)
+            record = log.read_at((entry["segment"], entry["offset"]))
+            if record is None or record.get("checkpoint_id") != entry["id"]:
+                failures.append(f"index entry {entry} points at the wrong record")
+
+    # Walk the whole history again page by page through the index
+    paged = []
+    before = None
+    while True:
+        page = list(saver.list(config, before=before, limit=50))
+        if not page:
+            break
+        paged.extend(checkpoint_tuple.checkpoint["id"] for checkpoint_tuple in page)
+        before = page[-1].config
+    if paged != ids:
+        failures.append("paging with `before` does not match the full listing")
+
+    saver.close()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--checkpoints", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--compact-keep", type=int, default=0,
+                        help="compact the thread to its last N checkpoints meanwhile")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    context = multiprocessing.get_context("spawn")
+    db_path = tempfile.mkdtemp(prefix="stress_")
+    try:
+        stop = context.Event()
+        errors = context.Queue()
+        readers = [
+            context.Process(target=reader, args=(db_path, stop, errors))
+            for _ in range(args.readers)
+        ]
+        if args.compact_keep:
+            readers.append(context.Process(
+                target=compactor, args=(db_path, args.compact_keep, stop, errors)))
+        writers = [
+            context.Process(target=writer, args=(db_path, worker, args.checkpoints))
+            for worker in range(args.processes)
+        ]
+
+        start = time.perf_counter()
+        for process in readers + writers:
+            process.start()
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for process in readers:
+            process.join()
+
+        failures = []
+        while not errors.empty():
+            failures.append(errors.get())
+        failures.extend(
+            f"writer {worker} exited with {process.exitcode}"
+            for worker, process in enumerate(writers) if process.exitcode
+        )
+        failures.extend(verify(
+            db_path, args.processes, args.checkpoints, bool(args.compact_keep)))
+
+        total = args.processes * args.checkpoints
+        print(f"{args.processes} writers x {args.checkpoints} checkpoints "
+              f"({args.readers} readers): {elapsed:.2f} s, {total / elapsed:.0f} checkpoints/s")
+        if failures:
+            print(f"FAILED ({len(failures)} problems)")
+            for failure in failures[:20]:
+                print(f"  {failure}")
+            return 1
+        print("OK: no checkpoints lost or corrupted")
+        return 0
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
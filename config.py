@@ -22,6 +22,41 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = False
 
+    # Checkpoint storage: "local" (segment files) or "sqlite"
+    CHECKPOINT_BACKEND: str = "local"
+    CHECKPOINT_DB_PATH: str = "./dev_db"
+    # Full snapshot every N checkpoints, deltas in between (1 disables deltas)
+    CHECKPOINT_SNAPSHOT_INTERVAL: int = 16
+    # Record format ("json" or "msgpack") and zlib threshold in bytes (0 disables)
+    CHECKPOINT_RECORD_FORMAT: str = "json"
+    CHECKPOINT_COMPRESS_THRESHOLD: int = 0
+    # "sync" stores each checkpoint as the graph produces it, "deferred"
+    # queues them in memory and stores them in the background until the
+    # run ends, pauses or fails
+    CHECKPOINT_DURABILITY: str = "sync"
+    # Retention enforced by the background compactor: the last N checkpoints
+    # per namespace plus those younger than MAX_AGE seconds (0 and 0 disable it)
+    CHECKPOINT_RETENTION_KEEP_LAST: int = 0
+    CHECKPOINT_RETENTION_MAX_AGE: float = 0
+    CHECKPOINT_COMPACTION_INTERVAL: float = 300
+    # Sessions not written for SESSION_TTL seconds are deleted (0 disables),
+    # at most SESSION_GC_BATCH_SIZE per SESSION_GC_BATCH_PAUSE seconds
+    SESSION_TTL: float = 0
+    SESSION_GC_INTERVAL: float = 600
+    SESSION_GC_BATCH_SIZE: int = 50
+    SESSION_GC_BATCH_PAUSE: float = 1.0
+
+    # Streamed message/thinking events of a node are merged for up to
+    # SSE_COALESCE_WINDOW_MS milliseconds (0 disables) or SSE_COALESCE_MAX_BYTES
+    # bytes of content (0 for no limit) into one SSE frame
+    SSE_COALESCE_WINDOW_MS: float = 20
+    SSE_COALESCE_MAX_BYTES: int = 1024
+    # JSON backend of the SSE encoder: "json" or "orjson" (if installed)
+    SSE_JSON_BACKEND: str = "json"
+    # Seconds between two checks of the client connection, a run whose
+    # client disconnected is cancelled
+    SSE_DISCONNECT_POLL_INTERVAL: float = 0.5
+
     # LangFuse Tracking
     LANGFUSE_DEBUG: bool = False
     LANGFUSE_SECRET_KEY: str
@@ -1,3 +1,14 @@
+from .deferred import DeferredCheckpointSaver
+from .expiry import SessionCollector
 from .local import LocalCheckpointSaver
+from .retention import CheckpointCompactor, RetentionPolicy
+from .sqlite import SqliteCheckpointSaver
 
-__all__ = ["LocalCheckpointSaver"]
+__all__ = [
+    "CheckpointCompactor",
+    "DeferredCheckpointSaver",
+    "LocalCheckpointSaver",
+    "RetentionPolicy",
+    "SessionCollector",
+    "SqliteCheckpointSaver",
+]
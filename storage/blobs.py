@@ -0,0 +1,294 @@
+import base64
+import hashlib
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable, Iterator, Optional
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from loguru import logger
+
+from .codecs import RecordCodec
+
+
+# Keys marking values stored in the blob store, or containers of them
+BLOB_REF = "$blob"
+LIST_REF = "$list"
+DICT_REF = "$dict"
+
+
+def is_primitive(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def blob_refs(value: Any) -> Iterator[str]:
+    """Yield the hashes of the blobs referenced by a value produced by `dump`."""
+    if not isinstance(value, dict):
+        return
+    if BLOB_REF in value:
+        yield value[BLOB_REF]
+    elif LIST_REF in value:
+        for item in value[LIST_REF]:
+            yield from blob_refs(item)
+    elif DICT_REF in value:
+        for item in value[DICT_REF].values():
+            yield from blob_refs(item)
+
+
+class BlobStore:
+    """Content-addressed store of serialized channel values for one thread.
+
+    Values are serialized with the checkpointer's `serde` and appended once
+    to an append-only `{thread_id}.blobs.jsonl` file, keyed by the hash of
+    their serialized bytes. Checkpoints reference them by hash. Plain lists and
+    dicts (such as `messages` or a task's input) are broken down into their
+    items, so an unchanged message is stored only once no matter how many
+    checkpoints or writes contain it.
+
+    The hash -> offset index is kept in memory and extended incrementally
+    from the end of the file, so blobs appended by other processes are found
+    as well. Serialized values larger than the `codec`'s compression
+    threshold are stored zlib-compressed; the hash is always computed on the
+    uncompressed bytes.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        serde: SerializerProtocol,
+        codec: Optional[RecordCodec] = None,
+    ):
+        self.path = Path(path)
+        self.serde = serde
+        self.codec = codec or RecordCodec(serde)
+        self._index: dict[str, tuple[int, int]] = {}
+        self._indexed_size = 0
+        self._indexed_inode = None
+        self._lock = Lock()
+
+    @staticmethod
+    def content_hash(value_type: str, data: bytes) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(value_type.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _refresh_index(self) -> None:
+        """Index the blobs appended to the file since the last refresh."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._index.clear()
+            self._indexed_size = 0
+            return
+
+        size = stat.st_size
+        if size < self._indexed_size or stat.st_ino != self._indexed_inode:
+            # The file was rewritten or replaced, index it from scratch
+            self._index.clear()
+            self._indexed_size = 0
+            self._indexed_inode = stat.st_ino
+        if size == self._indexed_size:
+            return
+
+        with open(self.path, "rb") as blob_file:
+            blob_file.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in blob_file:
+                if not line.endswith(b"\n"):
+                    # Incomplete trailing blob, index it on a later refresh
+                    break
+                try:
+                    blob_hash = json.loads(line)["hash"]
+                except (json.JSONDecodeError, UnicodeDecodeError, KeyError):
+                    logger.warning(f"Corrupted blob record in: `{self.path}`")
+                else:
+                    self._index[blob_hash] = (offset, len(line))
+                offset += len(line)
+            self._indexed_size = offset
+
+    def _encode(self, value: Any, pending: dict[str, bytes]) -> str:
+        value_type, data = self.serde.dumps_typed(value)
+        blob_hash = self.content_hash(value_type, data)
+        if blob_hash not in self._index and blob_hash not in pending:
+            pending[blob_hash] = self._line(blob_hash, value_type, data)
+        return blob_hash
+
+    def _line(self, blob_hash: str, value_type: str, data: bytes) -> bytes:
+        """Encode a blob record, compressing its data per the codec."""
+        data, compression = self.codec.compress(data)
+        record = {
+            "hash": blob_hash,
+            "type": value_type,
+            "data": base64.b64encode(data).decode("ascii"),
+        }
+        if compression is not None:
+            record["compression"] = compression
+        return json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+
+    def _reencode(self, line: bytes) -> bytes:
+        """Encode a stored blob record again with the current codec settings."""
+        record = json.loads(line)
+        data = self.codec.decompress(
+            base64.b64decode(record["data"]), record.get("compression"))
+        return self._line(record["hash"], record["type"], data)
+
+    def _to_refs(self, value: Any, pending: dict[str, bytes]) -> Any:
+        if is_primitive(value):
+            return value
+        if type(value) is list:
+            return {LIST_REF: [self._to_refs(item, pending) for item in value]}
+        if type(value) is dict and all(isinstance(key, str) for key in value):
+            return {DICT_REF: {
+                key: self._to_refs(item, pending) for key, item in value.items()
+            }}
+        return {BLOB_REF: self._encode(value, pending)}
+
+    def dump(self, values: dict[str, Any]) -> dict[str, Any]:
+        """Replace the non-primitive values of a mapping with blob references,
+        storing the blobs that are not in the store yet with a single append."""
+        with self._lock:
+            self._refresh_index()
+
+            pending: dict[str, bytes] = {}
+            refs = {
+                key: self._to_refs(value, pending)
+                for key, value in values.items()
+            }
+
+            if pending:
+                with open(self.path, "ab") as blob_file:
+                    blob_file.write(b"".join(pending.values()))
+                logger.debug(
+                    f"Stored {len(pending)} new blob(s) in `{self.path}`")
+
+        return refs
+
+    def _read(self, blob_file, blob_hash: str) -> Any:
+        location = self._index.get(blob_hash)
+        if location is None:
+            raise KeyError(f"Blob `{blob_hash}` not found in `{self.path}`")
+
+        offset, length = location
+        blob_file.seek(offset)
+        try:
+            record = json.loads(blob_file.read(length))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            record = {}
+        if record.get("hash") != blob_hash:
+            # The file was replaced by a compaction after it was indexed
+            raise KeyError(f"Blob `{blob_hash}` moved in `{self.path}`")
+        data = self.codec.decompress(
+            base64.b64decode(record["data"]), record.get("compression"))
+        return self.serde.loads_typed((record["type"], data))
+
+    def _from_refs(self, blob_file, value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        if BLOB_REF in value:
+            return self._read(blob_file, value[BLOB_REF])
+        if LIST_REF in value:
+            return [self._from_refs(blob_file, item) for item in value[LIST_REF]]
+        if DICT_REF in value:
+            return {
+                key: self._from_refs(blob_file, item)
+                for key, item in value[DICT_REF].items()
+            }
+        return value
+
+    def load(self, refs: dict[str, Any]) -> dict[str, Any]:
+        """Resolve the blob references of a mapping produced by `dump`."""
+        if all(is_primitive(value) for value in refs.values()):
+            return dict(refs)
+
+        try:
+            return self._load(refs)
+        except KeyError:
+            # The file may have been replaced by a compaction since the index
+            # was read, index it again from scratch before giving up
+            with self._lock:
+                self._index.clear()
+                self._indexed_size = 0
+            return self._load(refs)
+
+    def _load(self, refs: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            self._refresh_index()
+
+            try:
+                blob_file = open(self.path, "rb")
+            except FileNotFoundError:
+                # Only containers of primitives, nothing was written to the store
+                blob_file = None
+            try:
+                return {
+                    key: self._from_refs(blob_file, value)
+                    for key, value in refs.items()
+                }
+            finally:
+                if blob_file is not None:
+                    blob_file.close()
+
+    def compact(self, keep: Iterable[str], reencode: bool = False) -> int:
+        """Rewrite the store with only the blobs whose hash is in `keep`.
+
+        With `reencode`, the kept blobs are also compressed again per the
+        current codec settings. The new file is written next to the current
+        one and renamed over it, so readers see either the old or the new
+        store, never a partial one. The file is left untouched if nothing
+        would change.
+
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        keep = set(keep)
+        with self._lock:
+            self._refresh_index()
+            size_before = self.size()
+            if not size_before:
+                return 0
+
+            # Corrupted, duplicate or torn records are dropped as well
+            changed = sum(length for _, length in self._index.values()) != size_before
+            temp_path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(self.path, "rb") as blob_file, open(temp_path, "wb") as temp_file:
+                for blob_hash, (offset, length) in sorted(
+                        self._index.items(), key=lambda item: item[1][0]):
+                    if blob_hash not in keep:
+                        changed = True
+                        continue
+                    blob_file.seek(offset)
+                    line = blob_file.read(length)
+                    if reencode:
+                        encoded = self._reencode(line)
+                        changed = changed or encoded != line
+                        line = encoded
+                    temp_file.write(line)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            if not changed:
+                temp_path.unlink()
+                return 0
+            os.replace(temp_path, self.path)
+
+            self._index.clear()
+            self._indexed_size = 0
+            return size_before - self.size()
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def delete(self) -> bool:
+        with self._lock:
+            self._index.clear()
+            self._indexed_size = 0
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                return False
+            return True
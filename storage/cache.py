@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+
+class CheckpointCache:
+    """Bounded LRU cache of decoded per-thread checkpoint entries.
+
+    Each cached list is stored together with a stamp describing the thread's
+    files when it was read (segment names, sizes, mtimes and the in-process
+    write version). A lookup with a different stamp is a miss, so any write,
+    whether from this process or another one, invalidates the entry.
+
+    Cached lists are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_threads: int = 128):
+        self.max_threads = max_threads
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Hashable, list[dict]]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(
+        self,
+        thread_id: str,
+        stamp: Hashable,
+        count_miss: bool = True,
+    ) -> Optional[list[dict]]:
+        """Return the cached entries of a thread if `stamp` still matches.
+
+        Readers that fall back to reading part of the thread instead of
+        decoding and caching its whole history pass `count_miss=False`, so
+        `misses` only counts the lookups the cache could have served.
+        """
+        with self._lock:
+            cached = self._entries.get(thread_id)
+            if cached is None or cached[0] != stamp:
+                if count_miss:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(thread_id)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, thread_id: str, stamp: Hashable, entries: list[dict]) -> None:
+        if self.max_threads <= 0:
+            return
+
+        with self._lock:
+            self._entries[thread_id] = (stamp, entries)
+            self._entries.move_to_end(thread_id)
+            while len(self._entries) > self.max_threads:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, thread_id: str) -> None:
+        with self._lock:
+            self._entries.pop(thread_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "threads": len(self._entries),
+                "max_threads": self.max_threads,
+            }
@@ -0,0 +1,112 @@
+import base64
+import json
+import zlib
+from typing import Optional
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from loguru import logger
+
+
+# Formats a record can be written in
+RECORD_FORMATS = ("json", "msgpack")
+
+# Keys of the envelope of a record that is not stored as plain JSON
+FORMAT_KEY = "$format"
+COMPRESSION_KEY = "$compression"
+DATA_KEY = "$data"
+
+
+class RecordCodec:
+    """Encodes the records of a segment log as self-describing lines.
+
+    With the default `json` format and no compression a record is a plain
+    compact JSON line, exactly as written before codecs existed. Otherwise
+    the record is serialized with `format` (`msgpack` goes through the
+    LangGraph `serde`), zlib-compressed if it is larger than
+    `compress_threshold` bytes, and stored base64-encoded in a one-line JSON
+    envelope naming its format and compression. Every line carries its own
+    format, so logs written with different settings stay readable.
+
+    `compress` / `decompress` apply the same threshold to other payloads,
+    such as the blobs of a `BlobStore`.
+    """
+
+    def __init__(
+        self,
+        serde: Optional[SerializerProtocol] = None,
+        format: str = "json",
+        compress_threshold: int = 0,
+        compress_level: int = 6,
+    ):
+        if format not in RECORD_FORMATS:
+            raise ValueError(
+                f"Unsupported record format `{format}`, expected one of {RECORD_FORMATS}")
+        self.serde = serde or JsonPlusSerializer()
+        self.format = format
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def compress(self, data: bytes) -> tuple[bytes, Optional[str]]:
+        """Compress a payload above the threshold.
+
+        Returns:
+            tuple[bytes, Optional[str]]: The payload and its compression, None if left as is.
+        """
+        if self.compress_threshold and len(data) > self.compress_threshold:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                return compressed, "zlib"
+        return data, None
+
+    @staticmethod
+    def decompress(data: bytes, compression: Optional[str]) -> bytes:
+        if compression is None:
+            return data
+        if compression == "zlib":
+            return zlib.decompress(data)
+        raise ValueError(f"Unsupported compression `{compression}`")
+
+    @staticmethod
+    def _json(record: dict) -> bytes:
+        return json.dumps(
+            record,
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+
+    def encode(self, record: dict) -> bytes:
+        """Encode a record as a single line."""
+        if self.format == "json":
+            data = self._json(record)
+            value_type = "json"
+        else:
+            value_type, data = self.serde.dumps_typed(record)
+
+        data, compression = self.compress(data)
+        if value_type == "json" and compression is None:
+            return data + b"\n"
+
+        envelope = {FORMAT_KEY: value_type, DATA_KEY: base64.b64encode(data).decode("ascii")}
+        if compression is not None:
+            envelope[COMPRESSION_KEY] = compression
+        return self._json(envelope) + b"\n"
+
+    def decode(self, line: bytes) -> Optional[dict]:
+        """Decode a line in any format, returning None if it is corrupted."""
+        try:
+            record = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        if not isinstance(record, dict) or DATA_KEY not in record:
+            return record
+
+        try:
+            data = self.decompress(
+                base64.b64decode(record[DATA_KEY]), record.get(COMPRESSION_KEY))
+            if record.get(FORMAT_KEY) == "json":
+                return json.loads(data)
+            return self.serde.loads_typed((record[FORMAT_KEY], data))
+        except Exception as error:
+            logger.warning(f"Failed to decode `{record.get(FORMAT_KEY)}` record: {error}")
+            return None
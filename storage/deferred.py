@@ -0,0 +1,388 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from loguru import logger
+
+
+class DeferredCheckpointSaver(BaseCheckpointSaver):
+    """Checkpoint saver wrapper taking checkpoint writes off a run's critical path.
+
+    `aput` and `aput_writes` only queue the checkpoint or writes in memory
+    and return at once; a background task per thread stores the queue in
+    order through the wrapped `saver`, so the steps of a graph run (and the
+    tokens they stream) never wait for the disk. Call `aflush` when a run
+    ends, pauses for approval or fails, to wait until everything it queued
+    is stored: a write error is logged when it happens and raised again by
+    the next `aflush` of the thread.
+
+    Async reads see what was queued before them. Reads of one namespace
+    (`aget_tuple`, and `aget_latest` or `aget_list_page` given a namespace)
+    only wait until the entries queued for that namespace are stored, so a
+    subgraph loading its checkpoint does not wait for the parent graph's
+    queue; `alist` and `aget_latest` of any namespace wait for the thread's
+    whole queue, and `alist_threads` for every queue. The sync methods are
+    passed straight to the wrapped saver and do not see queued writes.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, max_pending: int = 1000):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.max_pending = max_pending
+        # Each entry holds the operation, its arguments, the checkpoint
+        # namespace it writes to and a future set once it is stored
+        self._queues: dict[
+            str, deque[tuple[Callable[..., Awaitable], tuple, str, asyncio.Future]]] = {}
+        self._writers: dict[str, asyncio.Task] = {}
+        self._errors: dict[str, BaseException] = {}
+        self._stats = {
+            "queued": 0,
+            "stored": 0,
+            "failed": 0,
+            "flushes": 0,
+            "flush_seconds": 0.0,
+            "max_flush_seconds": 0.0,
+        }
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    async def _write(self, thread_id: str) -> None:
+        queue = self._queues[thread_id]
+        try:
+            while queue:
+                operation, args, _, stored = queue[0]
+                try:
+                    await operation(*args)
+                    self._stats["stored"] += 1
+                except Exception as error:
+                    self._stats["failed"] += 1
+                    self._errors[thread_id] = error
+                    logger.error(
+                        f"Failed to store deferred checkpoint data of thread `{thread_id}`: {error}")
+                queue.popleft()
+                stored.set_result(None)
+        finally:
+            del self._writers[thread_id]
+            if not queue:
+                del self._queues[thread_id]
+
+    async def _enqueue(
+        self,
+        config: RunnableConfig,
+        operation: Callable[..., Awaitable],
+        *args: Any,
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        loop = asyncio.get_running_loop()
+        queue = self._queues.setdefault(thread_id, deque())
+        queue.append((
+            operation, args, config["configurable"].get("checkpoint_ns") or "",
+            loop.create_future()))
+        self._stats["queued"] += 1
+        if thread_id not in self._writers:
+            self._writers[thread_id] = loop.create_task(self._write(thread_id))
+        if len(queue) >= self.max_pending:
+            # The disk does not keep up, bound the memory held by the queue
+            await asyncio.shield(self._writers[thread_id])
+
+    async def _wait(self, thread_ids: Sequence[str]) -> None:
+        writers = [self._writers[key] for key in thread_ids if key in self._writers]
+        if writers:
+            await asyncio.shield(asyncio.gather(*writers))
+
+    async def _wait_namespace(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Wait until the entries queued for a namespace of a thread are stored."""
+        # The queue is stored in order, the namespace's last entry is stored last
+        stored = next((
+            stored for _, _, entry_ns, stored in reversed(self._queues.get(thread_id, ()))
+            if entry_ns == checkpoint_ns
+        ), None)
+        if stored is not None:
+            await asyncio.shield(stored)
+
+    async def aflush(self, thread_id: Optional[str] = None) -> None:
+        """Wait until the queued checkpoints and writes are stored.
+
+        Args:
+            thread_id: The thread to flush, None for every thread.
+
+        Raises:
+            Exception: The first error met while storing the thread's data
+                since the last flush.
+        """
+        start = time.perf_counter()
+        if thread_id is not None:
+            thread_ids = [thread_id]
+        else:
+            thread_ids = list({**self._writers, **self._errors})
+        await self._wait(thread_ids)
+
+        seconds = time.perf_counter() - start
+        self._stats["flushes"] += 1
+        self._stats["flush_seconds"] += seconds
+        self._stats["max_flush_seconds"] = max(self._stats["max_flush_seconds"], seconds)
+
+        errors = [self._errors.pop(key) for key in thread_ids if key in self._errors]
+        if errors:
+            raise errors[0]
+
+    def pending(self) -> int:
+        """Return the number of queued operations not stored yet."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> dict[str, Any]:
+        """Return the totals of the operations queued and flushed so far."""
+        return {**self._stats, "pending": self.pending()}
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        """Queue a checkpoint to be stored in the background.
+
+        Args:
+            config: Configuration of the checkpoint.
+            checkpoint: The checkpoint to store.
+            metadata: Metadata of the checkpoint.
+            new_versions: Optional channel versions.
+
+        Returns:
+            RunnableConfig: Updated configuration.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        await self._enqueue(
+            config, self.saver.aput, config, checkpoint, metadata, new_versions)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_id": checkpoint["id"],
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns")
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Queue intermediate writes to be stored in the background.
+
+        Args:
+            config: Configuration of the related checkpoint.
+            writes: List of writes to store.
+            task_id: Identifier for the task creating the writes.
+            task_path: Path of the task creating the writes.
+        """
+        await self._enqueue(
+            config, self.saver.aput_writes, config, list(writes), task_id, task_path)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Asynchronously fetch a checkpoint tuple once the entries queued for
+        its namespace are stored.
+
+        Args:
+            config: Configuration specifying which checkpoint to retrieve.
+
+        Returns:
+            Optional[CheckpointTuple]: The requested checkpoint tuple, or None if not found.
+        """
+        await self._wait_namespace(
+            config["configurable"]["thread_id"],
+            config["configurable"].get("checkpoint_ns") or "")
+        return await self.saver.aget_tuple(config)
+
+    async def aget_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None = None,
+    ) -> CheckpointTuple | None:
+        """Asynchronously return the newest checkpoint of a thread or namespace
+        once the entries queued for it are stored.
+
+        Args:
+            thread_id: The ID of the thread.
+            checkpoint_ns: The exact namespace ("" for the root graph), None
+                for the newest checkpoint of any namespace.
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint tuple, or None if there is none.
+        """
+        if checkpoint_ns is None:
+            await self._wait([thread_id])
+        else:
+            await self._wait_namespace(thread_id, checkpoint_ns)
+        return await self.saver.aget_latest(thread_id, checkpoint_ns)
+
+    async def aget_list_page(
+        self,
+        config: RunnableConfig,
+        channel: str,
+        start: int = 0,
+        end: int | None = None,
+    ) -> tuple[RunnableConfig, int, list] | None:
+        """Asynchronously return the items `[start:end]` of a list channel of a
+        checkpoint once the entries queued for its namespace are stored.
+
+        Args:
+            config: Configuration specifying which checkpoint to read.
+            channel: The list channel, e.g. "messages".
+            start: Index of the first item to return.
+            end: Index after the last item to return, None for the end of the list.
+
+        Returns:
+            Optional[tuple[RunnableConfig, int, list]]: The config of the
+            checkpoint, the length of the list and the requested items, or
+            None if the checkpoint is not found.
+        """
+        await self._wait_namespace(
+            config["configurable"]["thread_id"],
+            config["configurable"].get("checkpoint_ns") or "")
+        return await self.saver.aget_list_page(config, channel, start, end)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Asynchronously list checkpoint tuples once the thread's queue is stored.
+
+        Args:
+            config: Configuration specifying which checkpoints to list.
+            filter: Optional filter criteria.
+            before: Optional configuration to list checkpoints before.
+            limit: Optional limit on number of checkpoints to return.
+
+        Returns:
+            AsyncIterator[CheckpointTuple]: An async iterator of checkpoint tuples, newest first.
+        """
+        await self._wait(
+            [config["configurable"]["thread_id"]] if config else list(self._writers))
+        async for checkpoint_tuple in self.saver.alist(
+                config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Asynchronously delete a thread once its queued data is stored.
+
+        Args:
+            thread_id: The ID of the thread to delete.
+        """
+        try:
+            await self.aflush(thread_id)
+        except Exception as error:
+            logger.warning(f"Deleting thread `{thread_id}` despite a failed write: {error}")
+        await self.saver.adelete_thread(thread_id)
+
+    async def adelete_all(self) -> None:
+        """Asynchronously delete all threads once the queued data is stored."""
+        try:
+            await self.aflush()
+        except Exception as error:
+            logger.warning(f"Deleting all threads despite a failed write: {error}")
+        await self.saver.adelete_all()
+
+    def list_threads(
+        self,
+        match: Callable[[dict[str, Any]], bool] | None = None,
+        before: tuple[float, str | None] | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        return self.saver.list_threads(match, before, limit)
+
+    async def alist_threads(
+        self,
+        match: Callable[[dict[str, Any]], bool] | None = None,
+        before: tuple[float, str | None] | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Asynchronously return the entries of the stored threads once the
+        queued data is stored.
+
+        Args:
+            match: Returns whether an entry is listed, all are by default.
+            before: Only list the entries older than this
+                `(updated_at, thread_id)` cursor.
+            limit: Maximum number of entries to return.
+
+        Returns:
+            list[dict[str, Any]]: The entries, most recently updated first.
+        """
+        await self._wait(list(self._writers))
+        return await self.saver.alist_threads(match, before, limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.saver.put_writes(config, writes, task_id, task_path)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.saver.get_tuple(config)
+
+    def get_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None = None,
+    ) -> CheckpointTuple | None:
+        return self.saver.get_latest(thread_id, checkpoint_ns)
+
+    def get_list_page(
+        self,
+        config: RunnableConfig,
+        channel: str,
+        start: int = 0,
+        end: int | None = None,
+    ) -> tuple[RunnableConfig, int, list] | None:
+        return self.saver.get_list_page(config, channel, start, end)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        yield from self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+
+    def delete_all(self) -> None:
+        self.saver.delete_all()
+
+    def close(self) -> None:
+        if self.pending():
+            logger.warning(
+                f"Closing checkpoint saver with {self.pending()} deferred operation(s) not stored")
+        self.saver.close()
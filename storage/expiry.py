@@ -0,0 +1,118 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from loguru import logger
+
+
+class SessionCollector:
+    """Background task deleting sessions that were not written for `ttl` seconds.
+
+    Every `interval` seconds the saver's `list_threads` is scanned for threads
+    whose `updated_at` is older than the TTL. They are deleted one at a time
+    on a dedicated worker thread, `batch_size` per batch with a pause of
+    `batch_pause` seconds between batches, so a large backlog of expired
+    sessions is spread over time instead of competing with live requests
+    for the disk. The saver's `expire_thread` checks the last write time again
+    under the thread's write lock, so a session resumed in the meantime is
+    never deleted.
+    """
+
+    def __init__(
+        self,
+        saver: Any,
+        ttl: float,
+        interval: float = 600.0,
+        batch_size: int = 50,
+        batch_pause: float = 1.0,
+    ):
+        self.saver = saver
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="session-gc")
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "passes": 0,
+            "sessions_expired": 0,
+            "total_seconds": 0.0,
+            "last_pass_seconds": 0.0,
+            "last_pass_expired": 0,
+            "last_pass_at": None,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def arun_once(self) -> dict[str, Any]:
+        """Delete the sessions that expired, batch by batch.
+
+        Returns:
+            dict[str, Any]: `expired` sessions and `seconds` taken.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        cutoff = time.time() - self.ttl
+        threads = await loop.run_in_executor(self._executor, self.saver.list_threads)
+        candidates = [
+            entry["thread_id"] for entry in threads
+            if (entry.get("updated_at") or 0) < cutoff
+        ]
+
+        expired = 0
+        for batch_start in range(0, len(candidates), self.batch_size):
+            if batch_start:
+                await asyncio.sleep(self.batch_pause)
+            for thread_id in candidates[batch_start:batch_start + self.batch_size]:
+                try:
+                    if await loop.run_in_executor(
+                            self._executor, self.saver.expire_thread, thread_id, cutoff):
+                        expired += 1
+                except Exception as error:
+                    logger.error(f"Failed to expire session `{thread_id}`: {error}")
+
+        seconds = time.perf_counter() - start
+        self._stats["passes"] += 1
+        self._stats["sessions_expired"] += expired
+        self._stats["total_seconds"] += seconds
+        self._stats["last_pass_seconds"] = seconds
+        self._stats["last_pass_expired"] = expired
+        self._stats["last_pass_at"] = time.time()
+        if expired:
+            logger.info(f"Expired {expired} session(s) in {seconds:.2f} s")
+        return {"expired": expired, "seconds": seconds}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.arun_once()
+            except Exception as error:
+                logger.error(f"Session garbage collection pass failed: {error}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start collecting expired sessions periodically on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                f"Session garbage collector started (TTL {self.ttl} s, every {self.interval} s)")
+
+    async def stop(self) -> None:
+        """Stop the periodic collection, waiting for a running deletion to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+        logger.info("Session garbage collector stopped")
+
+    def stats(self) -> dict[str, Any]:
+        """Return the totals of the passes run so far."""
+        return dict(self._stats)
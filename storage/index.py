@@ -0,0 +1,204 @@
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Optional
+
+from loguru import logger
+
+from .locks import file_lock
+from .segments import Position, SegmentLog
+
+
+class CheckpointIndex:
+    """Persistent checkpoint id -> log position index of one thread.
+
+    Every checkpoint and writes record appended to the thread's segment log
+    gets a `{"id", "segment", "offset"}` line in `{thread_id}.index.jsonl`,
+    so a checkpoint can be located without scanning the log. The index is
+    kept in memory and extended incrementally from the end of the file, like
+    the blob store's.
+
+    Records missing from the index, because the log was written before the
+    index existed or a crash happened between the two appends, are indexed
+    by scanning the log forward from the newest indexed position. Index lines
+    are self-contained, so appends from several processes can interleave;
+    a full rebuild replaces the file and is done under `lock_path`, the
+    lock writers of the thread hold.
+    """
+
+    def __init__(self, path: Path, lock_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.lock_path = lock_path
+        self._checkpoints: dict[str, Position] = {}
+        self._writes: defaultdict[str, list[Position]] = defaultdict(list)
+        self._last: Optional[Position] = None
+        self._indexed_size = 0
+        self._indexed_inode: Optional[int] = None
+        self._lock = Lock()
+
+    @staticmethod
+    def _line(record: dict, position: Position) -> dict:
+        line = {
+            "id": record.get("checkpoint_id"),
+            "segment": position[0],
+            "offset": position[1],
+        }
+        if record.get("type") == "writes":
+            line["type"] = "writes"
+        return line
+
+    def _add(self, line: dict) -> None:
+        position = (line["segment"], line["offset"])
+        if line.get("type") == "writes":
+            if position not in self._writes[line["id"]]:
+                self._writes[line["id"]].append(position)
+        else:
+            self._checkpoints[line["id"]] = position
+        if self._last is None or position > self._last:
+            self._last = position
+
+    def _clear(self) -> None:
+        self._checkpoints.clear()
+        self._writes.clear()
+        self._last = None
+        self._indexed_size = 0
+        self._indexed_inode = None
+
+    def _refresh(self) -> None:
+        """Load the index lines appended to the file since the last refresh."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._clear()
+            return
+
+        size = stat.st_size
+        if size < self._indexed_size or stat.st_ino != self._indexed_inode:
+            # The file was rewritten or replaced, load it from scratch
+            self._clear()
+            self._indexed_inode = stat.st_ino
+        if size == self._indexed_size:
+            return
+
+        with open(self.path, "rb") as index_file:
+            index_file.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in index_file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self._add(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError, KeyError):
+                    logger.warning(f"Corrupted index record in: `{self.path}`")
+                offset += len(line)
+            self._indexed_size = offset
+
+    @staticmethod
+    def _encode(lines: list[dict]) -> bytes:
+        return b"".join(
+            json.dumps(line, separators=(",", ":")).encode("utf-8") + b"\n"
+            for line in lines
+        )
+
+    def _append(self, lines: list[dict]) -> None:
+        with open(self.path, "ab") as index_file:
+            index_file.write(self._encode(lines))
+        for line in lines:
+            self._add(line)
+
+    def _sync(self, log: SegmentLog) -> None:
+        """Index the log records written after the newest indexed position."""
+        self._refresh()
+        lines = [
+            self._line(record, position)
+            for position, record in log.iter_positioned(self._last)
+            if position != self._last
+        ]
+        if lines:
+            logger.info(f"Indexed {len(lines)} checkpoint record(s) in `{self.path}`")
+            self._append(lines)
+
+    def add(self, records: Iterable[dict], positions: Iterable[Position]) -> None:
+        """Index records that were just appended to the log."""
+        with self._lock:
+            self._refresh()
+            self._append([
+                self._line(record, position)
+                for record, position in zip(records, positions)
+            ])
+
+    def checkpoint_position(self, checkpoint_id: str, log: SegmentLog) -> Optional[Position]:
+        """Return the log position of a checkpoint, None if it does not exist."""
+        with self._lock:
+            self._sync(log)
+            position = self._checkpoints.get(checkpoint_id)
+            if position is not None and self._verify(log, position, checkpoint_id):
+                return position
+
+            # Unknown or stale, rebuild the whole index once before giving up
+            self._rebuild(log)
+            return self._checkpoints.get(checkpoint_id)
+
+    def writes_positions(self, checkpoint_id: str, log: SegmentLog) -> list[Position]:
+        """Return the log positions of the writes records of a checkpoint, oldest first."""
+        with self._lock:
+            self._sync(log)
+            return sorted(self._writes.get(checkpoint_id, []))
+
+    @staticmethod
+    def _verify(log: SegmentLog, position: Position, checkpoint_id: str) -> bool:
+        record = log.read_at(position)
+        return record is not None and record.get("checkpoint_id") == checkpoint_id
+
+    def _rebuild(self, log: SegmentLog) -> None:
+        """Index the whole log again, replacing the file through a rename."""
+        if self.lock_path is None:
+            self._rebuild_locked(log)
+            return
+        with file_lock(self.lock_path):
+            self._rebuild_locked(log)
+
+    def _rebuild_locked(self, log: SegmentLog) -> None:
+        lines = [
+            self._line(record, position)
+            for position, record in log.iter_positioned()
+        ]
+        self._write(lines)
+        logger.info(f"Rebuilt checkpoint index `{self.path}` ({len(lines)} records)")
+
+    def _write(self, lines: list[dict]) -> None:
+        """Replace the file with the given lines through a rename."""
+        self._clear()
+        temp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(temp_path, "wb") as index_file:
+            index_file.write(self._encode(lines))
+        os.replace(temp_path, self.path)
+
+        for line in lines:
+            self._add(line)
+        stat = self.path.stat()
+        self._indexed_size = stat.st_size
+        self._indexed_inode = stat.st_ino
+
+    def replace(self, records: Iterable[dict], positions: Iterable[Position]) -> None:
+        """Replace the whole index with the given records, e.g. after the log
+        was compacted. The caller must hold `lock_path`."""
+        with self._lock:
+            self._write([
+                self._line(record, position)
+                for record, position in zip(records, positions)
+            ])
+
+    def _delete_file(self) -> bool:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self) -> bool:
+        with self._lock:
+            self._clear()
+            return self._delete_file()
@@ -1,28 +1,172 @@
-from contextlib import contextmanager
 from langgraph.checkpoint.base import (
     BaseCheckpointSaver,
     CheckpointTuple,
     Checkpoint,
     CheckpointMetadata,
     ChannelVersions,
-    get_checkpoint_metadata
+    WRITES_IDX_MAP,
+    get_checkpoint_metadata,
+    writes_sort_key,
 )
 from langchain_core.runnables import RunnableConfig
-from typing import Optional, Iterator, AsyncIterator, Any, Sequence
-from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, AsyncIterator, Any, Sequence
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Lock
+import asyncio
+import base64
+import hashlib
 import json
+import os
+import time
 
 from pathlib import Path
 from loguru import logger
 
+from .blobs import LIST_REF, BlobStore, blob_refs
+from .cache import CheckpointCache
+from .codecs import RecordCodec
+from .index import CheckpointIndex
+from .locks import file_lock
+from .manifest import ThreadManifest
+from .retention import RetentionPolicy
+from .segments import Position, SegmentLog, DEFAULT_MAX_SEGMENT_BYTES, SEGMENT_NAME
+
 
 class LocalCheckpointSaver(BaseCheckpointSaver):
-    def __init__(self, db_path: str):
+    """Checkpoint saver storing each thread as an append-only segment log.
+
+    Every checkpoint is appended as one JSON line to `{thread_id}.NNNNNN.jsonl`,
+    so a write costs O(checkpoint) instead of rewriting the whole thread
+    history. The files of a thread live in a hash-sharded directory
+    `db_path/ab/cd/` (first bytes of the hash of the thread id), so no
+    directory grows with the number of sessions. Threads written by older
+    versions, as a single `{thread_id}.json` array or as segments directly in
+    `db_path`, are still readable and are moved to the current layout on
+    their next write.
+
+    `manifest.jsonl` (see `ThreadManifest`) holds one entry per thread with
+    its last checkpoint id, last update time and size. `list_threads` and
+    `delete_all` read it instead of walking the directory tree. The entry
+    also points at the newest checkpoint of every namespace (`latest`), so
+    `get_latest` finds it through the index without scanning the log.
+    Given a `session_fields` callable, the fields it returns for every
+    stored checkpoint (e.g. the user or node of a session) are merged into
+    the thread's entry too, so sessions can be searched without reading
+    their checkpoints.
+
+    Non-primitive channel values (messages, tool outputs, ...) and pending
+    write values are serialized with `self.serde` into a per-thread
+    content-addressed `BlobStore` and referenced by hash, so unchanged
+    messages are stored once instead of once per checkpoint.
+
+    Decoded thread histories are kept in a bounded LRU cache (`self.cache`)
+    so that the repeated `list` calls of a single turn parse the
+    thread files only once.
+
+    `list` yields checkpoints newest first by reading the log backwards and
+    stops once `limit` checkpoints were produced. A `before` cursor is
+    resolved through the thread's `CheckpointIndex` (`{thread_id}.index.jsonl`),
+    which maps checkpoint ids to log positions.
+
+    Pending writes of a super-step are appended to the same log as `writes`
+    records right after they are produced, and the segments holding them are
+    fsynced once per super-step, when the next checkpoint is stored. They
+    can land before their checkpoint, which LangGraph stores from another
+    task, so a checkpoint's writes are found by id through the index rather
+    than by their place in the log. The newest checkpoint is returned with
+    its `pending_writes` so that resuming an interrupted super-step skips the
+    tasks that already finished.
+
+    With `snapshot_interval` > 1, checkpoints are stored as deltas: a record
+    only holds the channels listed in `new_versions` plus the names of all
+    channels present (`channel_keys`), and is rebuilt by walking its
+    `parent_checkpoint_id` chain back to the last full snapshot. A full
+    snapshot is written every `snapshot_interval` checkpoints of a chain, and
+    whenever the parent is not the last checkpoint this process stored in
+    that namespace, so reconstruction never reads more than
+    `snapshot_interval` records.
+
+    Writes of a thread are serialized by a per-thread lock and go through a
+    group commit queue: checkpoints and writes queued while another write of
+    the same thread is in progress are appended together by the next writer,
+    with one write and at most one fsync. The per-thread lock is backed by
+    an `fcntl` advisory lock on `{thread_id}.lock`, so several processes
+    (e.g. uvicorn workers) can share `db_path`. Readers take no lock: torn
+    records at the tail of a file are skipped until their write completes.
+    Async methods run on a dedicated,
+    bounded I/O thread pool (`io_workers` threads) instead of the event
+    loop's default executor; call `close` to shut it down.
+
+    Records are written by a `RecordCodec`: compact JSON lines by default,
+    or `record_format="msgpack"` through `self.serde`, and zlib-compressed
+    above `compress_threshold` bytes (0 disables compression), blobs
+    included. Each line records its own format, so changing these settings
+    never makes existing threads unreadable.
+
+    `compact_thread` enforces a `RetentionPolicy` on a thread by rewriting
+    its kept checkpoints into a new segment; `CheckpointCompactor` runs it
+    in the background. `rewrite_thread`, which it is built on, also drops
+    duplicate and incomplete records and re-encodes a thread with the
+    current codec; `python -m storage.migrate` runs it over a whole store.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+        cache_size: int = 128,
+        blob_store_cache_size: int = 256,
+        snapshot_interval: int = 16,
+        io_workers: int = 8,
+        record_format: str = "json",
+        compress_threshold: int = 0,
+        session_fields: Callable[[str, Checkpoint, CheckpointMetadata], dict[str, Any]] | None = None,
+    ):
+        super().__init__()
         self.db_path = db_path
+        self.max_segment_bytes = max_segment_bytes
+        self.snapshot_interval = snapshot_interval
+        self.session_fields = session_fields
+        self.codec = RecordCodec(
+            self.serde, format=record_format, compress_threshold=compress_threshold)
+        self.cache = CheckpointCache(max_threads=cache_size)
+
+        # Open blob stores keep their hash index in memory, bound their number
+        self.blob_store_cache_size = blob_store_cache_size
+        self._blob_stores: OrderedDict[str, BlobStore] = OrderedDict()
+        self._blob_stores_lock = Lock()
+        self._indexes: OrderedDict[str, CheckpointIndex] = OrderedDict()
+        self._indexes_lock = Lock()
+
+        # Bumped on every write of this process, part of the cache stamp
+        self._write_versions: defaultdict[str, int] = defaultdict(int)
+        self._write_versions_lock = Lock()
+
+        # Per-thread write locks with the number of their users, dropped once
+        # unused, and group commit queues
+        self._thread_locks: dict[str, tuple[Lock, int]] = {}
+        self._queues: defaultdict[str, list[tuple[Callable, Future]]] = defaultdict(list)
+        self._queues_lock = Lock()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=io_workers, thread_name_prefix="checkpoint-io")
+
+        # Segments holding writes that have not been fsynced yet, per thread
+        self._unsynced_segments: defaultdict[str, set[Path]] = defaultdict(set)
+
+        # Last checkpoint stored per (thread, namespace), its distance to the
+        # previous full snapshot and its segment (None until written), used
+        # to decide when to write a delta
+        self._chain_heads: dict[tuple[str, str | None], tuple[str, int, Path | None]] = {}
+        self._chain_heads_lock = Lock()
 
         if not self.db_path:
             raise ValueError("db_path must be provided")
 
+        self.manifest = ThreadManifest(Path(self.db_path) / "manifest.jsonl")
+
         # Check if the database folder exists, if not create it
         db_folder = Path(self.db_path)
         if not db_folder.exists():
@@ -32,56 +176,397 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
             logger.info(
                 f"Database folder created successfully at: `{db_folder}`")
 
+        if not self.manifest.exists():
+            # Stores written before the manifest existed are indexed once
+            self.manifest.replace(self._scan_threads())
+
         logger.info(f"Using database path: `{self.db_path}`")
 
-    def dump_json_messages(self, messages):
-        json_messages = []
-        for msg in messages:
-            if isinstance(msg, dict):
-                json_messages.append(msg)
-            elif hasattr(msg, "model_dump"):
-                json_messages.append(msg.model_dump())
-            else:
-                logger.warning(f"Message of unsupported type: {type(msg)}")
-        return json_messages
+    def _shard_dir(self, thread_id: str) -> Path:
+        digest = hashlib.blake2b(thread_id.encode("utf-8"), digest_size=8).hexdigest()
+        return Path(self.db_path) / digest[:2] / digest[2:4]
 
-    def put(
+    def _thread_dir(self, thread_id: str) -> Path:
+        """Return the directory holding the files of a thread.
+
+        Threads whose first segment is still directly in `db_path` predate
+        sharding and are read from there until their next write moves them.
+        """
+        db_folder = Path(self.db_path)
+        if SegmentLog(db_folder, thread_id).segment_path(1).exists():
+            return db_folder
+        return self._shard_dir(thread_id)
+
+    def _thread_log(self, thread_id: str) -> SegmentLog:
+        return SegmentLog(
+            self._thread_dir(thread_id),
+            thread_id,
+            max_segment_bytes=self.max_segment_bytes,
+            codec=self.codec
+        )
+
+    def _blob_store(self, thread_id: str) -> BlobStore:
+        # Keyed by path, a store left behind by a layout change just ages out
+        path = self._thread_dir(thread_id) / f"{thread_id}.blobs.jsonl"
+        with self._blob_stores_lock:
+            blob_store = self._blob_stores.get(path)
+            if blob_store is None:
+                blob_store = BlobStore(path, self.serde, self.codec)
+                self._blob_stores[path] = blob_store
+            self._blob_stores.move_to_end(path)
+            while len(self._blob_stores) > self.blob_store_cache_size:
+                self._blob_stores.popitem(last=False)
+            return blob_store
+
+    def _checkpoint_index(self, thread_id: str) -> CheckpointIndex:
+        path = self._thread_dir(thread_id) / f"{thread_id}.index.jsonl"
+        with self._indexes_lock:
+            index = self._indexes.get(path)
+            if index is None:
+                index = CheckpointIndex(
+                    path, lock_path=self._lock_file_path(thread_id))
+                self._indexes[path] = index
+            self._indexes.move_to_end(path)
+            while len(self._indexes) > self.blob_store_cache_size:
+                self._indexes.popitem(last=False)
+            return index
+
+    def _migrate_flat_files(self, thread_id: str) -> None:
+        """Move the files of a thread stored directly in `db_path` to its
+        shard directory. The first segment goes last, as it marks the layout."""
+        db_folder = Path(self.db_path)
+        flat_log = SegmentLog(db_folder, thread_id)
+        if not flat_log.segment_path(1).exists():
+            return
+
+        shard_dir = self._shard_dir(thread_id)
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        segments = flat_log.segments()
+        paths = [
+            *segments[1:],
+            db_folder / f"{thread_id}.blobs.jsonl",
+            db_folder / f"{thread_id}.index.jsonl",
+            *segments[:1],
+        ]
+        for path in paths:
+            if path.exists():
+                os.replace(path, shard_dir / path.name)
+        # Written by versions that kept lock files next to the segments
+        (db_folder / f"{thread_id}.lock").unlink(missing_ok=True)
+        logger.info(f"Moved thread `{thread_id}` to shard directory: `{shard_dir}`")
+
+    def _thread_size(self, thread_id: str) -> int:
+        thread_dir = self._thread_dir(thread_id)
+        size = SegmentLog(thread_dir, thread_id).size()
+        for name in (f"{thread_id}.blobs.jsonl", f"{thread_id}.index.jsonl"):
+            try:
+                size += (thread_dir / name).stat().st_size
+            except FileNotFoundError:
+                pass
+        legacy_file_path = self._legacy_file_path(thread_id)
+        if legacy_file_path.exists():
+            size += legacy_file_path.stat().st_size
+        return size
+
+    @staticmethod
+    def stored_thread_ids(db_path: str) -> set[str]:
+        """Return the ids of the threads stored under `db_path`, in any layout,
+        by walking the directory tree."""
+        db_folder = Path(db_path)
+        thread_ids = {path.stem for path in db_folder.glob("*.json")}
+        for pattern in ("*.jsonl", "*/*/*.jsonl"):
+            for path in db_folder.glob(pattern):
+                match = SEGMENT_NAME.match(path.name)
+                if match:
+                    thread_ids.add(match.group(1))
+        return thread_ids
+
+    def _scan_threads(self) -> list[dict[str, Any]]:
+        """Build manifest entries by walking `db_path`, for stores written
+        before the manifest existed."""
+        entries = []
+        for thread_id in sorted(self.stored_thread_ids(self.db_path)):
+            latest_entry = self._read_latest_entry(thread_id)
+            log = self._thread_log(thread_id)
+            paths = [*log.segments(), self._legacy_file_path(thread_id)]
+            entries.append({
+                "thread_id": thread_id,
+                "checkpoint_id": (latest_entry or {}).get("checkpoint_id"),
+                "updated_at": max(
+                    (path.stat().st_mtime for path in paths if path.exists()),
+                    default=time.time()),
+                "size": self._thread_size(thread_id),
+            })
+
+        if entries:
+            logger.info(f"Indexed {len(entries)} existing thread(s) in the manifest")
+        return entries
+
+    def list_threads(
         self,
-        config: RunnableConfig,
-        checkpoint: Checkpoint,
-        metadata: CheckpointMetadata,
-        new_versions: ChannelVersions = None,
-    ) -> RunnableConfig:
+        match: Callable[[dict[str, Any]], bool] | None = None,
+        before: tuple[float, str | None] | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return the manifest entries of the stored threads, most recently
+        updated first (ties ordered by thread id, descending).
+
+        Each entry holds `thread_id`, `checkpoint_id` (last checkpoint),
+        `updated_at` (UNIX time of the last write) and `size` (bytes on disk),
+        plus the latest `session_fields` of the thread. Only the entries
+        `match` accepts and, with a `before` cursor `(updated_at, thread_id)`,
+        those older than it are returned, at most `limit` of them; only
+        the returned entries are copied out of the manifest.
+        """
+        return self.manifest.newest(match, before, limit)
 
-        thread_id = config["configurable"]["thread_id"]
+    async def alist_threads(
+        self,
+        match: Callable[[dict[str, Any]], bool] | None = None,
+        before: tuple[float, str | None] | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Asynchronously return the manifest entries of the stored threads.
 
-        checkpoint_id = config["configurable"].get("checkpoint_id")
-        checkpoint_ns = config["configurable"].get("checkpoint_ns")
+        Args:
+            match: Returns whether an entry is listed, all are by default.
+            before: Only list the entries older than this
+                `(updated_at, thread_id)` cursor.
+            limit: Maximum number of entries to return.
 
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
+        Returns:
+            list[dict[str, Any]]: The entries, most recently updated first.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.list_threads, match, before, limit)
 
-        checkpoints = []
-        # Check if database file exists
-        if not db_file_path.exists():
-            logger.info(
-                f"Database file does not exist. Creating: `{db_file_path}`")
-            logger.info(
-                f"Database file created successfully at: `{db_file_path}`")
+    def _legacy_file_path(self, thread_id: str) -> Path:
+        return Path(self.db_path) / f"{thread_id}.json"
 
-        else:
-            logger.info(f"Loading existing database file: `{db_file_path}`")
-            with open(db_file_path, "r") as db_file:
-                try:
-                    checkpoints = json.load(db_file)
-                    logger.info(
-                        f"Loaded {len(checkpoints)} existing checkpoints from database.")
-                except json.JSONDecodeError:
-                    logger.warning(
-                        f"Database file `{db_file_path}` is empty or corrupted. Starting fresh.")
-                    checkpoints = []
+    @staticmethod
+    def _upgrade_legacy_entry(entry: dict) -> dict:
+        """Convert an entry of the legacy JSON array to the segment record layout.
+
+        Legacy entries stored the *parent* checkpoint id under `checkpoint_id`.
+        """
+        checkpoint = entry.get("checkpoint") or {}
+        return {
+            **entry,
+            "checkpoint_id": checkpoint.get("id"),
+            "parent_checkpoint_id": entry.get("checkpoint_id"),
+        }
+
+    def _read_legacy_entries(self, thread_id: str) -> list[dict]:
+        legacy_file_path = self._legacy_file_path(thread_id)
+        if not legacy_file_path.exists():
+            return []
 
+        logger.info(f"Loading legacy database file: `{legacy_file_path}`")
+        with open(legacy_file_path, "r") as db_file:
+            try:
+                entries = json.load(db_file)
+            except json.JSONDecodeError:
+                logger.warning(
+                    f"Database file `{legacy_file_path}` is empty or corrupted.")
+                return []
+
+        return [self._upgrade_legacy_entry(entry) for entry in entries]
+
+    def _migrate_legacy_file(
+        self,
+        thread_id: str,
+        log: SegmentLog,
+        verify: bool = False,
+    ) -> bool:
+        """Move a legacy `{thread_id}.json` array into the thread's segment log.
+
+        With `verify`, the records read back from the new segment are compared
+        with the legacy entries, and the legacy file is kept if they differ.
+
+        Returns:
+            bool: Whether a legacy file was converted.
+        """
+        legacy_file_path = self._legacy_file_path(thread_id)
+        if log.exists() or not legacy_file_path.exists():
+            return False
+
+        entries = self._read_legacy_entries(thread_id)
+        if entries:
+            segment_path, _ = log.write_segment(1, entries)
+            if verify and list(log.iter_records()) != entries:
+                segment_path.unlink()
+                raise ValueError(
+                    f"Converted legacy history of thread `{thread_id}` does not match the original")
+        legacy_file_path.unlink()
         logger.info(
-            f"Storing checkpoint for thread_id `{thread_id}` at `{db_file_path}`...")
+            f"Migrated {len(entries)} legacy checkpoints of thread `{thread_id}` to segment log.")
+        return True
+
+    def _bump_write_version(self, thread_id: str) -> None:
+        with self._write_versions_lock:
+            self._write_versions[thread_id] += 1
+        self.cache.invalidate(thread_id)
+
+    def _thread_stamp(self, thread_id: str, log: SegmentLog) -> tuple:
+        """Describe the current on-disk state of a thread for cache validation."""
+        files = []
+        for path in [*log.segments(), self._legacy_file_path(thread_id)]:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((path.name, stat.st_size, stat.st_mtime_ns))
+
+        with self._write_versions_lock:
+            write_version = self._write_versions.get(thread_id, 0)
+        return write_version, tuple(files)
+
+    def _read_entries(self, thread_id: str) -> list[dict] | None:
+        """Load every stored entry of a thread, oldest first.
+
+        Returns:
+            list[dict] | None: The entries, or None if the thread does not exist.
+        """
+        log = self._thread_log(thread_id)
+        stamp = self._thread_stamp(thread_id, log)
+        if not stamp[1]:
+            logger.warning(f"No checkpoints stored for thread: `{thread_id}`")
+            return None
+
+        entries = self.cache.get(thread_id, stamp)
+        if entries is not None:
+            logger.debug(f"Checkpoint cache hit for thread: `{thread_id}`")
+            return entries
+
+        if log.exists():
+            entries = list(self._materialize_all(log.iter_records()))
+        else:
+            entries = self._read_legacy_entries(thread_id)
+
+        self.cache.put(thread_id, stamp, entries)
+        return entries
+
+    @staticmethod
+    def _is_writes(record: dict) -> bool:
+        return record.get("type") == "writes"
+
+    def _read_latest_entry(self, thread_id: str) -> dict | None:
+        """Load only the newest checkpoint entry of a thread by seeking from the
+        log tail."""
+        log = self._thread_log(thread_id)
+        if log.exists():
+            # Reuse an already decoded history if it is still up to date
+            entries = self.cache.get(
+                thread_id, self._thread_stamp(thread_id, log), count_miss=False)
+            records = log.iter_records_reverse() if entries is None else reversed(entries)
+        else:
+            records = reversed(self._read_entries(thread_id) or [])
+
+        for record in records:
+            if not self._is_writes(record):
+                # Older records follow, the delta chain is resolved from them
+                return self._materialize(thread_id, record, records)
+        return None
+
+    @staticmethod
+    def _is_delta(entry: dict) -> bool:
+        return bool(entry.get("delta_depth"))
+
+    @staticmethod
+    def _full_entry(entry: dict, channel_values: dict) -> dict:
+        """Return a copy of a delta entry holding the given full channel values."""
+        full_entry = {
+            **entry,
+            "checkpoint": {**entry["checkpoint"], "channel_values": channel_values},
+            "delta_depth": 0,
+        }
+        full_entry.pop("channel_keys", None)
+        return full_entry
+
+    def _materialize(
+        self,
+        thread_id: str,
+        entry: dict,
+        older_records: Iterator[dict],
+    ) -> dict:
+        """Rebuild the channel values of a delta entry from its ancestors.
+
+        Args:
+            thread_id: The thread of the entry.
+            entry: The checkpoint entry to rebuild.
+            older_records: The records stored before the entry, newest first.
+
+        Returns:
+            dict: The entry with the (still blob-referenced) values of every channel.
+        """
+        if not self._is_delta(entry):
+            return entry
+
+        channel_keys = entry.get("channel_keys", [])
+        channel_values = dict(entry["checkpoint"].get("channel_values", {}))
+        missing = set(channel_keys) - set(channel_values)
+        checkpoint_ns = entry.get("checkpoint_ns")
+        parent_checkpoint_id = entry.get("parent_checkpoint_id")
+
+        for record in older_records:
+            if not missing:
+                break
+            if (self._is_writes(record)
+                    or record.get("checkpoint_ns") != checkpoint_ns
+                    or record.get("checkpoint_id") != parent_checkpoint_id):
+                continue
+
+            parent_values = record["checkpoint"].get("channel_values", {})
+            for key in missing & parent_values.keys():
+                channel_values[key] = parent_values[key]
+            missing -= parent_values.keys()
+
+            if not self._is_delta(record):
+                break
+            parent_checkpoint_id = record.get("parent_checkpoint_id")
+
+        if missing:
+            logger.warning(
+                f"Channels {sorted(missing)} of checkpoint `{entry.get('checkpoint_id')}` "
+                f"not found in its delta chain for thread: `{thread_id}`")
+
+        return self._full_entry(entry, {
+            key: channel_values[key] for key in channel_keys if key in channel_values
+        })
+
+    def _materialize_all(self, records: Iterable[dict]) -> Iterator[dict]:
+        """Rebuild the delta entries of a thread history read oldest first."""
+        resolved: dict[tuple[str | None, str | None], dict] = {}
+        for record in records:
+            if self._is_writes(record) or record.get("checkpoint") is None:
+                yield record
+                continue
+
+            checkpoint_ns = record.get("checkpoint_ns")
+            if self._is_delta(record):
+                own_values = record["checkpoint"].get("channel_values", {})
+                parent_values = resolved.get(
+                    (checkpoint_ns, record.get("parent_checkpoint_id")), {})
+                record = self._full_entry(record, {
+                    key: own_values[key] if key in own_values else parent_values[key]
+                    for key in record.get("channel_keys", [])
+                    if key in own_values or key in parent_values
+                })
+
+            resolved[(checkpoint_ns, record.get("checkpoint_id"))] = \
+                record["checkpoint"].get("channel_values", {})
+            yield record
+
+    def _build_entry(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions | None = None,
+    ) -> tuple[RunnableConfig, dict]:
+        thread_id = config["configurable"]["thread_id"]
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        checkpoint_ns = config["configurable"].get("checkpoint_ns")
 
         next_config = {
             "configurable": {
@@ -91,141 +576,542 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
             }
         }
 
-        copy = checkpoint.copy()
-        copy["channel_values"] = copy["channel_values"].copy()
+        channel_values = checkpoint["channel_values"]
+        delta_depth = self._delta_depth(
+            thread_id, checkpoint_ns, parent_checkpoint_id, new_versions)
+        if delta_depth:
+            # only the channels updated since the parent checkpoint
+            channel_values = {
+                key: value for key, value in channel_values.items()
+                if key in new_versions
+            }
 
-        # inline primitive values in checkpoint table
-        # others are stored in blobs table
-        blob_values = {}
-        for k, v in checkpoint["channel_values"].items():
-            if v is None or isinstance(v, (str, int, float, bool)):
-                pass
-            else:
-                if k == "tool_message":
-                    copy["channel_values"]["tool_message"] = copy["channel_values"]["tool_message"].tool_calls
-                # elif k == "messages":
-                #     copy["channel_values"]["messages"] = self.dump_json_messages(copy["channel_values"]["messages"])
-                else:
-                    blob_values[k] = copy["channel_values"].pop(k)
+        # inline primitive values in the checkpoint record
+        # others are stored once in the blob store and referenced by hash
+        copy = checkpoint.copy()
+        copy["channel_values"] = self._blob_store(thread_id).dump(channel_values)
 
-        logger.debug(f"Blob values: {blob_values}")
-        logger.info(copy)
-        checkpoints.append({
+        # `metadata` of the run config (e.g. the user id) is stored as well
+        metadata = get_checkpoint_metadata(config, metadata)
+        entry = {
             "thread_id": thread_id,
-            "checkpoint_id": checkpoint_id,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": parent_checkpoint_id,
             "checkpoint_ns": checkpoint_ns,
             "checkpoint": copy,
-            "metadata": metadata
-        })
+            "metadata": metadata,
+            "delta_depth": delta_depth,
+        }
+        if delta_depth:
+            entry["channel_keys"] = list(checkpoint["channel_values"])
+        if self.session_fields is not None:
+            # Only for the manifest, removed before the record is written
+            entry["session"] = self.session_fields(checkpoint_ns or "", checkpoint, metadata)
+        return next_config, entry
+
+    def _delta_depth(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None,
+        parent_checkpoint_id: str | None,
+        new_versions: ChannelVersions | None,
+    ) -> int:
+        """Return the distance of a new checkpoint to its chain's last full
+        snapshot, 0 meaning it must be stored as a full snapshot."""
+        if self.snapshot_interval <= 1 or new_versions is None:
+            return 0
+
+        with self._chain_heads_lock:
+            head = self._chain_heads.get((thread_id, checkpoint_ns))
+        if head is None or head[0] != parent_checkpoint_id:
+            # The parent is unknown to this process, it may not be reachable
+            return 0
+        if head[2] is not None and not head[2].exists():
+            # Its segment was compacted away, possibly by another process
+            return 0
+
+        delta_depth = head[1] + 1
+        return delta_depth if delta_depth < self.snapshot_interval else 0
+
+    @contextmanager
+    def _thread_lock(self, thread_id: str) -> Iterator[None]:
+        with self._queues_lock:
+            lock, users = self._thread_locks.get(thread_id) or (Lock(), 0)
+            self._thread_locks[thread_id] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._queues_lock:
+                lock, users = self._thread_locks[thread_id]
+                if users > 1:
+                    self._thread_locks[thread_id] = (lock, users - 1)
+                else:
+                    del self._thread_locks[thread_id]
 
-        # Write checkpoint and metadata to the file
-        with open(db_file_path, "w") as db_file:
-            json.dump(checkpoints, db_file, indent=4, ensure_ascii=False)
+    def _lock_file_path(self, thread_id: str) -> Path:
+        # Always in the shard directory, whatever the layout of the thread
+        return self._shard_dir(thread_id) / f"{thread_id}.lock"
 
-        logger.info(
-            f"Checkpoint stored successfully for thread_id {thread_id}.")
+    @contextmanager
+    def _write_lock(self, thread_id: str) -> Iterator[None]:
+        """Lock a thread's files against writers of this and other processes."""
+        with self._thread_lock(thread_id), file_lock(self._lock_file_path(thread_id)):
+            yield
 
-        return next_config
+    def _set_chain_head(
+        self,
+        thread_id: str,
+        entry: dict,
+        segment_path: Path | None = None,
+    ) -> None:
+        with self._chain_heads_lock:
+            self._chain_heads[(thread_id, entry.get("checkpoint_ns"))] = (
+                entry["checkpoint_id"], entry.get("delta_depth", 0), segment_path)
 
-    async def aput(
+    def _reset_chain_heads(self, thread_id: str) -> None:
+        with self._chain_heads_lock:
+            for key in [key for key in self._chain_heads if key[0] == thread_id]:
+                del self._chain_heads[key]
+
+    def _write_batch(
+        self,
+        thread_id: str,
+        batch: list[tuple[Callable[[], tuple[Any, dict]], Future]],
+    ) -> None:
+        """Build the records of queued operations and append them with a
+        single write, resolving each operation's future with its result.
+
+        Must be called with the thread's lock held.
+        """
+        self._migrate_flat_files(thread_id)
+        log = self._thread_log(thread_id)
+        self._migrate_legacy_file(thread_id, log)
+
+        records, futures, results = [], [], []
+        session = {}
+        for operation, future in batch:
+            try:
+                result, record = operation()
+            except BaseException as error:
+                future.set_exception(error)
+                continue
+            session.update(record.pop("session", None) or {})
+            if not self._is_writes(record):
+                # Later checkpoints of the batch may be deltas of this one
+                self._set_chain_head(thread_id, record)
+            records.append(record)
+            futures.append(future)
+            results.append(result)
+
+        if not records:
+            return
+
+        try:
+            segment_path, positions = log.append(records)
+            self._checkpoint_index(thread_id).add(records, positions)
+
+            entries = [record for record in records if not self._is_writes(record)]
+            for entry in entries:
+                self._set_chain_head(thread_id, entry, segment_path)
+            if entries:
+                # The super-step is over, make its writes durable with a single fsync
+                unsynced_segments = self._unsynced_segments.pop(thread_id, None)
+                if unsynced_segments:
+                    log.fsync(unsynced_segments | {segment_path})
+            else:
+                self._unsynced_segments[thread_id].add(segment_path)
+        except BaseException as error:
+            # The chain heads may point at checkpoints that were not written
+            self._reset_chain_heads(thread_id)
+            for future in futures:
+                future.set_exception(error)
+            return
+        finally:
+            self._bump_write_version(thread_id)
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+        try:
+            fields = {**session, "updated_at": time.time(), "size": self._thread_size(thread_id)}
+            if entries:
+                fields["checkpoint_id"] = entries[-1]["checkpoint_id"]
+                fields["latest"] = self._latest_pointers(thread_id, log, entries)
+            self.manifest.update(thread_id, **fields)
+        except OSError as error:
+            logger.error(f"Failed to update manifest for thread `{thread_id}`: {error}")
+
+        if entries:
+            logger.info(
+                f"Checkpoint stored successfully for thread_id {thread_id} in `{segment_path}`.")
+        if len(records) > 1:
+            logger.debug(
+                f"Group commit of {len(records)} records for thread: `{thread_id}`")
+
+    def _latest_pointers(
+        self,
+        thread_id: str,
+        log: SegmentLog,
+        entries: list[dict],
+    ) -> dict[str, str]:
+        """Return the newest checkpoint id per namespace of a thread once
+        `entries` are stored, for its manifest entry.
+
+        Threads whose manifest entry predates the pointers are scanned once.
+        Must be called with the thread's lock held.
+        """
+        latest = (self.manifest.get(thread_id) or {}).get("latest")
+        if latest is None:
+            latest = {}
+            for record in log.iter_records_reverse():
+                if not self._is_writes(record) and record.get("checkpoint") is not None:
+                    latest.setdefault(record.get("checkpoint_ns") or "", record["checkpoint_id"])
+        else:
+            latest = dict(latest)
+            for entry in entries:
+                latest[entry.get("checkpoint_ns") or ""] = entry["checkpoint_id"]
+        return latest
+
+    def _commit(self, thread_id: str, operation: Callable[[], tuple[Any, dict]]) -> Any:
+        """Queue a write operation of a thread and wait until it is stored.
+
+        The caller that takes the thread's lock appends every operation queued
+        so far, its own included, in one batch. Callers whose operation was
+        written by an earlier batch find its result ready once they get the
+        lock.
+        """
+        future = Future()
+        with self._queues_lock:
+            self._queues[thread_id].append((operation, future))
+
+        with self._write_lock(thread_id):
+            with self._queues_lock:
+                batch = self._queues.pop(thread_id, [])
+            if batch:
+                try:
+                    self._write_batch(thread_id, batch)
+                except BaseException as error:
+                    for _, pending in batch:
+                        if not pending.done():
+                            pending.set_exception(error)
+
+        return future.result()
+
+    def _build_writes_record(
         self,
         config: RunnableConfig,
-        checkpoint: Checkpoint,
-        metadata: CheckpointMetadata,
-        new_versions: ChannelVersions = None,
-    ) -> RunnableConfig:
-        """Asynchronously store a checkpoint with its metadata.
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str,
+    ) -> dict:
+        thread_id = config["configurable"]["thread_id"]
+        values = self._blob_store(thread_id).dump(
+            {str(idx): value for idx, (_, value) in enumerate(writes)})
 
-        Args:
-            config: Configuration of the checkpoint.
-            checkpoint: The checkpoint to store.
-            metadata: Metadata of the checkpoint.
-            new_versions: Optional channel versions.
+        serialized_writes = [
+            [WRITES_IDX_MAP.get(channel, idx), channel, values[str(idx)]]
+            for idx, (channel, _) in enumerate(writes)
+        ]
+
+        return {
+            "type": "writes",
+            "thread_id": thread_id,
+            "checkpoint_ns": config["configurable"].get("checkpoint_ns"),
+            "checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "task_id": task_id,
+            "task_path": task_path,
+            "writes": serialized_writes,
+        }
+
+    def _pending_writes(
+        self,
+        thread_id: str,
+        entry: dict,
+        writes_records: list[dict],
+    ) -> list[tuple[str, str, Any]]:
+        """Collect the pending writes of a checkpoint entry from writes records.
+
+        Follows the semantics of LangGraph's in-memory saver: a regular write
+        is kept the first time a task stores it, a special write (error,
+        interrupt, ...) is replaced by later ones.
+        """
+        pending = {}
+        for record in writes_records:
+            if (record.get("checkpoint_id") != entry.get("checkpoint_id")
+                    or record.get("checkpoint_ns") != entry.get("checkpoint_ns")):
+                continue
+
+            task_id = record["task_id"]
+            for idx, channel, *value in record["writes"]:
+                key = (task_id, idx)
+                if idx >= 0 and key in pending:
+                    continue
+                pending[key] = (
+                    record.get("task_path", ""), task_id, idx, channel, value
+                )
+
+        pending_writes = []
+        for _, task_id, _, channel, value in sorted(
+                pending.values(), key=lambda write: writes_sort_key(*write[:3])):
+            if len(value) == 2:
+                # Written inline as (type, base64) before the blob store existed
+                value = self.serde.loads_typed(
+                    (value[0], base64.b64decode(value[1])))
+            else:
+                value = self._blob_store(thread_id).load(
+                    {"value": value[0]})["value"]
+            pending_writes.append((task_id, channel, value))
+
+        return pending_writes
+
+    @staticmethod
+    def _matches_filter(entry: dict, filter: dict[str, Any] | None) -> bool:
+        if not filter:
+            return True
+
+        checkpoint_id = entry.get("checkpoint_id")
+        checkpoint_ns = entry.get("checkpoint_ns")
+        checkpoint = entry.get("checkpoint")
+        metadata = entry.get("metadata")
+
+        for key, value in filter.items():
+            if key == "checkpoint_id":
+                if checkpoint_id != value:
+                    return False
+            elif key == "checkpoint_ns":
+                if not checkpoint_ns or checkpoint_ns not in value:
+                    return False
+            elif key in metadata:
+                if metadata.get(key) != value:
+                    return False
+            elif key in checkpoint:
+                if checkpoint.get(key) != value:
+                    return False
+            else:
+                # Check in channel_values for custom fields
+                channel_values = checkpoint.get("channel_values", {})
+                if key not in channel_values or channel_values.get(key) != value:
+                    return False
+
+        return True
+
+    def _load_checkpoint(self, thread_id: str, checkpoint: dict) -> Checkpoint:
+        """Return a copy of a stored checkpoint with its blob references resolved."""
+        return {
+            **checkpoint,
+            "channel_values": self._blob_store(thread_id).load(
+                checkpoint.get("channel_values", {}))
+        }
+
+    @staticmethod
+    def _entry_configs(entry: dict) -> tuple[RunnableConfig, RunnableConfig | None]:
+        """Return the config of a stored checkpoint and of its parent."""
+        configurable = {
+            "thread_id": entry.get("thread_id"),
+            "checkpoint_ns": entry.get("checkpoint_ns") or "",
+        }
+        config = {"configurable": {
+            **configurable, "checkpoint_id": entry.get("checkpoint_id")}}
+
+        parent_config = None
+        if entry.get("parent_checkpoint_id"):
+            parent_config = {"configurable": {
+                **configurable, "checkpoint_id": entry["parent_checkpoint_id"]}}
+        return config, parent_config
+
+    def _entry_tuple(
+        self,
+        thread_id: str,
+        entry: dict,
+        writes_records: list[dict],
+    ) -> CheckpointTuple:
+        """Build the tuple of a (materialized) checkpoint entry with its own config."""
+        entry_config, parent_config = self._entry_configs(entry)
+        return CheckpointTuple(
+            config=entry_config,
+            checkpoint=self._load_checkpoint(thread_id, entry["checkpoint"]),
+            metadata=entry["metadata"],
+            parent_config=parent_config,
+            pending_writes=self._pending_writes(thread_id, entry, writes_records)
+        )
+
+    def _checkpoint_writes(
+        self,
+        thread_id: str,
+        log: SegmentLog,
+        checkpoint_id: str | None,
+        read: dict[Position, dict] | None = None,
+    ) -> list[dict]:
+        """Load the writes records of a checkpoint through the thread's index.
+
+        LangGraph stores a checkpoint and the writes made against it from
+        separate tasks, so writes records can be appended before their
+        checkpoint as well as after it. They are looked up by checkpoint id
+        wherever they are in the log, taking the ones already in `read`
+        (by position) instead of reading them again.
 
         Returns:
-            RunnableConfig: Updated configuration.
+            list[dict]: The writes records, oldest first.
+        """
+        records = []
+        for position in self._checkpoint_index(thread_id).writes_positions(checkpoint_id, log):
+            record = (read or {}).pop(position, None) or log.read_at(position)
+            if record is not None and record.get("checkpoint_id") == checkpoint_id:
+                records.append(record)
+        return records
+
+    def _writes_by_checkpoint(self, entries: list[dict]) -> defaultdict[str, list[dict]]:
+        """Group the writes records of a decoded history by checkpoint id, oldest first."""
+        writes_records = defaultdict(list)
+        for entry in entries:
+            if self._is_writes(entry):
+                writes_records[entry.get("checkpoint_id")].append(entry)
+        return writes_records
+
+    def _list_tuples(
+        self,
+        config: RunnableConfig,
+        filter: dict[str, Any] | None,
+        before: RunnableConfig | None,
+        limit: int | None,
+    ) -> Iterator[CheckpointTuple]:
+        """Yield the checkpoint tuples of a thread newest first.
+
+        The log is read backwards from its tail, or from the position of the
+        `before` checkpoint looked up in the thread's index, and reading stops
+        as soon as `limit` tuples were produced. If a compaction removes the
+        segments being read, the listing resumes on the compacted log,
+        skipping the checkpoints already yielded.
         """
-        import asyncio
+        seen: set[tuple[str | None, str | None]] = set()
+        try:
+            yield from self._list_tuples_once(config, filter, before, limit, seen)
+        except FileNotFoundError:
+            logger.info(
+                f"Thread `{config['configurable']['thread_id']}` was compacted while listed")
+            if limit is not None:
+                limit -= len(seen)
+            yield from self._list_tuples_once(config, filter, before, limit, seen)
 
+    def _list_tuples_once(
+        self,
+        config: RunnableConfig,
+        filter: dict[str, Any] | None,
+        before: RunnableConfig | None,
+        limit: int | None,
+        seen: set[tuple[str | None, str | None]],
+    ) -> Iterator[CheckpointTuple]:
         thread_id = config["configurable"]["thread_id"]
-        checkpoint_id = config["configurable"].get("checkpoint_id")
-        checkpoint_ns = config["configurable"].get("checkpoint_ns")
+        before_id = (before or {}).get("configurable", {}).get("checkpoint_id")
+        if limit is not None and limit <= 0:
+            return
 
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
+        log = self._thread_log(thread_id)
+        before_position = None
+        if log.exists() and (limit is not None or before_id):
+            # Reuse an already decoded history if it is still up to date, a
+            # page is read from the log otherwise and the cache left as it is
+            entries = self.cache.get(
+                thread_id, self._thread_stamp(thread_id, log), count_miss=False)
+        else:
+            # The whole history is needed, decode and cache it
+            entries = self._read_entries(thread_id) or []
 
-        # Run file I/O operations in a thread pool to avoid blocking
-        def _read_existing_data():
-            checkpoints = []
-            if db_file_path.exists():
-                logger.info(
-                    f"Loading existing database file: `{db_file_path}`")
-                with open(db_file_path, "r") as db_file:
-                    try:
-                        checkpoints = json.load(db_file)
-                        logger.info(
-                            f"Loaded {len(checkpoints)} existing checkpoints from database.")
-                    except json.JSONDecodeError:
-                        logger.warning(
-                            f"Database file `{db_file_path}` is empty or corrupted. Starting fresh.")
-                        checkpoints = []
-            else:
-                logger.info(
-                    f"Database file does not exist. Creating: `{db_file_path}`")
-                logger.info(
-                    f"Database file created successfully at: `{db_file_path}`")
-            return checkpoints
+        if entries is not None:
+            writes_records = self._writes_by_checkpoint(entries)
+            records = ((None, record) for record in reversed(entries))
+        else:
+            writes_records = None
+            if before_id:
+                before_position = self._checkpoint_index(
+                    thread_id).checkpoint_position(before_id, log)
+                if before_position is None:
+                    logger.warning(
+                        f"Checkpoint `{before_id}` not found for thread: `{thread_id}`")
+                    return
+            records = log.iter_positioned_reverse(before_position)
+
+        # Writes records met while reading backwards, by position, the index
+        # gives those of each checkpoint wherever they are in the log
+        read_writes = {}
+        skipping = before_id is not None and before_position is None
+        yielded = 0
+        for position, entry in records:
+            if self._is_writes(entry):
+                if writes_records is None:
+                    read_writes[position] = entry
+                continue
 
-        checkpoints = await asyncio.get_running_loop().run_in_executor(None, _read_existing_data)
+            if skipping:
+                skipping = entry.get("checkpoint_id") != before_id
+                continue
 
-        logger.info(
-            f"Storing checkpoint for thread_id `{thread_id}` at `{db_file_path}`...")
+            if entry.get("checkpoint") is None or entry.get("metadata") is None:
+                logger.warning(
+                    f"Incomplete checkpoint data for thread: `{entry.get('thread_id')}`")
+                continue
 
-        next_config = {
-            "configurable": {
-                "thread_id": thread_id,
-                "checkpoint_id": checkpoint["id"],
-                "checkpoint_ns": checkpoint_ns
-            }
-        }
+            if self._is_delta(entry):
+                entry = self._materialize(
+                    thread_id, entry, log.iter_records_reverse(position))
+            if not self._matches_filter(entry, filter):
+                continue
 
-        copy = checkpoint.copy()
-        copy["channel_values"] = copy["channel_values"].copy()
+            checkpoint_id = entry.get("checkpoint_id")
+            key = (entry.get("checkpoint_ns"), checkpoint_id)
+            if key in seen:
+                # Listed already, or copied by a compaction still in progress
+                continue
+            seen.add(key)
 
-        # inline primitive values in checkpoint table
-        # others are stored in blobs table
-        blob_values = {}
-        for k, v in checkpoint["channel_values"].items():
-            if v is None or isinstance(v, (str, int, float, bool)):
-                pass
+            if writes_records is not None:
+                entry_writes = writes_records.get(checkpoint_id, [])
             else:
-                if k == "tool_message":
-                    copy["channel_values"]["tool_message"] = copy["channel_values"]["tool_message"].tool_calls
-                # elif k == "messages":
-                #     copy["channel_values"]["messages"] = self.dump_json_messages(copy["channel_values"]["messages"])
-                else:
-                    blob_values[k] = copy["channel_values"].pop(k)
+                entry_writes = self._checkpoint_writes(thread_id, log, checkpoint_id, read_writes)
 
-        logger.debug(f"Blob values: {blob_values}")
+            yield self._entry_tuple(thread_id, entry, entry_writes)
 
-        checkpoints.append({
-            "thread_id": thread_id,
-            "checkpoint_id": checkpoint_id,
-            "checkpoint_ns": checkpoint_ns,
-            "checkpoint": copy,
-            "metadata": metadata
-        })
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
 
-        # Run write operation in a thread pool to avoid blocking
-        def _write_data():
-            with open(db_file_path, "w") as db_file:
-                json.dump(checkpoints, db_file, indent=4, ensure_ascii=False)
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
 
-        await asyncio.get_running_loop().run_in_executor(None, _write_data)
+        logger.info(f"Storing checkpoint for thread_id `{thread_id}`...")
+        return self._commit(
+            thread_id,
+            lambda: self._build_entry(config, checkpoint, metadata, new_versions)
+        )
 
-        logger.info(
-            f"Checkpoint stored successfully for thread_id {thread_id}.")
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        """Asynchronously store a checkpoint with its metadata.
+
+        Args:
+            config: Configuration of the checkpoint.
+            checkpoint: The checkpoint to store.
+            metadata: Metadata of the checkpoint.
+            new_versions: Optional channel versions.
 
-        return next_config
+        Returns:
+            RunnableConfig: Updated configuration.
+        """
+        # Serialization and file I/O run in a thread pool to avoid blocking
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.put, config, checkpoint, metadata, new_versions)
 
     def put_writes(
         self,
@@ -241,16 +1127,13 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
             writes: List of writes to store.
             task_id: Identifier for the task creating the writes.
             task_path: Path of the task creating the writes.
-
-        Raises:
-            NotImplementedError: Implement this method in your custom checkpoint saver.
         """
-
-        # logger.info(f"Task ID: {task_id}")
-        # logger.info(f"Task Path: {task_path}")
-        # logger.info(f"Writes received: {writes}")
-
-        pass
+        thread_id = config["configurable"]["thread_id"]
+        self._commit(
+            thread_id,
+            lambda: (None, self._build_writes_record(
+                config, writes, task_id, task_path))
+        )
 
     async def aput_writes(
         self,
@@ -267,54 +1150,69 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
             task_id: Identifier for the task creating the writes.
             task_path: Path of the task creating the writes.
         """
-        # import asyncio
-
-        # # Run logging operations asynchronously if needed
-        # def _log_writes():
-        #     logger.info(f"Task ID: {task_id}")
-        #     logger.info(f"Task Path: {task_path}")
-        #     logger.info(f"Writes received: {writes}")
-
-        # await asyncio.get_running_loop().run_in_executor(None, _log_writes)
-        pass
+        # Serialization and file I/O run in a thread pool to avoid blocking
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.put_writes, config, writes, task_id, task_path)
 
     def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
-        thread_id = config["configurable"]["thread_id"]
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
+        """Fetch the checkpoint `checkpoint_id` of the config's namespace, or
+        the newest one of that namespace without an id.
 
-        if not db_file_path.exists():
-            logger.warning(f"Database file does not exist: `{db_file_path}`")
-            return None
-
-        with open(db_file_path, "r") as db_file:
+        The checkpoint is located through the thread's index (and the
+        manifest's namespace pointers), and returned with its stored config,
+        parent config and pending writes.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") or ""
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        if checkpoint_id is None:
+            checkpoint_tuple = self.get_latest(thread_id, checkpoint_ns)
+        else:
             try:
-                checkpoints = json.load(db_file)
-                logger.info(
-                    f"Loaded {len(checkpoints)} checkpoints from database.")
-            except json.JSONDecodeError:
-                logger.warning(
-                    f"Database file `{db_file_path}` is empty or corrupted.")
-                return None
-
-        if not checkpoints:
-            logger.info(
-                f"No checkpoints found in database file: `{db_file_path}`")
-            return None
+                checkpoint_tuple = self._get_checkpoint(thread_id, checkpoint_ns, checkpoint_id)
+            except FileNotFoundError:
+                # A compaction removed a segment while it was read, read the new one
+                checkpoint_tuple = self._get_checkpoint(thread_id, checkpoint_ns, checkpoint_id)
 
-        latest_entry = checkpoints[-1]
-        checkpoint = latest_entry.get("checkpoint")
-        metadata = latest_entry.get("metadata")
+        if checkpoint_tuple is None:
+            logger.info(f"No checkpoints found for thread: `{thread_id}`")
+        return checkpoint_tuple
 
-        if checkpoint is None or metadata is None:
-            logger.warning(
-                f"Incomplete checkpoint data in database file: `{db_file_path}`")
+    def _get_checkpoint(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+    ) -> CheckpointTuple | None:
+        log = self._thread_log(thread_id)
+        if log.exists():
+            position = self._checkpoint_index(thread_id).checkpoint_position(checkpoint_id, log)
+            entry = log.read_at(position) if position is not None else None
+            if entry is not None and (entry.get("checkpoint_ns") or "") == checkpoint_ns:
+                return self._position_tuple(thread_id, log, entry, position)
+
+        # A legacy thread, or the id is indexed for a copy in another namespace
+        config = {"configurable": {"thread_id": thread_id}}
+        return next((
+            checkpoint_tuple for checkpoint_tuple in self._list_tuples(
+                config, {"checkpoint_id": checkpoint_id}, None, None)
+            if checkpoint_tuple.config["configurable"]["checkpoint_ns"] == checkpoint_ns
+        ), None)
+
+    def _position_tuple(
+        self,
+        thread_id: str,
+        log: SegmentLog,
+        entry: dict,
+        position: Position,
+    ) -> CheckpointTuple | None:
+        """Build the tuple of the checkpoint record read at `position`."""
+        if entry.get("checkpoint") is None or entry.get("metadata") is None:
+            logger.warning(f"Incomplete checkpoint data for thread: `{thread_id}`")
             return None
-
-        return CheckpointTuple(
-            config=config,
-            checkpoint=checkpoint,
-            metadata=metadata
-        )
+        entry = self._materialize(thread_id, entry, log.iter_records_reverse(position))
+        return self._entry_tuple(
+            thread_id, entry, self._checkpoint_writes(thread_id, log, entry["checkpoint_id"]))
 
     async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
         """Asynchronously fetch a checkpoint tuple using the given configuration.
@@ -325,52 +1223,183 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
         Returns:
             Optional[CheckpointTuple]: The requested checkpoint tuple, or None if not found.
         """
-        import asyncio
+        # Run file I/O operations in a thread pool to avoid blocking
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.get_tuple, config)
 
-        thread_id = config["configurable"]["thread_id"]
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
+    def get_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None = None,
+    ) -> CheckpointTuple | None:
+        """Return the newest checkpoint of a thread, or of one of its namespaces.
+
+        The checkpoint id comes from the per-namespace pointers kept in the
+        thread's manifest entry and is located through the thread's index,
+        so the lookup does not depend on the length of the history.
 
-        if not db_file_path.exists():
-            logger.warning(f"Database file does not exist: `{db_file_path}`")
+        Args:
+            thread_id: The ID of the thread.
+            checkpoint_ns: The exact namespace ("" for the root graph), None
+                for the newest checkpoint of any namespace.
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint tuple, or None if there is none.
+        """
+        try:
+            return self._get_latest(thread_id, checkpoint_ns)
+        except FileNotFoundError:
+            # A compaction removed a segment while it was read, read the new one
+            return self._get_latest(thread_id, checkpoint_ns)
+
+    def _get_latest(self, thread_id: str, checkpoint_ns: str | None) -> CheckpointTuple | None:
+        manifest_entry = self.manifest.get(thread_id)
+        if manifest_entry is None or "latest" not in manifest_entry:
+            return self._scan_latest(thread_id, checkpoint_ns)
+
+        if checkpoint_ns is None:
+            checkpoint_id = manifest_entry.get("checkpoint_id")
+        else:
+            checkpoint_id = manifest_entry["latest"].get(checkpoint_ns)
+        if checkpoint_id is None:
             return None
 
-        # Run file I/O operations in a thread pool to avoid blocking
-        def _read_file():
-            with open(db_file_path, "r") as db_file:
-                try:
-                    checkpoints = json.load(db_file)
-                    logger.info(
-                        f"Loaded {len(checkpoints)} checkpoints from database.")
-                    return checkpoints
-                except json.JSONDecodeError:
-                    logger.warning(
-                        f"Database file `{db_file_path}` is empty or corrupted.")
-                    return None
+        log = self._thread_log(thread_id)
+        index = self._checkpoint_index(thread_id)
+        position = index.checkpoint_position(checkpoint_id, log)
+        entry = log.read_at(position) if position is not None else None
+        if entry is None or entry.get("checkpoint_id") != checkpoint_id:
+            logger.warning(
+                f"Latest checkpoint `{checkpoint_id}` not found in the index of thread: `{thread_id}`")
+            return self._scan_latest(thread_id, checkpoint_ns)
+
+        return self._position_tuple(thread_id, log, entry, position)
+
+    def _scan_latest(self, thread_id: str, checkpoint_ns: str | None) -> CheckpointTuple | None:
+        """Find the newest checkpoint of a namespace by reading the history,
+        for threads without namespace pointers yet."""
+        config = {"configurable": {"thread_id": thread_id}}
+        if checkpoint_ns is None:
+            return next(self._list_tuples(config, None, None, 1), None)
+        return next((
+            checkpoint_tuple for checkpoint_tuple in self._list_tuples(config, None, None, None)
+            if checkpoint_tuple.config["configurable"]["checkpoint_ns"] == checkpoint_ns
+        ), None)
+
+    async def aget_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None = None,
+    ) -> CheckpointTuple | None:
+        """Asynchronously return the newest checkpoint of a thread or namespace.
+
+        Args:
+            thread_id: The ID of the thread.
+            checkpoint_ns: The exact namespace ("" for the root graph), None
+                for the newest checkpoint of any namespace.
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint tuple, or None if there is none.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.get_latest, thread_id, checkpoint_ns)
+
+    def get_list_page(
+        self,
+        config: RunnableConfig,
+        channel: str,
+        start: int = 0,
+        end: int | None = None,
+    ) -> tuple[RunnableConfig, int, list] | None:
+        """Return the items `[start:end]` of a list channel of a checkpoint.
+
+        The checkpoint is the one `get_tuple` returns for the config. Its
+        stored list holds one blob reference per item, and only the blobs of
+        the requested items are read, so paging over a long message history
+        does not decode the rest of it.
 
-        checkpoints = await asyncio.get_running_loop().run_in_executor(None, _read_file)
+        Args:
+            config: Configuration specifying which checkpoint to read.
+            channel: The list channel, e.g. "messages".
+            start: Index of the first item to return.
+            end: Index after the last item to return, None for the end of the list.
 
-        if checkpoints is None:
+        Returns:
+            Optional[tuple[RunnableConfig, int, list]]: The config of the
+            checkpoint (to read the next pages of the same checkpoint), the
+            length of the list and the requested items, or None if the
+            checkpoint is not found.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") or ""
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        try:
+            entry = self._indexed_entry(thread_id, checkpoint_ns, checkpoint_id)
+        except FileNotFoundError:
+            # A compaction removed a segment while it was read, read the new one
+            entry = self._indexed_entry(thread_id, checkpoint_ns, checkpoint_id)
+
+        refs = entry["checkpoint"].get("channel_values", {}).get(channel, {LIST_REF: []}) \
+            if entry is not None else None
+        if not isinstance(refs, dict) or LIST_REF not in refs:
+            # Not indexed (a legacy thread) or not a list of blobs, decode it whole
+            checkpoint_tuple = self.get_tuple(config)
+            if checkpoint_tuple is None:
+                return None
+            items = checkpoint_tuple.checkpoint["channel_values"].get(channel) or []
+            return checkpoint_tuple.config, len(items), list(items[start:end])
+
+        page = self._blob_store(thread_id).load({channel: {LIST_REF: refs[LIST_REF][start:end]}})
+        entry_config, _ = self._entry_configs(entry)
+        return entry_config, len(refs[LIST_REF]), page[channel]
+
+    def _indexed_entry(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str | None,
+    ) -> dict | None:
+        """Return the materialized entry of a checkpoint (the newest one of the
+        namespace without an id) found through the manifest and the index,
+        None if it is not found there."""
+        log = self._thread_log(thread_id)
+        if checkpoint_id is None:
+            manifest_entry = self.manifest.get(thread_id)
+            if manifest_entry is not None and "latest" in manifest_entry:
+                checkpoint_id = manifest_entry["latest"].get(checkpoint_ns)
+        if checkpoint_id is None or not log.exists():
             return None
 
-        if not checkpoints:
-            logger.info(
-                f"No checkpoints found in database file: `{db_file_path}`")
+        position = self._checkpoint_index(thread_id).checkpoint_position(checkpoint_id, log)
+        entry = log.read_at(position) if position is not None else None
+        if (entry is None or entry.get("checkpoint") is None
+                or entry.get("checkpoint_id") != checkpoint_id
+                or (entry.get("checkpoint_ns") or "") != checkpoint_ns):
             return None
+        return self._materialize(thread_id, entry, log.iter_records_reverse(position))
 
-        latest_entry = checkpoints[-1]
-        checkpoint = latest_entry.get("checkpoint")
-        metadata = latest_entry.get("metadata")
+    async def aget_list_page(
+        self,
+        config: RunnableConfig,
+        channel: str,
+        start: int = 0,
+        end: int | None = None,
+    ) -> tuple[RunnableConfig, int, list] | None:
+        """Asynchronously return the items `[start:end]` of a list channel of a checkpoint.
 
-        if checkpoint is None or metadata is None:
-            logger.warning(
-                f"Incomplete checkpoint data in database file: `{db_file_path}`")
-            return None
+        Args:
+            config: Configuration specifying which checkpoint to read.
+            channel: The list channel, e.g. "messages".
+            start: Index of the first item to return.
+            end: Index after the last item to return, None for the end of the list.
 
-        return CheckpointTuple(
-            config=config,
-            checkpoint=checkpoint,
-            metadata=metadata
-        )
+        Returns:
+            Optional[tuple[RunnableConfig, int, list]]: The config of the
+            checkpoint, the length of the list and the requested items, or
+            None if the checkpoint is not found.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.get_list_page, config, channel, start, end)
 
     def list(
         self,
@@ -380,70 +1409,7 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
         before: RunnableConfig | None = None,
         limit: int | None = None,
     ) -> Iterator[CheckpointTuple]:
-
-        thread_id = config["configurable"]["thread_id"]
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
-
-        if not db_file_path.exists():
-            logger.warning(f"Database file does not exist: `{db_file_path}`")
-            return iter([])
-
-        with open(db_file_path, "r") as db_file:
-            try:
-                checkpoints = json.load(db_file)
-                logger.info(
-                    f"Loaded {len(checkpoints)} checkpoints from database.")
-            except json.JSONDecodeError:
-                logger.warning(
-                    f"Database file `{db_file_path}` is empty or corrupted.")
-                return iter([])
-
-        for entry in checkpoints:
-            checkpoint_id = entry.get("checkpoint_id")
-            checkpoint_ns = entry.get("checkpoint_ns")
-            checkpoint = entry.get("checkpoint")
-            metadata = entry.get("metadata")
-
-            if checkpoint is None or metadata is None:
-                logger.warning(
-                    f"Incomplete checkpoint data in database file: `{db_file_path}`")
-                continue
-
-            # Apply filter if provided
-            if filter:
-                should_include = True
-                for key, value in filter.items():
-                    if key == "checkpoint_id":
-                        if checkpoint_id != value:
-                            should_include = False
-                            break
-                    elif key == "checkpoint_ns":
-                        if checkpoint_ns == "" or checkpoint_ns not in value:
-                            should_include = False
-                            break
-                    elif key in metadata:
-                        if metadata.get(key) != value:
-                            should_include = False
-                            break
-                    elif key in checkpoint:
-                        if checkpoint.get(key) != value:
-                            should_include = False
-                            break
-                    else:
-                        # Check in channel_values for custom fields
-                        channel_values = checkpoint.get("channel_values", {})
-                        if key not in channel_values or channel_values.get(key) != value:
-                            should_include = False
-                            break
-
-                if not should_include:
-                    continue
-
-            yield CheckpointTuple(
-                config=config,
-                checkpoint=checkpoint,
-                metadata=metadata
-            )
+        yield from self._list_tuples(config, filter, before, limit)
 
     async def alist(
         self,
@@ -462,90 +1428,318 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
             limit: Optional limit on number of checkpoints to return.
 
         Returns:
-            AsyncIterator[CheckpointTuple]: An async iterator of checkpoint tuples.
+            AsyncIterator[CheckpointTuple]: An async iterator of checkpoint tuples, newest first.
         """
-        import asyncio
+        def _list_tuples():
+            return list(self._list_tuples(config, filter, before, limit))
 
-        thread_id = config["configurable"]["thread_id"]
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
+        # Run file I/O operations in a thread pool to avoid blocking
+        checkpoint_tuples = await asyncio.get_running_loop().run_in_executor(
+            self._executor, _list_tuples)
 
-        if not db_file_path.exists():
-            logger.warning(f"Database file does not exist: `{db_file_path}`")
-            return
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
 
-        # Run file I/O operations in a thread pool to avoid blocking
-        def _read_file():
-            with open(db_file_path, "r") as db_file:
-                try:
-                    checkpoints = json.load(db_file)
-                    logger.info(
-                        f"Loaded {len(checkpoints)} checkpoints from database.")
-                    return checkpoints
-                except json.JSONDecodeError:
-                    logger.warning(
-                        f"Database file `{db_file_path}` is empty or corrupted.")
-                    return []
+    def compact_thread(self, thread_id: str, policy: RetentionPolicy) -> int:
+        """Drop the checkpoints of a thread the retention policy does not keep.
 
-        checkpoints = await asyncio.get_running_loop().run_in_executor(None, _read_file)
+        See `rewrite_thread`, which does the work under the thread's write lock.
 
-        for entry in checkpoints:
-            checkpoint_id = entry.get("checkpoint_id")
-            checkpoint_ns = entry.get("checkpoint_ns")
-            checkpoint = entry.get("checkpoint")
-            metadata = entry.get("metadata")
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        report = self.rewrite_thread(thread_id, policy)
+        return report["bytes_before"] - report["bytes_after"]
 
-            if checkpoint is None or metadata is None:
-                logger.warning(
-                    f"Incomplete checkpoint data in database file: `{db_file_path}`")
+    def rewrite_thread(
+        self,
+        thread_id: str,
+        policy: RetentionPolicy | None = None,
+        verify: bool = False,
+        reencode: bool = False,
+    ) -> dict[str, Any]:
+        """Rewrite the history of a thread into a single new segment.
+
+        Duplicate copies of a checkpoint (the newest wins), incomplete
+        checkpoints and, with a `policy`, the checkpoints it does not keep are
+        dropped together with their writes. Kept deltas whose parent is kept
+        stay deltas, the others are rebuilt as full snapshots. The records are
+        encoded with the current codec into a new segment, the index is
+        replaced to point at it and the older segments are deleted, then the
+        blobs no longer referenced are removed from the blob store (and, with
+        `reencode`, the others compressed again per the current settings).
+        Every file is replaced through a rename, so readers keep reading
+        without a lock: a reader that loses a segment mid-scan starts over on
+        the new one.
+
+        With `verify`, the checkpoint tuples listed from the new segment are
+        compared with the ones listed before, and the thread is left as it
+        was if they differ. Threads already stored as a single segment with
+        nothing to drop are left as they are, so rewriting again is a no-op.
+        Runs under the thread's write lock.
+
+        Returns:
+            dict[str, Any]: The counts of checkpoints kept and dropped, and the
+            size of the thread before and after.
+        """
+        with self._write_lock(thread_id):
+            return self._rewrite_thread_locked(thread_id, policy, verify, reencode)
+
+    def _rewrite_thread_locked(
+        self,
+        thread_id: str,
+        policy: RetentionPolicy | None,
+        verify: bool,
+        reencode: bool,
+    ) -> dict[str, Any]:
+        # Measured before a legacy file is converted, which counts as a rewrite
+        self._migrate_flat_files(thread_id)
+        size_before = self._thread_size(thread_id)
+        log = self._thread_log(thread_id)
+        converted = self._migrate_legacy_file(thread_id, log, verify=verify)
+        if converted:
+            self._bump_write_version(thread_id)
+        report = {
+            "thread_id": thread_id,
+            "rewritten": converted,
+            "checkpoints": 0,
+            "duplicates": 0,
+            "incomplete": 0,
+            "dropped": 0,
+            "records_before": 0,
+            "records_after": 0,
+            "bytes_before": size_before,
+            "bytes_after": size_before,
+        }
+        segments = log.segments()
+        if not segments:
+            return report
+
+        raw = list(log.iter_records())
+        history = list(self._materialize_all(raw))
+
+        # A crash during an earlier rewrite may leave copies behind, the
+        # newest copy of a checkpoint wins
+        latest: dict[tuple[str | None, str | None], int] = {}
+        for position, record in enumerate(history):
+            if self._is_writes(record):
+                continue
+            if record.get("checkpoint") is None or record.get("metadata") is None:
+                report["incomplete"] += 1
                 continue
+            key = (record.get("checkpoint_ns"), record.get("checkpoint_id"))
+            if key in latest:
+                report["duplicates"] += 1
+            latest[key] = position
 
-            # Apply filter if provided
-            if filter:
-                should_include = True
-                for key, value in filter.items():
-                    if key == "checkpoint_id":
-                        if checkpoint_id != value:
-                            should_include = False
-                            break
-                    elif key == "checkpoint_ns":
-                        if checkpoint_ns == "" or checkpoint_ns not in value:
-                            should_include = False
-                            break
-                    elif key in metadata:
-                        if metadata.get(key) != value:
-                            should_include = False
-                            break
-                    elif key in checkpoint:
-                        if checkpoint.get(key) != value:
-                            should_include = False
-                            break
-                    else:
-                        # Check in channel_values for custom fields
-                        channel_values = checkpoint.get("channel_values", {})
-                        if key not in channel_values or channel_values.get(key) != value:
-                            should_include = False
-                            break
-
-                if not should_include:
+        if policy is None:
+            kept = set(latest)
+        else:
+            kept = policy.select(
+                (*key, history[position]["checkpoint"].get("ts"))
+                for key, position in sorted(latest.items(), key=lambda item: item[1])
+            )
+        report["checkpoints"] = len(kept)
+        report["dropped"] = len(latest) - len(kept)
+        report["records_before"] = len(raw)
+
+        # Writes records are read by checkpoint id wherever they are, the
+        # copies left by an interrupted rewrite are dropped
+        records = []
+        written = set()
+        written_writes = set()
+        for position, record in enumerate(raw):
+            key = (record.get("checkpoint_ns"), record.get("checkpoint_id"))
+            if key not in kept:
+                continue
+            if self._is_writes(record):
+                line = json.dumps(record, sort_keys=True)
+                if line in written_writes:
                     continue
+                written_writes.add(line)
+            elif latest.get(key) != position:
+                continue
+            elif self._is_delta(record) and (
+                    record.get("checkpoint_ns"), record.get("parent_checkpoint_id")) not in written:
+                record = history[position]
+            if not self._is_writes(record):
+                written.add(key)
+            records.append(record)
+        report["records_after"] = len(records)
+
+        unchanged = len(records) == len(raw)
+        if unchanged and policy is None and len(segments) == 1:
+            # Already rewritten, unless the codec settings changed since
+            unchanged = b"".join(map(self.codec.encode, records)) == segments[0].read_bytes()
+        elif unchanged and policy is not None:
+            unchanged = report["dropped"] == 0
+
+        blob_hashes = set()
+        for record in records:
+            if self._is_writes(record):
+                for _, _, *value in record["writes"]:
+                    if len(value) == 1:
+                        blob_hashes.update(blob_refs(value[0]))
+            else:
+                for value in record["checkpoint"].get("channel_values", {}).values():
+                    blob_hashes.update(blob_refs(value))
+
+        index = self._checkpoint_index(thread_id)
+        if not unchanged:
+            if verify:
+                config = {"configurable": {"thread_id": thread_id}}
+                listed = list(self._list_tuples(config, None, None, None))
+            segment_path, positions = log.write_segment(
+                log.segment_index(segments[-1]) + 1, records)
+            index.replace(records, positions)
+            self._bump_write_version(thread_id)
+
+            if verify and not self._verify_rewrite(thread_id, listed, kept):
+                segment_path.unlink()
+                index._rebuild_locked(log)
+                self._bump_write_version(thread_id)
+                raise ValueError(
+                    f"Rewritten history of thread `{thread_id}` does not match the original")
+
+            for path in segments:
+                path.unlink(missing_ok=True)
+            report["rewritten"] = True
+            logger.info(
+                f"Rewrote thread `{thread_id}` into `{segment_path}`: kept {len(kept)} of "
+                f"{len(latest)} checkpoints, dropped {report['duplicates']} duplicate and "
+                f"{report['incomplete']} incomplete record(s)")
+        elif policy is None:
+            logger.debug(f"Nothing to rewrite in thread: `{thread_id}`")
+        else:
+            logger.debug(f"Nothing to compact in thread: `{thread_id}`")
+
+        if (policy is None or not unchanged) and self._blob_store(thread_id).compact(
+                blob_hashes, reencode=reencode):
+            report["rewritten"] = True
+        if report["rewritten"]:
+            # The writes of the old segments were fsynced with the new one
+            self._unsynced_segments.pop(thread_id, None)
+            self._reset_chain_heads(thread_id)
+            self._bump_write_version(thread_id)
+            report["bytes_after"] = self._thread_size(thread_id)
+
+        # Stamped even when nothing changed, so the compactor does not come
+        # back to the thread before its next write
+        fields = {"size": report["bytes_after"], "compacted_at": time.time()}
+        latest_ids = [history[position] for position in sorted(latest.values())]
+        if latest_ids:
+            fields["checkpoint_id"] = latest_ids[-1]["checkpoint_id"]
+            fields["latest"] = {
+                entry.get("checkpoint_ns") or "": entry["checkpoint_id"] for entry in latest_ids}
+        if "updated_at" not in (self.manifest.get(thread_id) or {}):
+            fields["updated_at"] = time.time()
+        try:
+            self.manifest.update(thread_id, **fields)
+        except OSError as error:
+            logger.error(f"Failed to update manifest for thread `{thread_id}`: {error}")
+
+        if report["rewritten"]:
+            logger.info(
+                f"Reclaimed {report['bytes_before'] - report['bytes_after']} bytes "
+                f"in thread `{thread_id}`")
+        return report
 
-            yield CheckpointTuple(
-                config=config,
-                checkpoint=checkpoint,
-                metadata=metadata
-            )
+    def _verify_rewrite(
+        self,
+        thread_id: str,
+        listed: Sequence[CheckpointTuple],
+        kept: set[tuple[str | None, str | None]],
+    ) -> bool:
+        """Check that the thread lists the kept tuples of `listed` unchanged."""
+        kept = {(checkpoint_ns or "", checkpoint_id) for checkpoint_ns, checkpoint_id in kept}
+        expected = [
+            checkpoint_tuple for checkpoint_tuple in listed
+            if (checkpoint_tuple.config["configurable"]["checkpoint_ns"],
+                checkpoint_tuple.config["configurable"]["checkpoint_id"]) in kept
+        ]
+        config = {"configurable": {"thread_id": thread_id}}
+        return list(self._list_tuples(config, None, None, None)) == expected
+
+    async def acompact_thread(self, thread_id: str, policy: RetentionPolicy) -> int:
+        """Asynchronously drop the checkpoints the retention policy does not keep.
+
+        Args:
+            thread_id: The ID of the thread to compact.
+            policy: The retention policy to enforce.
+
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.compact_thread, thread_id, policy)
+
+    def _delete_thread_files(self, thread_id: str) -> bool:
+        with self._write_lock(thread_id):
+            return self._delete_thread_files_locked(thread_id)
+
+    def _delete_thread_files_locked(self, thread_id: str) -> bool:
+        self._migrate_flat_files(thread_id)
+        removed = self._thread_log(thread_id).delete()
+        removed += self._blob_store(thread_id).delete()
+        removed += self._checkpoint_index(thread_id).delete()
+        self._unsynced_segments.pop(thread_id, None)
+        self._reset_chain_heads(thread_id)
+        self.cache.invalidate(thread_id)
+        with self._write_versions_lock:
+            # The thread has no files left for a stamp to match
+            self._write_versions.pop(thread_id, None)
+
+        legacy_file_path = self._legacy_file_path(thread_id)
+        if legacy_file_path.exists():
+            legacy_file_path.unlink()
+            removed += 1
+
+        self.manifest.remove([thread_id])
+
+        # Deleted while held, see `file_lock`, so no inode outlives the thread
+        self._lock_file_path(thread_id).unlink(missing_ok=True)
+        self._remove_empty_shard_dirs(thread_id)
+
+        if removed:
+            logger.info(
+                f"Deleted {removed} database file(s) of thread: `{thread_id}`")
+            return True
+
+        logger.warning(f"No database files exist for thread: `{thread_id}`")
+        return False
+
+    def _remove_empty_shard_dirs(self, thread_id: str) -> None:
+        shard_dir = self._shard_dir(thread_id)
+        for directory in (shard_dir, shard_dir.parent):
+            try:
+                directory.rmdir()
+            except FileNotFoundError:
+                continue
+            except OSError:
+                # Still holds the files of other threads
+                return
 
     def delete_thread(
         self,
         thread_id: str,
     ) -> None:
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
+        self._delete_thread_files(thread_id)
 
-        if db_file_path.exists():
-            db_file_path.unlink()
-            logger.info(f"Deleted database file: `{db_file_path}`")
-        else:
-            logger.warning(f"Database file does not exist: `{db_file_path}`")
+    def expire_thread(self, thread_id: str, updated_before: float) -> bool:
+        """Delete a thread if it was last written before `updated_before`.
+
+        The manifest is checked under the thread's write lock, so a thread
+        written since it was found expired is kept.
+
+        Returns:
+            bool: Whether the thread was deleted.
+        """
+        with self._write_lock(thread_id):
+            entry = self.manifest.get(thread_id)
+            if entry is None or (entry.get("updated_at") or 0) >= updated_before:
+                return False
+            self._delete_thread_files_locked(thread_id)
+            return True
 
     async def adelete_thread(
         self,
@@ -556,47 +1750,40 @@ class LocalCheckpointSaver(BaseCheckpointSaver):
         Args:
             thread_id: The ID of the thread to delete.
         """
-        import asyncio
-
-        db_file_path = Path(self.db_path) / f"{thread_id}.json"
-
         # Run file operations in a thread pool to avoid blocking
-        def _delete_file():
-            if db_file_path.exists():
-                db_file_path.unlink()
-                logger.info(f"Deleted database file: `{db_file_path}`")
-                return True
-            else:
-                logger.warning(
-                    f"Database file does not exist: `{db_file_path}`")
-                return False
-
-        await asyncio.get_running_loop().run_in_executor(None, _delete_file)
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._delete_thread_files, thread_id)
 
-    def delete_all(self) -> None:
+    def _delete_all_files(self) -> None:
         db_folder = Path(self.db_path)
         if not db_folder.exists():
             logger.warning(f"Database folder does not exist: `{db_folder}`")
             return
 
-        for db_file in db_folder.glob("*.json"):
-            db_file.unlink()
-            logger.info(f"Deleted database file: `{db_file}`")
+        # The manifest lists every thread, no need to walk the directory tree
+        thread_ids = [entry["thread_id"] for entry in self.manifest.entries()]
+        for thread_id in thread_ids:
+            self._delete_thread_files(thread_id)
 
-    async def adelete_all(self) -> None:
-        """Asynchronously delete all threads and their associated checkpoint data."""
-        import asyncio
-        from pathlib import Path
+        self.cache.clear()
+        with self._blob_stores_lock:
+            self._blob_stores.clear()
+        with self._indexes_lock:
+            self._indexes.clear()
+        with self._chain_heads_lock:
+            self._chain_heads.clear()
+        logger.info(f"Deleted {len(thread_ids)} thread(s) from: `{db_folder}`")
 
-        db_folder = Path(self.db_path)
-        if not db_folder.exists():
-            logger.warning(f"Database folder does not exist: `{db_folder}`")
-            return
+    def delete_all(self) -> None:
+        self._delete_all_files()
 
+    async def adelete_all(self) -> None:
+        """Asynchronously delete all threads and their associated checkpoint data."""
         # Run file operations in a thread pool to avoid blocking
-        def _delete_files():
-            for db_file in db_folder.glob("*.json"):
-                db_file.unlink()
-                logger.info(f"Deleted database file: `{db_file}`")
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._delete_all_files)
 
-        await asyncio.get_running_loop().run_in_executor(None, _delete_files)
+    def close(self) -> None:
+        """Wait for the queued I/O and shut down the I/O thread pool."""
+        self._executor.shutdown(wait=True)
+        logger.info("Checkpoint I/O pool shut down")
@@ -0,0 +1,57 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    logger.warning(
+        "fcntl is not available, checkpoint files are only locked within this process")
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on `path`, creating it if missing.
+
+    The lock is taken with `fcntl.flock`, so it coordinates every process
+    sharing the checkpoint directory (e.g. several uvicorn workers) and is
+    released by the kernel if the holder dies. The holder may delete the
+    lock file (and its directory, once empty): a process that was waiting
+    on the deleted file finds `path` gone or pointing at another inode once
+    it gets the lock, and locks the current file instead, so two processes
+    never hold "the" lock at once.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    while True:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = open(path, "ab")
+        except FileNotFoundError:
+            # The directory was removed by a holder deleting the thread
+            continue
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                locked = os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+            except FileNotFoundError:
+                locked = False
+        except BaseException:
+            lock_file.close()
+            raise
+        if locked:
+            break
+        # Deleted by the previous holder while waiting, lock the new file
+        lock_file.close()
+
+    with lock_file:
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,186 @@
+import heapq
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterable, Optional
+
+from loguru import logger
+
+from .locks import file_lock
+
+
+class ThreadManifest:
+    """Compact index of the threads stored in a checkpoint directory.
+
+    Holds one entry per thread (`thread_id`, `checkpoint_id` of its last
+    checkpoint, `updated_at` and `size` in bytes) so that sessions can be
+    enumerated and bulk operations performed without walking the directory
+    tree. Updates are appended to `manifest.jsonl` as complete entries and
+    deletions as tombstones; the newest line of a thread wins. The file is
+    loaded incrementally like the checkpoint index and rewritten through a
+    temporary file once superseded lines dominate it.
+
+    Appends and rewrites hold an `fcntl` lock on `manifest.lock`, so the
+    manifest can be shared by several processes.
+    """
+
+    # Rewrite the file once it holds this many lines per live entry
+    COMPACT_RATIO = 4
+    COMPACT_MIN_LINES = 1024
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._lines = 0
+        self._indexed_size = 0
+        self._indexed_inode: Optional[int] = None
+        self._lock = Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._lines = 0
+        self._indexed_size = 0
+        self._indexed_inode = None
+
+    def _apply(self, line: dict) -> None:
+        self._lines += 1
+        if line.get("deleted"):
+            self._entries.pop(line["thread_id"], None)
+        else:
+            self._entries[line["thread_id"]] = line
+
+    def _refresh(self) -> None:
+        """Load the lines appended to the file since the last refresh."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._clear()
+            return
+
+        size = stat.st_size
+        if size < self._indexed_size or stat.st_ino != self._indexed_inode:
+            # Rewritten by a compaction or replaced, load it from scratch
+            self._clear()
+            self._indexed_inode = stat.st_ino
+        if size == self._indexed_size:
+            return
+
+        with open(self.path, "rb") as manifest_file:
+            manifest_file.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in manifest_file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError, KeyError):
+                    logger.warning(f"Corrupted manifest record in: `{self.path}`")
+                offset += len(line)
+            self._indexed_size = offset
+
+    @staticmethod
+    def _encode(lines: Iterable[dict]) -> bytes:
+        return b"".join(
+            json.dumps(line, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            for line in lines
+        )
+
+    def _append(self, lines: list[dict]) -> None:
+        with file_lock(self.lock_path):
+            self._refresh()
+            with open(self.path, "ab") as manifest_file:
+                manifest_file.write(self._encode(lines))
+            self._refresh()
+
+            if (self._lines > self.COMPACT_MIN_LINES
+                    and self._lines > self.COMPACT_RATIO * len(self._entries)):
+                self._rewrite(self._entries.values())
+
+    def _rewrite(self, entries: Iterable[dict]) -> None:
+        """Replace the file with the given entries. Must hold the file lock."""
+        entries = list(entries)
+        temp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(temp_path, "wb") as manifest_file:
+            manifest_file.write(self._encode(entries))
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(temp_path, self.path)
+
+        self._clear()
+        for entry in entries:
+            self._apply(entry)
+        stat = self.path.stat()
+        self._indexed_size = stat.st_size
+        self._indexed_inode = stat.st_ino
+        logger.info(f"Rewrote thread manifest `{self.path}` ({len(entries)} threads)")
+
+    def update(self, thread_id: str, **fields: Any) -> dict[str, Any]:
+        """Merge fields into the entry of a thread, creating it if needed."""
+        with self._lock:
+            self._refresh()
+            entry = {**self._entries.get(thread_id, {}), **fields, "thread_id": thread_id}
+            self._append([entry])
+            return entry
+
+    def remove(self, thread_ids: Iterable[str]) -> None:
+        with self._lock:
+            lines = [{"thread_id": thread_id, "deleted": True} for thread_id in thread_ids]
+            if lines:
+                self._append(lines)
+
+    def replace(self, entries: Iterable[dict]) -> None:
+        """Replace the whole manifest, e.g. after scanning an unindexed directory."""
+        with self._lock, file_lock(self.lock_path):
+            self._rewrite(entries)
+
+    def get(self, thread_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(thread_id)
+            return dict(entry) if entry is not None else None
+
+    def entries(self) -> list[dict[str, Any]]:
+        """Return a snapshot of every thread entry."""
+        with self._lock:
+            self._refresh()
+            return [dict(entry) for entry in self._entries.values()]
+
+    @staticmethod
+    def recency_key(entry: dict[str, Any]) -> tuple[float, str]:
+        """Order of the entries, `(updated_at, thread_id)`, newest last."""
+        return entry.get("updated_at") or 0, entry["thread_id"]
+
+    def newest(
+        self,
+        match: Optional[Callable[[dict[str, Any]], bool]] = None,
+        before: Optional[tuple[float, Optional[str]]] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Return copies of the most recently updated entries, newest first.
+
+        Only the entries `match` accepts (it must not modify them) and, with
+        a `before` cursor `(updated_at, thread_id)`, those older than it are
+        returned (without a thread id, those updated before `updated_at`).
+        With a `limit`, the newest entries are selected with a bounded heap
+        instead of sorting the whole manifest.
+        """
+        key = self.recency_key
+        with self._lock:
+            self._refresh()
+            entries = self._entries.values()
+            if before is not None and before[1] is None:
+                entries = (entry for entry in entries if key(entry)[0] < before[0])
+            elif before is not None:
+                entries = (entry for entry in entries if key(entry) < before)
+            if match is not None:
+                entries = filter(match, entries)
+            if limit is None:
+                selected = sorted(entries, key=key, reverse=True)
+            else:
+                selected = heapq.nlargest(limit, entries, key=key)
+            return [dict(entry) for entry in selected]
@@ -0,0 +1,189 @@
+"""Offline rewrite of a `LocalCheckpointSaver` store.
+
+Every thread of the store, whatever the layout or format it was written
+in (legacy pretty-printed `{thread_id}.json` arrays, flat or sharded
+segment logs), is rewritten by `LocalCheckpointSaver.rewrite_thread` into a
+single segment encoded with the given record format and compression:
+duplicate and incomplete checkpoints are dropped, unreferenced blobs are
+removed and the others compressed again. Threads are processed in
+parallel by a pool of worker processes, each thread under its own write
+lock, and the checkpoints listed after the rewrite are compared with the
+ones listed before (unless `--no-verify`), a thread failing the comparison
+being left as it was.
+
+Threads already rewritten with the same settings are left untouched, so
+the command can be run again, e.g. after it was interrupted. Stop the
+application first: the rewrite is safe against concurrent readers, but
+running it offline keeps it from competing with live sessions for the disk.
+
+Usage:
+    python -m storage.migrate ./dev_db --workers 8
+    python -m storage.migrate ./dev_db --record-format msgpack --compress-threshold 1024
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+
+from .codecs import RECORD_FORMATS
+from .local import LocalCheckpointSaver
+from .manifest import ThreadManifest
+
+
+# Saver of a worker process, created once by `_init_worker`
+_saver: Optional[LocalCheckpointSaver] = None
+
+
+def _init_worker(db_path: str, saver_kwargs: dict[str, Any], log_level: str) -> None:
+    global _saver
+    logger.remove()
+    logger.add(sys.stderr, level=log_level)
+    _saver = LocalCheckpointSaver(db_path, cache_size=0, io_workers=1, **saver_kwargs)
+
+
+def _rewrite_thread(thread_id: str, verify: bool) -> dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        report = _saver.rewrite_thread(thread_id, verify=verify, reencode=True)
+    except Exception as error:
+        report = {"thread_id": thread_id, "error": f"{type(error).__name__}: {error}"}
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _index_threads(db_path: str) -> list[str]:
+    """Return the ids of the threads to rewrite.
+
+    A store written before the manifest existed gets a manifest listing its
+    threads first, so that the workers do not each scan the whole store.
+    The entries are completed by the rewrite of each thread.
+    """
+    db_folder = Path(db_path)
+    manifest_path = db_folder / "manifest.jsonl"
+    thread_ids = LocalCheckpointSaver.stored_thread_ids(db_path)
+    if not manifest_path.exists():
+        entries = []
+        for thread_id in sorted(thread_ids):
+            paths = [
+                *db_folder.glob(f"{thread_id}.*"),
+                *db_folder.glob(f"*/*/{thread_id}.*"),
+            ]
+            entries.append({
+                "thread_id": thread_id,
+                "updated_at": max(
+                    (path.stat().st_mtime for path in paths), default=time.time()),
+            })
+        ThreadManifest(manifest_path).replace(entries)
+    return sorted(thread_ids)
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def migrate(
+    db_path: str,
+    workers: int,
+    saver_kwargs: dict[str, Any],
+    verify: bool = True,
+    log_level: str = "ERROR",
+) -> dict[str, Any]:
+    """Rewrite every thread of a store on a pool of worker processes.
+
+    Returns:
+        dict[str, Any]: The totals over all threads.
+    """
+    start = time.perf_counter()
+    thread_ids = _index_threads(db_path)
+    totals = {
+        "threads": len(thread_ids),
+        "rewritten": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "checkpoints": 0,
+        "duplicates": 0,
+        "incomplete": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+    }
+
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(db_path, saver_kwargs, log_level)) as executor:
+        futures = [
+            executor.submit(_rewrite_thread, thread_id, verify)
+            for thread_id in thread_ids
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            report = future.result()
+            if "error" in report:
+                totals["failed"] += 1
+                logger.error(
+                    f"Failed to rewrite thread `{report['thread_id']}`: {report['error']}")
+                continue
+
+            totals["rewritten" if report["rewritten"] else "unchanged"] += 1
+            for key in ("checkpoints", "duplicates", "incomplete", "bytes_before", "bytes_after"):
+                totals[key] += report[key]
+            if done % 1000 == 0:
+                logger.info(f"Rewrote {done} of {len(thread_ids)} thread(s)")
+
+    totals["seconds"] = time.perf_counter() - start
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", help="Folder holding the checkpoint store")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--record-format", choices=RECORD_FORMATS, default="json")
+    parser.add_argument("--compress-threshold", type=int, default=0,
+                        help="zlib-compress records and blobs larger than this (0 disables)")
+    parser.add_argument("--snapshot-interval", type=int, default=16)
+    parser.add_argument("--no-verify", action="store_true",
+                        help="Do not compare the checkpoints before and after the rewrite")
+    parser.add_argument("--log-level", default="ERROR",
+                        help="Log level of the worker processes")
+    args = parser.parse_args()
+
+    if not Path(args.db_path).is_dir():
+        parser.error(f"`{args.db_path}` is not a directory")
+
+    totals = migrate(
+        args.db_path,
+        args.workers,
+        {
+            "record_format": args.record_format,
+            "compress_threshold": args.compress_threshold,
+            "snapshot_interval": args.snapshot_interval,
+        },
+        verify=not args.no_verify,
+        log_level=args.log_level,
+    )
+
+    seconds = totals["seconds"]
+    saved = totals["bytes_before"] - totals["bytes_after"]
+    print(f"Threads:      {totals['threads']} ({totals['rewritten']} rewritten, "
+          f"{totals['unchanged']} unchanged, {totals['failed']} failed)")
+    print(f"Checkpoints:  {totals['checkpoints']} kept, {totals['duplicates']} duplicate and "
+          f"{totals['incomplete']} incomplete dropped")
+    print(f"Size:         {_format_bytes(totals['bytes_before'])} -> "
+          f"{_format_bytes(totals['bytes_after'])} (saved {_format_bytes(saved)}, "
+          f"{100 * saved / max(totals['bytes_before'], 1):.1f}%)")
+    print(f"Throughput:   {_format_bytes(totals['bytes_before'] / max(seconds, 1e-9))}/s, "
+          f"{totals['threads'] / max(seconds, 1e-9):.1f} threads/s ({seconds:.2f} s)")
+    if totals["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
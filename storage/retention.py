@@ -0,0 +1,189 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Which checkpoints of a thread survive a compaction.
+
+    The newest `keep_last` checkpoints of every namespace are kept, plus
+    every checkpoint younger than `max_age` seconds. The newest checkpoint of
+    a namespace is always kept, as it is the one a run resumes from.
+    """
+
+    keep_last: int = 1
+    max_age: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_last > 0 or bool(self.max_age)
+
+    @staticmethod
+    def _timestamp(ts: Optional[str]) -> Optional[float]:
+        if not ts:
+            return None
+        try:
+            created_at = datetime.fromisoformat(ts)
+        except ValueError:
+            return None
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at.timestamp()
+
+    def select(
+        self,
+        checkpoints: Iterable[tuple[Optional[str], Optional[str], Optional[str]]],
+        now: Optional[float] = None,
+    ) -> set[tuple[Optional[str], Optional[str]]]:
+        """Return the checkpoints to keep.
+
+        Args:
+            checkpoints: `(checkpoint_ns, checkpoint_id, ts)` of every
+                checkpoint of a thread, oldest first.
+            now: The current UNIX time, defaults to `time.time()`.
+
+        Returns:
+            set[tuple]: The `(checkpoint_ns, checkpoint_id)` of the checkpoints to keep.
+        """
+        now = time.time() if now is None else now
+        keep_last = max(self.keep_last, 1)
+
+        by_namespace: dict[Optional[str], list[tuple]] = {}
+        for checkpoint_ns, checkpoint_id, ts in checkpoints:
+            by_namespace.setdefault(checkpoint_ns, []).append((checkpoint_id, ts))
+
+        kept = set()
+        for checkpoint_ns, namespace_checkpoints in by_namespace.items():
+            for checkpoint_id, _ in namespace_checkpoints[-keep_last:]:
+                kept.add((checkpoint_ns, checkpoint_id))
+            if not self.max_age:
+                continue
+            for checkpoint_id, ts in namespace_checkpoints[:-keep_last]:
+                created_at = self._timestamp(ts)
+                # Keep what cannot be dated rather than guess
+                if created_at is None or now - created_at < self.max_age:
+                    kept.add((checkpoint_ns, checkpoint_id))
+        return kept
+
+
+class CheckpointCompactor:
+    """Background task enforcing a `RetentionPolicy` on a checkpoint saver.
+
+    Every `interval` seconds the threads updated since their last compaction
+    are compacted with the saver's `compact_thread`, at most
+    `max_threads_per_pass` of them per pass, on a dedicated worker thread so
+    neither the event loop nor the saver's I/O pool is held up. Readers never
+    wait for a compaction; writers of the thread being compacted wait for it
+    like for any other write.
+    """
+
+    def __init__(
+        self,
+        saver: Any,
+        policy: RetentionPolicy,
+        interval: float = 300.0,
+        max_threads_per_pass: int = 100,
+    ):
+        self.saver = saver
+        self.policy = policy
+        self.interval = interval
+        self.max_threads_per_pass = max_threads_per_pass
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="checkpoint-compactor")
+        self._task: Optional[asyncio.Task] = None
+        self._compacted_at: dict[str, float] = {}
+        self._stats = {
+            "passes": 0,
+            "threads_compacted": 0,
+            "bytes_reclaimed": 0,
+            "last_pass_seconds": 0.0,
+        }
+
+    def _due_threads(self) -> list[str]:
+        """Return the threads written since they were last compacted, oldest first."""
+        due = []
+        for entry in reversed(self.saver.list_threads()):
+            thread_id = entry["thread_id"]
+            updated_at = entry.get("updated_at") or 0
+            # A stale entry, or a compaction this process ran but could not
+            # record, must not make the thread due again
+            compacted_at = max(
+                entry.get("compacted_at") or 0, self._compacted_at.get(thread_id, 0))
+            if updated_at > compacted_at:
+                due.append(thread_id)
+        return due[:self.max_threads_per_pass]
+
+    def run_once(self) -> dict[str, Any]:
+        """Compact the threads that are due once.
+
+        Returns:
+            dict[str, Any]: `threads` compacted, `bytes_reclaimed` and `seconds` taken.
+        """
+        start = time.perf_counter()
+        threads = 0
+        bytes_reclaimed = 0
+        for thread_id in self._due_threads():
+            try:
+                bytes_reclaimed += self.saver.compact_thread(thread_id, self.policy)
+            except Exception as error:
+                logger.error(f"Failed to compact thread `{thread_id}`: {error}")
+                continue
+            self._compacted_at[thread_id] = time.time()
+            threads += 1
+
+        seconds = time.perf_counter() - start
+        self._stats["passes"] += 1
+        self._stats["threads_compacted"] += threads
+        self._stats["bytes_reclaimed"] += bytes_reclaimed
+        self._stats["last_pass_seconds"] = seconds
+        if threads:
+            logger.info(
+                f"Compacted {threads} thread(s), reclaimed {bytes_reclaimed} bytes "
+                f"in {seconds:.2f} s")
+        return {"threads": threads, "bytes_reclaimed": bytes_reclaimed, "seconds": seconds}
+
+    async def arun_once(self) -> dict[str, Any]:
+        """Asynchronously compact the threads that are due once.
+
+        Returns:
+            dict[str, Any]: `threads` compacted, `bytes_reclaimed` and `seconds` taken.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.run_once)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.arun_once()
+            except Exception as error:
+                logger.error(f"Checkpoint compaction pass failed: {error}")
+
+    def start(self) -> None:
+        """Start compacting periodically on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                f"Checkpoint compactor started (every {self.interval} s, {self.policy})")
+
+    async def stop(self) -> None:
+        """Stop the periodic compaction, waiting for a running pass to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+        logger.info("Checkpoint compactor stopped")
+
+    def stats(self) -> dict[str, Any]:
+        """Return the totals of the passes run so far."""
+        return dict(self._stats)
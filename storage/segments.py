@@ -0,0 +1,284 @@
+import glob
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from loguru import logger
+
+from .codecs import RecordCodec
+
+
+# Location of a record in a log: (segment index, byte offset in the segment)
+Position = tuple[int, int]
+
+# File name of a segment: `{name}.{index:06d}.jsonl`
+SEGMENT_NAME = re.compile(r"^(.+)\.(\d{6})\.jsonl$")
+
+# Roll over to a new segment file once the current one passes this size
+DEFAULT_MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+
+# Size of the blocks read when scanning a segment backwards from its tail
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class SegmentLog:
+    """Append-only, one-record-per-line log of a single thread.
+
+    Records live in numbered segment files (`{name}.000001.jsonl`,
+    `{name}.000002.jsonl`, ...) inside `directory`. A write only ever appends
+    bytes to the newest segment, and once that segment passes
+    `max_segment_bytes` the next write rolls over to a fresh one. Records
+    are encoded one per line by `codec` (compact JSON by default).
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+        codec: Optional[RecordCodec] = None,
+    ):
+        self.directory = Path(directory)
+        self.name = name
+        self.max_segment_bytes = max_segment_bytes
+        self.codec = codec or RecordCodec()
+        self._pattern = re.compile(rf"^{re.escape(name)}\.(\d{{6}})\.jsonl$")
+
+    def segment_path(self, index: int) -> Path:
+        return self.directory / f"{self.name}.{index:06d}.jsonl"
+
+    def segment_index(self, path: Path) -> int:
+        return int(self._pattern.match(path.name).group(1))
+
+    def segments(self) -> list[Path]:
+        """Return the segment files of this log, oldest first."""
+        found = []
+        for path in self.directory.glob(f"{glob.escape(self.name)}.*.jsonl"):
+            match = self._pattern.match(path.name)
+            if match:
+                found.append((int(match.group(1)), path))
+        return [path for _, path in sorted(found)]
+
+    def exists(self) -> bool:
+        return bool(self.segments())
+
+    def size(self) -> int:
+        return sum(path.stat().st_size for path in self.segments())
+
+    def append(self, records: Iterable[dict]) -> tuple[Path, list[Position]]:
+        """Append records to the newest segment with a single write, rolling
+        over if it is full.
+
+        Returns:
+            tuple[Path, list[Position]]: The segment the records were written
+                to and the position of each of them.
+        """
+        lines = [self.codec.encode(record) for record in records]
+        data = b"".join(lines)
+
+        segments = self.segments()
+        if not segments:
+            path = self.segment_path(1)
+        else:
+            path = segments[-1]
+            size = path.stat().st_size
+            if size and size + len(data) > self.max_segment_bytes:
+                path = self.segment_path(self.segment_index(path) + 1)
+                logger.info(f"Rolling over to new segment: `{path}`")
+
+        with open(path, "ab") as segment_file:
+            offset = segment_file.seek(0, 2)
+            segment_file.write(data)
+
+        segment_index = self.segment_index(path)
+        positions = []
+        for line in lines:
+            positions.append((segment_index, offset))
+            offset += len(line)
+        return path, positions
+
+    def write_segment(
+        self,
+        index: int,
+        records: Iterable[dict],
+    ) -> tuple[Path, list[Position]]:
+        """Create a complete segment atomically, through a temporary file
+        renamed into place, so a crash never leaves it truncated.
+
+        Returns:
+            tuple[Path, list[Position]]: The segment and the position of each record.
+        """
+        path = self.segment_path(index)
+        temp_path = path.with_name(f".{path.name}.tmp")
+        lines = [self.codec.encode(record) for record in records]
+        with open(temp_path, "wb") as segment_file:
+            segment_file.write(b"".join(lines))
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        os.replace(temp_path, path)
+
+        positions = []
+        offset = 0
+        for line in lines:
+            positions.append((index, offset))
+            offset += len(line)
+        return path, positions
+
+    @staticmethod
+    def _iter_lines_reverse(
+        path: Path,
+        chunk_size: int = READ_CHUNK_BYTES,
+        end: Optional[int] = None,
+    ) -> Iterator[tuple[int, bytes]]:
+        """Yield the complete lines of a segment and their offsets newest
+        first, reading it backwards from `end` (the end of the file by default).
+
+        Only as many chunks as needed are read from the end of the file, so
+        fetching the newest line does not depend on the size of the segment.
+        A torn trailing line (no terminating newline) is skipped.
+        """
+        with open(path, "rb") as segment_file:
+            position = segment_file.seek(0, 2)
+            if end is not None:
+                position = min(position, end)
+            buffer = b""
+            at_tail = True
+            while position > 0:
+                read_size = min(chunk_size, position)
+                position -= read_size
+                segment_file.seek(position)
+                buffer = segment_file.read(read_size) + buffer
+
+                if at_tail:
+                    # Anything after the last newline is an incomplete write
+                    newline = buffer.rfind(b"\n")
+                    if newline < 0:
+                        buffer = b""
+                        continue
+                    buffer = buffer[:newline + 1]
+                    at_tail = False
+
+                line_end = position + len(buffer)
+                lines = buffer.split(b"\n")
+                # The first piece may be cut by the chunk boundary, keep it for later
+                buffer = lines[0]
+                for line in reversed(lines[1:]):
+                    line_start = line_end - len(line)
+                    if line:
+                        yield line_start, line + b"\n"
+                    line_end = line_start - 1
+
+            if buffer:
+                yield 0, buffer + b"\n"
+
+    def iter_positioned_reverse(
+        self,
+        before: Optional[Position] = None,
+    ) -> Iterator[tuple[Position, dict]]:
+        """Iterate over the records of the log and their positions newest
+        first, reading backwards from `before` (excluded) or the log tail.
+
+        Raises:
+            FileNotFoundError: If the segment of `before` no longer exists,
+                e.g. because the log was compacted.
+        """
+        segments = self.segments()
+        if before is not None and self.segment_path(before[0]) not in segments:
+            raise FileNotFoundError(self.segment_path(before[0]))
+
+        for path in reversed(segments):
+            segment_index = self.segment_index(path)
+            end = None
+            if before is not None:
+                if segment_index > before[0]:
+                    continue
+                if segment_index == before[0]:
+                    end = before[1]
+
+            for offset, line in self._iter_lines_reverse(path, end=end):
+                record = self.codec.decode(line)
+                if record is None:
+                    logger.warning(f"Corrupted record in segment: `{path}`")
+                    continue
+                yield (segment_index, offset), record
+
+    def iter_records_reverse(self, before: Optional[Position] = None) -> Iterator[dict]:
+        """Iterate over the records of the log newest first, reading backwards."""
+        for _, record in self.iter_positioned_reverse(before):
+            yield record
+
+    def read_last(self) -> Optional[dict]:
+        """Return the newest record of the log without reading the whole log."""
+        return next(self.iter_records_reverse(), None)
+
+    @staticmethod
+    def fsync(paths: Iterable[Path]) -> None:
+        """Flush the given segments to stable storage."""
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def iter_positioned(
+        self,
+        start: Optional[Position] = None,
+    ) -> Iterator[tuple[Position, dict]]:
+        """Iterate over the records of the log and their positions oldest
+        first, starting at `start` (included) or the head of the log."""
+        for path in self.segments():
+            segment_index = self.segment_index(path)
+            offset = 0
+            if start is not None:
+                if segment_index < start[0]:
+                    continue
+                if segment_index == start[0]:
+                    offset = start[1]
+
+            with open(path, "rb") as segment_file:
+                segment_file.seek(offset)
+                for line in segment_file:
+                    if not line.endswith(b"\n"):
+                        # A torn write at the tail of the log, ignore it
+                        logger.warning(
+                            f"Incomplete trailing record in segment: `{path}`")
+                        break
+
+                    record = self.codec.decode(line)
+                    if record is None:
+                        logger.warning(f"Corrupted record in segment: `{path}`")
+                    else:
+                        yield (segment_index, offset), record
+                    offset += len(line)
+
+    def iter_records(self) -> Iterator[dict]:
+        """Iterate over every record of the log, oldest first."""
+        for _, record in self.iter_positioned():
+            yield record
+
+    def read_at(self, position: Position) -> Optional[dict]:
+        """Read the record stored at a position, None if there is none."""
+        segment_index, offset = position
+        try:
+            with open(self.segment_path(segment_index), "rb") as segment_file:
+                segment_file.seek(offset)
+                line = segment_file.readline()
+        except FileNotFoundError:
+            return None
+
+        if not line.endswith(b"\n"):
+            return None
+        return self.codec.decode(line)
+
+    def delete(self) -> int:
+        """Delete every segment of the log, returning the number of files removed."""
+        removed = 0
+        for path in self.segments():
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
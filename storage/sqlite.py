@@ -0,0 +1,890 @@
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    Checkpoint,
+    CheckpointMetadata,
+    ChannelVersions,
+    WRITES_IDX_MAP,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langchain_core.runnables import RunnableConfig
+from typing import Callable, Iterator, AsyncIterator, Any, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+import asyncio
+import json
+import sqlite3
+import time
+
+from pathlib import Path
+from loguru import logger
+
+from .retention import RetentionPolicy
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS checkpoints_thread_ns_id
+    ON checkpoints (thread_id, checkpoint_ns, checkpoint_id);
+CREATE INDEX IF NOT EXISTS checkpoints_thread_seq
+    ON checkpoints (thread_id, seq);
+CREATE INDEX IF NOT EXISTS checkpoints_thread_ns_seq
+    ON checkpoints (thread_id, checkpoint_ns, seq);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    checkpoint_id TEXT,
+    updated_at REAL NOT NULL,
+    compacted_at REAL,
+    session TEXT
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at
+    ON threads (updated_at, thread_id);
+"""
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """Checkpoint saver backed by a single SQLite database in WAL mode.
+
+    Mirrors the behaviour of `LocalCheckpointSaver`: `get_tuple` returns the
+    newest checkpoint of the thread and `list` yields checkpoints newest first,
+    with `filter`, `before` and `limit` evaluated in SQL. Checkpoints are indexed by
+    `(thread_id, checkpoint_ns, checkpoint_id)`.
+
+    Primitive channel values are stored inline in the checkpoint row, other
+    values are serialized with `self.serde` into the `blobs` table once per
+    channel version. Pending writes go to the `writes` table in one
+    transaction per task; with `synchronous=NORMAL` in WAL mode those commits
+    are not fsynced individually. WAL mode lets several uvicorn workers share
+    one database file. The `threads` table holds the last checkpoint id,
+    update and compaction time of every thread for `list_threads`, and the
+    fields returned by `session_fields` for its checkpoints, merged as a
+    JSON object.
+
+    Async methods run on a dedicated, bounded I/O thread pool, which also
+    bounds the number of per-thread connections; call `close` to shut it down.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float = 30.0,
+        io_workers: int = 8,
+        session_fields: Callable[[str, Checkpoint, CheckpointMetadata], dict[str, Any]] | None = None,
+    ):
+        super().__init__()
+        self.db_path = db_path
+        self.timeout = timeout
+        self.session_fields = session_fields
+        self._executor = ThreadPoolExecutor(
+            max_workers=io_workers, thread_name_prefix="checkpoint-io")
+
+        if not self.db_path:
+            raise ValueError("db_path must be provided")
+
+        # Check if the database folder exists, if not create it
+        db_folder = Path(self.db_path).parent
+        if not db_folder.exists():
+            logger.info(
+                f"Database folder does not exist. Creating: `{db_folder}`")
+            db_folder.mkdir(parents=True, exist_ok=True)
+
+        self._local = local()
+        with self._connection() as conn:
+            has_threads = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'threads'"
+            ).fetchone()
+            conn.executescript(SCHEMA)
+            if not has_threads:
+                # Databases created before the threads table are indexed once
+                conn.execute(
+                    "INSERT OR IGNORE INTO threads (thread_id, checkpoint_id, updated_at) "
+                    "SELECT thread_id, checkpoint_id, ? FROM checkpoints "
+                    "WHERE seq IN (SELECT MAX(seq) FROM checkpoints GROUP BY thread_id)",
+                    (time.time(),)
+                )
+            thread_columns = [row[1] for row in conn.execute("PRAGMA table_info(threads)")]
+            if "session" not in thread_columns:
+                conn.execute("ALTER TABLE threads ADD COLUMN session TEXT")
+
+        logger.info(f"Using SQLite database: `{self.db_path}`")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _dump_blobs(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        values: dict[str, Any],
+        versions: ChannelVersions,
+    ) -> list[tuple]:
+        rows = []
+        for channel, version in versions.items():
+            if channel not in values:
+                continue
+            value_type, blob = self.serde.dumps_typed(values[channel])
+            rows.append(
+                (thread_id, checkpoint_ns, channel, str(version), value_type, blob))
+        return rows
+
+    def _load_blobs(
+        self,
+        conn: sqlite3.Connection,
+        thread_id: str,
+        checkpoint_ns: str,
+        channel_versions: ChannelVersions,
+    ) -> dict[str, Any]:
+        values = {}
+        for channel, version in channel_versions.items():
+            row = conn.execute(
+                "SELECT type, blob FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(
+        self,
+        conn: sqlite3.Connection,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+    ) -> list[tuple[str, str, Any]]:
+        rows = conn.execute(
+            "SELECT task_path, task_id, idx, channel, type, blob FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        rows.sort(key=lambda row: writes_sort_key(*row[:3]))
+
+        return [
+            (task_id, channel, self.serde.loads_typed((value_type, blob)))
+            for _, task_id, _, channel, value_type, blob in rows
+        ]
+
+    def _row_to_tuple(
+        self,
+        conn: sqlite3.Connection,
+        config: RunnableConfig,
+        row: tuple,
+    ) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_json, metadata_json = row
+        checkpoint = json.loads(checkpoint_json)
+        blob_versions = {
+            channel: version
+            for channel, version in checkpoint.get("channel_versions", {}).items()
+            if channel not in checkpoint["channel_values"]
+        }
+        checkpoint["channel_values"].update(
+            self._load_blobs(conn, thread_id, checkpoint_ns, blob_versions))
+
+        return CheckpointTuple(
+            config=config,
+            checkpoint=checkpoint,
+            metadata=json.loads(metadata_json),
+            pending_writes=self._load_writes(
+                conn, thread_id, checkpoint_ns, checkpoint["id"])
+        )
+
+    def _put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions | None,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") or ""
+
+        copy = checkpoint.copy()
+        copy["channel_values"] = copy["channel_values"].copy()
+
+        # inline primitive values in checkpoint table
+        # others are stored in blobs table
+        blob_values = {}
+        for k, v in checkpoint["channel_values"].items():
+            if v is None or isinstance(v, (str, int, float, bool)):
+                pass
+            else:
+                blob_values[k] = copy["channel_values"].pop(k)
+
+        versions = new_versions or checkpoint.get("channel_versions", {})
+        blob_rows = self._dump_blobs(
+            thread_id, checkpoint_ns, blob_values, versions)
+
+        # `metadata` of the run config (e.g. the user id) is stored as well
+        metadata = get_checkpoint_metadata(config, metadata)
+        session = {}
+        if self.session_fields is not None:
+            session = self.session_fields(checkpoint_ns, checkpoint, metadata)
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO blobs "
+                "(thread_id, checkpoint_ns, channel, version, type, blob) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                blob_rows
+            )
+            conn.execute(
+                "INSERT INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id) "
+                "DO UPDATE SET checkpoint = excluded.checkpoint, metadata = excluded.metadata",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_checkpoint_id,
+                    json.dumps(copy, ensure_ascii=False),
+                    json.dumps(metadata, ensure_ascii=False),
+                )
+            )
+            conn.execute(
+                "INSERT INTO threads (thread_id, checkpoint_id, updated_at, session) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET "
+                "checkpoint_id = excluded.checkpoint_id, updated_at = excluded.updated_at, "
+                "session = json_patch(COALESCE(threads.session, '{}'), excluded.session)",
+                (thread_id, checkpoint["id"], time.time(), json.dumps(session, ensure_ascii=False))
+            )
+
+        logger.info(
+            f"Checkpoint stored successfully for thread_id {thread_id}.")
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_id": checkpoint["id"],
+                "checkpoint_ns": checkpoint_ns
+            }
+        }
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        return self._put(config, checkpoint, metadata, new_versions)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        """Asynchronously store a checkpoint with its metadata.
+
+        Args:
+            config: Configuration of the checkpoint.
+            checkpoint: The checkpoint to store.
+            metadata: Metadata of the checkpoint.
+            new_versions: Optional channel versions.
+
+        Returns:
+            RunnableConfig: Updated configuration.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._put, config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store intermediate writes linked to a checkpoint.
+
+        Args:
+            config: Configuration of the related checkpoint.
+            writes: List of writes to store.
+            task_id: Identifier for the task creating the writes.
+            task_path: Path of the task creating the writes.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") or ""
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id, task_path,
+                WRITES_IDX_MAP.get(channel, idx), channel, value_type, blob
+            ))
+
+        # Special writes (error, interrupt, ...) replace earlier ones,
+        # regular writes are kept the first time a task stores them
+        conn = self._connection()
+        with conn:
+            for conflict, conflict_rows in (
+                ("REPLACE", [row for row in rows if row[5] < 0]),
+                ("IGNORE", [row for row in rows if row[5] >= 0]),
+            ):
+                conn.executemany(
+                    f"INSERT OR {conflict} INTO writes "
+                    "(thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, blob) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    conflict_rows
+                )
+            conn.execute(
+                "UPDATE threads SET updated_at = ? WHERE thread_id = ?",
+                (time.time(), thread_id)
+            )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Asynchronously store intermediate writes linked to a checkpoint.
+
+        Args:
+            config: Configuration of the related checkpoint.
+            writes: List of writes to store.
+            task_id: Identifier for the task creating the writes.
+            task_path: Path of the task creating the writes.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.put_writes, config, writes, task_id, task_path)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Fetch the checkpoint `checkpoint_id` of the config's namespace, or
+        the newest one of that namespace without an id, through the
+        `(thread_id, checkpoint_ns, ...)` indexes. The tuple holds the
+        stored config and parent config of the checkpoint."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") or ""
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+
+        if checkpoint_id is None:
+            checkpoint_tuple = self.get_latest(thread_id, checkpoint_ns)
+        else:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint, metadata, "
+                "checkpoint_id, parent_checkpoint_id FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchone()
+            checkpoint_tuple = (
+                self._row_to_config_tuple(conn, thread_id, row) if row is not None else None)
+
+        if checkpoint_tuple is None:
+            logger.info(f"No checkpoints found for thread: `{thread_id}`")
+        return checkpoint_tuple
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Asynchronously fetch a checkpoint tuple using the given configuration.
+
+        Args:
+            config: Configuration specifying which checkpoint to retrieve.
+
+        Returns:
+            Optional[CheckpointTuple]: The requested checkpoint tuple, or None if not found.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.get_tuple, config)
+
+    def list_threads(
+        self,
+        match: Callable[[dict[str, Any]], bool] | None = None,
+        before: tuple[float, str | None] | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return `thread_id`, `checkpoint_id` (last checkpoint), `updated_at`
+        and `compacted_at` of the stored threads, plus their latest
+        `session_fields`, most recently updated first (ties ordered by thread
+        id, descending).
+
+        Only the entries `match` accepts and, with a `before` cursor
+        `(updated_at, thread_id)`, those older than it are returned (without
+        a thread id, those updated before `updated_at`). The rows are read in
+        order through the `threads_updated_at` index and the scan stops once
+        `limit` entries were accepted.
+        """
+        entries = []
+        if limit is not None and limit <= 0:
+            return entries
+
+        query = ("SELECT thread_id, checkpoint_id, updated_at, compacted_at, session "
+                 "FROM threads")
+        params = []
+        if before is not None and before[1] is None:
+            query += " WHERE updated_at < ?"
+            params.append(before[0])
+        elif before is not None:
+            query += " WHERE (updated_at, thread_id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY updated_at DESC, thread_id DESC"
+
+        for thread_id, checkpoint_id, updated_at, compacted_at, session in (
+                self._connection().execute(query, params)):
+            entry = {
+                **json.loads(session or "{}"),
+                "thread_id": thread_id,
+                "checkpoint_id": checkpoint_id,
+                "updated_at": updated_at,
+                "compacted_at": compacted_at,
+            }
+            if match is not None and not match(entry):
+                continue
+            entries.append(entry)
+            if limit is not None and len(entries) >= limit:
+                break
+        return entries
+
+    async def alist_threads(
+        self,
+        match: Callable[[dict[str, Any]], bool] | None = None,
+        before: tuple[float, str | None] | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Asynchronously return the entries of the stored threads.
+
+        Args:
+            match: Returns whether an entry is listed, all are by default.
+            before: Only list the entries older than this
+                `(updated_at, thread_id)` cursor.
+            limit: Maximum number of entries to return.
+
+        Returns:
+            list[dict[str, Any]]: The entries, most recently updated first.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.list_threads, match, before, limit)
+
+    def compact_thread(self, thread_id: str, policy: RetentionPolicy) -> int:
+        """Delete the checkpoints of a thread the retention policy does not
+        keep, with their writes and the blobs no kept checkpoint references.
+
+        Runs in one transaction, so WAL readers keep reading the previous
+        state until it commits.
+
+        Returns:
+            int: The number of bytes of row data deleted.
+        """
+        conn = self._connection()
+        with conn:
+            rows = conn.execute(
+                "SELECT seq, checkpoint_ns, checkpoint_id, json_extract(checkpoint, '$.ts'), "
+                "length(checkpoint) + length(metadata) FROM checkpoints "
+                "WHERE thread_id = ? ORDER BY seq",
+                (thread_id,)
+            ).fetchall()
+            kept = policy.select(
+                (checkpoint_ns, checkpoint_id, ts)
+                for _, checkpoint_ns, checkpoint_id, ts, _ in rows
+            )
+            dropped = [
+                (seq, size) for seq, checkpoint_ns, checkpoint_id, _, size in rows
+                if (checkpoint_ns, checkpoint_id) not in kept
+            ]
+            if not dropped:
+                return 0
+
+            conn.executemany(
+                "DELETE FROM checkpoints WHERE seq = ?", [(seq,) for seq, _ in dropped])
+            reclaimed = sum(size for _, size in dropped)
+
+            reclaimed += conn.execute(
+                "SELECT COALESCE(SUM(length(blob)), 0) FROM writes w "
+                "WHERE thread_id = ? AND NOT EXISTS (SELECT 1 FROM checkpoints c "
+                "WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns "
+                "AND c.checkpoint_id = w.checkpoint_id)",
+                (thread_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND NOT EXISTS ("
+                "SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+                "AND c.checkpoint_ns = writes.checkpoint_ns "
+                "AND c.checkpoint_id = writes.checkpoint_id)",
+                (thread_id,)
+            )
+
+            # Blobs are keyed by channel version, keep those a checkpoint still points at
+            referenced = set()
+            for checkpoint_ns, checkpoint_json in conn.execute(
+                "SELECT checkpoint_ns, checkpoint FROM checkpoints WHERE thread_id = ?",
+                (thread_id,)
+            ):
+                for channel, version in json.loads(checkpoint_json).get(
+                        "channel_versions", {}).items():
+                    referenced.add((checkpoint_ns, channel, str(version)))
+
+            orphans = [
+                (rowid, size) for rowid, checkpoint_ns, channel, version, size in conn.execute(
+                    "SELECT rowid, checkpoint_ns, channel, version, COALESCE(length(blob), 0) "
+                    "FROM blobs WHERE thread_id = ?",
+                    (thread_id,)
+                ).fetchall()
+                if (checkpoint_ns, channel, version) not in referenced
+            ]
+            conn.executemany(
+                "DELETE FROM blobs WHERE rowid = ?", [(rowid,) for rowid, _ in orphans])
+            reclaimed += sum(size for _, size in orphans)
+
+            conn.execute(
+                "UPDATE threads SET compacted_at = ? WHERE thread_id = ?",
+                (time.time(), thread_id)
+            )
+
+        logger.info(
+            f"Compacted thread `{thread_id}`: dropped {len(dropped)} of {len(rows)} "
+            f"checkpoints, reclaimed {reclaimed} bytes")
+        return reclaimed
+
+    async def acompact_thread(self, thread_id: str, policy: RetentionPolicy) -> int:
+        """Asynchronously drop the checkpoints the retention policy does not keep.
+
+        Args:
+            thread_id: The ID of the thread to compact.
+            policy: The retention policy to enforce.
+
+        Returns:
+            int: The number of bytes of row data deleted.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.compact_thread, thread_id, policy)
+
+    def get_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None = None,
+    ) -> CheckpointTuple | None:
+        """Return the newest checkpoint of a thread, or of one of its namespaces.
+
+        A single lookup in the `(thread_id, checkpoint_ns, seq)` index.
+
+        Args:
+            thread_id: The ID of the thread.
+            checkpoint_ns: The exact namespace ("" for the root graph), None
+                for the newest checkpoint of any namespace.
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint tuple, or None if there is none.
+        """
+        where = "thread_id = ?"
+        params = [thread_id]
+        if checkpoint_ns is not None:
+            where += " AND checkpoint_ns = ?"
+            params.append(checkpoint_ns)
+
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint, metadata, "
+            "checkpoint_id, parent_checkpoint_id FROM checkpoints "
+            f"WHERE {where} ORDER BY seq DESC LIMIT 1",
+            params
+        ).fetchone()
+        if row is None:
+            return None
+        return self._row_to_config_tuple(conn, thread_id, row)
+
+    async def aget_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str | None = None,
+    ) -> CheckpointTuple | None:
+        """Asynchronously return the newest checkpoint of a thread or namespace.
+
+        Args:
+            thread_id: The ID of the thread.
+            checkpoint_ns: The exact namespace ("" for the root graph), None
+                for the newest checkpoint of any namespace.
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint tuple, or None if there is none.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.get_latest, thread_id, checkpoint_ns)
+
+    def get_list_page(
+        self,
+        config: RunnableConfig,
+        channel: str,
+        start: int = 0,
+        end: int | None = None,
+    ) -> tuple[RunnableConfig, int, list] | None:
+        """Return the items `[start:end]` of a list channel of the checkpoint
+        `get_tuple` returns for the config, with the checkpoint's config and
+        the length of the list. A channel value is a single blob here, so
+        the whole list is decoded to slice it."""
+        checkpoint_tuple = self.get_tuple(config)
+        if checkpoint_tuple is None:
+            return None
+        items = checkpoint_tuple.checkpoint["channel_values"].get(channel) or []
+        return checkpoint_tuple.config, len(items), list(items[start:end])
+
+    async def aget_list_page(
+        self,
+        config: RunnableConfig,
+        channel: str,
+        start: int = 0,
+        end: int | None = None,
+    ) -> tuple[RunnableConfig, int, list] | None:
+        """Asynchronously return the items `[start:end]` of a list channel of a checkpoint.
+
+        Args:
+            config: Configuration specifying which checkpoint to read.
+            channel: The list channel, e.g. "messages".
+            start: Index of the first item to return.
+            end: Index after the last item to return, None for the end of the list.
+
+        Returns:
+            Optional[tuple[RunnableConfig, int, list]]: The config of the
+            checkpoint, the length of the list and the requested items, or
+            None if the checkpoint is not found.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.get_list_page, config, channel, start, end)
+
+    def _row_to_config_tuple(
+        self,
+        conn: sqlite3.Connection,
+        thread_id: str,
+        row: tuple,
+    ) -> CheckpointTuple:
+        """Build the tuple of a checkpoint row with its own and its parent's config."""
+        *row, checkpoint_id, parent_checkpoint_id = row
+        configurable = {"thread_id": thread_id, "checkpoint_ns": row[1]}
+        checkpoint_tuple = self._row_to_tuple(conn, {
+            "configurable": {**configurable, "checkpoint_id": checkpoint_id}
+        }, row)
+        if parent_checkpoint_id:
+            checkpoint_tuple = checkpoint_tuple._replace(parent_config={
+                "configurable": {**configurable, "checkpoint_id": parent_checkpoint_id}
+            })
+        return checkpoint_tuple
+
+    @staticmethod
+    def _filter_clause(filter: dict[str, Any] | None) -> tuple[str, list]:
+        """Translate a `list` filter into SQL with the same semantics as
+        `LocalCheckpointSaver`: keys are looked up in the metadata first, then
+        in the checkpoint, then in the checkpoint's channel values."""
+        clauses = []
+        params = []
+        for key, value in (filter or {}).items():
+            if key == "checkpoint_id":
+                clauses.append("checkpoint_id = ?")
+                params.append(value)
+            elif key == "checkpoint_ns":
+                # Stored namespaces match when contained in the requested one
+                clauses.append(
+                    "checkpoint_ns != '' AND instr(?, checkpoint_ns) > 0")
+                params.append(value)
+            else:
+                path = f'$."{key}"'
+                channel_path = f'$.channel_values."{key}"'
+                if isinstance(value, (dict, list)):
+                    expected = "json(?)"
+                    value = json.dumps(value)
+                else:
+                    expected = "?"
+                clauses.append(
+                    "(CASE "
+                    "WHEN json_type(metadata, ?) IS NOT NULL "
+                    f"THEN json_extract(metadata, ?) = {expected} "
+                    "WHEN json_type(checkpoint, ?) IS NOT NULL "
+                    f"THEN json_extract(checkpoint, ?) = {expected} "
+                    f"ELSE json_extract(checkpoint, ?) = {expected} "
+                    "END)"
+                )
+                params.extend([
+                    path, path, value,
+                    path, path, value,
+                    channel_path, value,
+                ])
+
+        return " AND ".join(f"({clause})" for clause in clauses), params
+
+    def _list(
+        self,
+        config: RunnableConfig | None,
+        filter: dict[str, Any] | None,
+        before: RunnableConfig | None,
+        limit: int | None,
+    ) -> list[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+
+        where = ["thread_id = ?"]
+        params: list[Any] = [thread_id]
+
+        filter_clause, filter_params = self._filter_clause(filter)
+        if filter_clause:
+            where.append(filter_clause)
+            params.extend(filter_params)
+
+        before_id = (before or {}).get("configurable", {}).get("checkpoint_id")
+        if before_id:
+            where.append(
+                "seq < (SELECT seq FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_id = ? ORDER BY seq DESC LIMIT 1)")
+            params.extend([thread_id, before_id])
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint, metadata, "
+            "checkpoint_id, parent_checkpoint_id FROM checkpoints "
+            f"WHERE {' AND '.join(where)} ORDER BY seq DESC"
+        )
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        conn = self._connection()
+        rows = conn.execute(query, params).fetchall()
+
+        return [self._row_to_config_tuple(conn, thread_id, row) for row in rows]
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        yield from self._list(config, filter, before, limit)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Asynchronously list checkpoint tuples using the given configuration.
+
+        Args:
+            config: Configuration specifying which checkpoints to list.
+            filter: Optional filter criteria.
+            before: Optional configuration to list checkpoints before.
+            limit: Optional limit on number of checkpoints to return.
+
+        Returns:
+            AsyncIterator[CheckpointTuple]: An async iterator of checkpoint tuples, newest first.
+        """
+        checkpoint_tuples = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._list, config, filter, before, limit)
+
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    def delete_thread(
+        self,
+        thread_id: str,
+    ) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM blobs WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+        logger.info(f"Deleted checkpoints of thread: `{thread_id}`")
+
+    def expire_thread(self, thread_id: str, updated_before: float) -> bool:
+        """Delete a thread if it was last written before `updated_before`.
+
+        The check and the deletion run in one transaction, so a thread
+        written since it was found expired is kept.
+
+        Returns:
+            bool: Whether the thread was deleted.
+        """
+        conn = self._connection()
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM threads WHERE thread_id = ? AND updated_at < ?",
+                (thread_id, updated_before)
+            ).rowcount
+            if expired:
+                conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                conn.execute("DELETE FROM blobs WHERE thread_id = ?", (thread_id,))
+                conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        if expired:
+            logger.info(f"Deleted expired thread: `{thread_id}`")
+        return bool(expired)
+
+    async def adelete_thread(
+        self,
+        thread_id: str,
+    ) -> None:
+        """Asynchronously delete a thread and its associated checkpoint data.
+
+        Args:
+            thread_id: The ID of the thread to delete.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.delete_thread, thread_id)
+
+    def delete_all(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM checkpoints")
+            conn.execute("DELETE FROM blobs")
+            conn.execute("DELETE FROM writes")
+            conn.execute("DELETE FROM threads")
+        logger.info(f"Deleted all checkpoints from: `{self.db_path}`")
+
+    async def adelete_all(self) -> None:
+        """Asynchronously delete all threads and their associated checkpoint data."""
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.delete_all)
+
+    def close(self) -> None:
+        """Wait for the queued I/O and shut down the I/O thread pool."""
+        self._executor.shutdown(wait=True)
+        logger.info("Checkpoint I/O pool shut down")
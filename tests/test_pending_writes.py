@@ -0,0 +1,34 @@
+from langgraph.checkpoint.base import empty_checkpoint
+
+from storage import LocalCheckpointSaver
+
+
+def _checkpoint(value: int) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"n": value}
+    return checkpoint
+
+
+def test_writes_appended_before_their_checkpoint(tmp_path):
+    """LangGraph stores a checkpoint and its writes from separate tasks, so
+    the writes record can reach the log first."""
+    saver = LocalCheckpointSaver(str(tmp_path), snapshot_interval=4)
+    config = {"configurable": {"thread_id": "t", "checkpoint_ns": ""}}
+    first_config = saver.put(config, _checkpoint(1), {"step": 1}, {"n": 1})
+
+    second = _checkpoint(2)
+    second_config = {"configurable": {
+        "thread_id": "t", "checkpoint_ns": "", "checkpoint_id": second["id"]}}
+    saver.put_writes(second_config, [("n", 5)], "task-a")
+    saver.put_writes(second_config, [("n", 6)], "task-b")
+    saver.put(first_config, second, {"step": 2}, {"n": 2})
+
+    expected = [("task-a", "n", 5), ("task-b", "n", 6)]
+    assert saver.get_tuple(config).pending_writes == expected
+    assert saver.get_latest("t", "").pending_writes == expected
+    assert next(saver.list(config, limit=1)).pending_writes == expected
+    assert next(saver.list(config)).pending_writes == expected
+
+    saver.rewrite_thread("t", verify=True)
+    assert saver.get_tuple(config).pending_writes == expected
+    saver.close()
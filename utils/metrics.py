@@ -0,0 +1,56 @@
+from threading import Lock
+from typing import Any, Callable
+
+
+class Metrics:
+    """In-process registry of counters, timings and metric sources.
+
+    Counters and timings are recorded by the code that produces them, while
+    components keeping their own statistics (e.g. the checkpoint compactor)
+    are registered as sources and read when the metrics are collected.
+    """
+
+    def __init__(self):
+        self._counters: dict[str, float] = {}
+        self._timings: dict[str, dict[str, float]] = {}
+        self._sources: dict[str, Callable[[], dict[str, Any]]] = {}
+        self._lock = Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> float:
+        """Return the current value of a counter, 0 if it was never incremented."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record the duration of one occurrence of an operation."""
+        with self._lock:
+            timing = self._timings.setdefault(
+                name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            timing["count"] += 1
+            timing["total_seconds"] += seconds
+            timing["max_seconds"] = max(timing["max_seconds"], seconds)
+            timing["last_seconds"] = seconds
+
+    def register(self, name: str, source: Callable[[], dict[str, Any]]) -> None:
+        """Register a callable returning the statistics of a component."""
+        with self._lock:
+            self._sources[name] = source
+
+    def collect(self) -> dict[str, Any]:
+        """Return a snapshot of every metric."""
+        with self._lock:
+            snapshot = {
+                "counters": dict(self._counters),
+                "timings": {name: dict(timing) for name, timing in self._timings.items()},
+            }
+            sources = dict(self._sources)
+        for name, source in sources.items():
+            snapshot[name] = source()
+        return snapshot
+
+
+metrics = Metrics()
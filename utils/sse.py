@@ -0,0 +1,285 @@
+import asyncio
+import json
+import zlib
+from json.encoder import encode_basestring_ascii
+from typing import Any, AsyncIterator, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional JSON backend of `SSEEncoder`
+    orjson = None
+
+
+# Versions of the `/astream` event protocol, chosen per request
+STREAM_PROTOCOL_VERSIONS = (1, 2)
+
+# Version 2 sends a checksum frame every this many `message` events
+CHECKSUM_INTERVAL = 64
+
+# Events whose content is merged by `coalesce_events`, any other event
+# (status, plan, node change, completion, ...) is passed on at once
+COALESCED_EVENT_TYPES = ("message", "thinking")
+
+# Fields of each event type that keep their value across many events of a
+# response, encoded once per value by `SSEEncoder`
+EVENT_SCHEMAS = {
+    "status": ("type", "node"),
+    "plan": ("type", "node"),
+    "node_change": ("type", "node", "previous_node"),
+    "message": ("type", "node", "previous_node"),
+    "thinking": ("type", "node", "previous_node"),
+    "checksum": ("type",),
+    "complete": ("type", "content"),
+}
+
+JSON_BACKENDS = ("json", "orjson")
+
+
+def _json_dumps(value: Any) -> str:
+    # The streamed content and sequence numbers skip the encoder set up of `json.dumps`
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    if type(value) is int:
+        return str(value)
+    return json.dumps(value)
+
+
+def _orjson_dumps(value: Any) -> str:
+    return orjson.dumps(value).decode("utf-8")
+
+
+class SSEEncoder:
+    """Encode events as SSE `data:` frames, like `convert_to_sse_format`.
+
+    The frame of an event is split along its fields: the keys and the
+    fields listed in `EVENT_SCHEMAS` for its type are encoded once into a
+    template, cached per event layout and constant values (events with
+    non-string constants are encoded as a whole), so only the other fields
+    (the streamed `content`, `seq`, ...) are JSON-encoded per event and
+    concatenated with the template. With the `json` backend the
+    frames are byte for byte those of `convert_to_sse_format`. The `orjson`
+    backend, when the package is installed, leaves non-ASCII characters
+    unescaped and encodes long values faster (e.g. the `full_response` of
+    protocol version 1), but short ones such as single tokens slower; see
+    `python -m benchmarks.sse_encoding`.
+    """
+
+    def __init__(self, backend: str = "json", max_templates: int = 1024):
+        if backend not in JSON_BACKENDS:
+            raise ValueError(f"Unsupported JSON backend: `{backend}`")
+        if backend == "orjson" and orjson is None:
+            raise ValueError("The `orjson` JSON backend is not installed")
+        self.backend = backend
+        self.max_templates = max_templates
+        self._dumps: Callable[[Any], str] = _orjson_dumps if backend == "orjson" else _json_dumps
+        self._templates: dict[tuple, Callable[[dict[str, Any]], str]] = {}
+
+    def _template(
+        self,
+        payload: dict[str, Any],
+        constant: tuple[str, ...],
+    ) -> Callable[[dict[str, Any]], str]:
+        """Build the function encoding the events laid out like `payload`."""
+        literals, variables = [], []
+        literal = "data: {"
+        for position, (key, value) in enumerate(payload.items()):
+            literal += (", " if position else "") + json.dumps(key) + ": "
+            if key in constant:
+                literal += json.dumps(value)
+            else:
+                literals.append(literal)
+                variables.append(key)
+                literal = ""
+        literals.append(literal + "}\n\n")
+
+        dumps = self._dumps
+        # One or two variable fields (content, seq) in nearly every event
+        if len(variables) == 1:
+            (head, tail), (name,) = literals, variables
+            return lambda event: head + dumps(event[name]) + tail
+        if len(variables) == 2:
+            (head, middle, tail), (first, second) = literals, variables
+            return lambda event: (
+                head + dumps(event[first]) + middle + dumps(event[second]) + tail)
+
+        def encode(event: dict[str, Any]) -> str:
+            parts = [literals[0]]
+            for name, literal in zip(variables, literals[1:]):
+                parts.append(dumps(event[name]))
+                parts.append(literal)
+            return "".join(parts)
+        return encode
+
+    def encode(self, payload: dict[str, Any]) -> str:
+        """Return the SSE frame of an event."""
+        constant = EVENT_SCHEMAS.get(payload.get("type"), ())
+        try:
+            key = (len(payload), *payload, *map(payload.get, constant))
+            template = self._templates.get(key)
+        except TypeError:
+            # An unhashable constant field, encode the event as a whole
+            return f"data: {self._dumps(payload)}\n\n"
+        if template is None:
+            # Only string keys and constants are cached: True, 1 and 1.0 are
+            # equal keys but not the same JSON
+            if any(type(value) not in (str, type(None)) for value in key[1:]):
+                return f"data: {self._dumps(payload)}\n\n"
+            if len(self._templates) >= self.max_templates:
+                self._templates.clear()
+            template = self._templates[key] = self._template(payload, constant)
+        return template(payload)
+
+
+sse_encoder = SSEEncoder()
+
+
+class ResponseStream:
+    """Encode the events of one `/astream` response for a protocol version.
+
+    Version 1 repeats the whole answer so far as `full_response` in every
+    `message` event and in the `complete` event, so a stream costs
+    quadratic bandwidth and encoding time in the length of the answer.
+
+    Version 2 only sends each `message` delta, numbers every event with an
+    increasing `seq`, and after every `checksum_interval` messages (and in
+    the `complete` event) reports the `length` (in characters) and `crc32`
+    (of the UTF-8 bytes) of the answer assembled so far, so a client can
+    detect a lost or reordered delta and fetch the conversation again.
+    """
+
+    def __init__(
+        self,
+        version: int = 1,
+        checksum_interval: int = CHECKSUM_INTERVAL,
+        encoder: Optional[SSEEncoder] = None,
+    ):
+        if version not in STREAM_PROTOCOL_VERSIONS:
+            raise ValueError(f"Unsupported stream protocol version: `{version}`")
+        self.version = version
+        self.encoder = encoder or sse_encoder
+        self.checksum_interval = checksum_interval
+        self.full_response = ""
+        self.seq = 0
+        self.length = 0
+        self.crc32 = 0
+        self._messages = 0
+
+    def _checksum(self) -> dict[str, Any]:
+        return {"length": self.length, "crc32": self.crc32}
+
+    def _encode(self, payload: dict[str, Any]) -> str:
+        if self.version >= 2:
+            self.seq += 1
+            payload["seq"] = self.seq
+        return self.encoder.encode(payload)
+
+    def event(self, payload: dict[str, Any]) -> str:
+        """Return the SSE frame(s) of an event.
+
+        Args:
+            payload: The event, without `full_response`.
+
+        Returns:
+            str: The encoded frames, ready to be written to the response.
+        """
+        if payload["type"] == "message":
+            return self._message(payload)
+        if payload["type"] == "complete":
+            if self.version == 1:
+                return self._encode({**payload, "full_response": self.full_response})
+            return self._encode({**payload, **self._checksum()})
+        return self._encode(dict(payload))
+
+    def _message(self, payload: dict[str, Any]) -> str:
+        content = payload["content"]
+        if self.version == 1:
+            self.full_response += content
+            return self._encode({**payload, "full_response": self.full_response})
+
+        encoded = content.encode("utf-8")
+        self.length += len(content)
+        self.crc32 = zlib.crc32(encoded, self.crc32)
+        self._messages += 1
+        frames = self._encode(dict(payload))
+        if self._messages % self.checksum_interval == 0:
+            frames += self._encode({"type": "checksum", **self._checksum()})
+        return frames
+
+
+def _event_key(event: dict[str, Any]) -> tuple:
+    return event["type"], event.get("node"), event.get("previous_node")
+
+
+async def coalesce_events(
+    events: AsyncIterator[dict[str, Any]],
+    window: float,
+    max_bytes: int = 0,
+) -> AsyncIterator[dict[str, Any]]:
+    """Merge consecutive `message`/`thinking` events of the same node into one.
+
+    The content of a run of such events is held back for at most `window`
+    seconds after its first event, or until it reaches `max_bytes` bytes (0
+    for no limit), and sent as a single event. Any other event is sent as
+    soon as it is produced, right after the content held back before it.
+
+    Args:
+        events: The events to merge, e.g. a token per event.
+        window: Seconds an event can be held back, 0 disables merging.
+        max_bytes: Size of the merged content sent without waiting.
+    """
+    if window <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    pending, contents, size, deadline = None, [], 0, 0.0
+    next_event = None
+
+    def flush() -> dict[str, Any]:
+        nonlocal pending
+        event, pending = {**pending, "content": "".join(contents)}, None
+        contents.clear()
+        return event
+
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if pending is None else max(deadline - loop.time(), 0)
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+            if not done:
+                yield flush()
+                continue
+
+            task, next_event = next_event, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                break
+
+            if pending is not None and _event_key(event) == _event_key(pending):
+                contents.append(event["content"])
+                size += len(event["content"].encode("utf-8"))
+            else:
+                if pending is not None:
+                    yield flush()
+                if event["type"] not in COALESCED_EVENT_TYPES:
+                    yield event
+                    continue
+                pending, size = event, len(event["content"].encode("utf-8"))
+                contents.append(event["content"])
+                deadline = loop.time() + window
+
+            if max_bytes and size >= max_bytes:
+                yield flush()
+
+        if pending is not None:
+            yield flush()
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+            await asyncio.wait({next_event})
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
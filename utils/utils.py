@@ -2,6 +2,10 @@ import json
 import re
 from typing import List, Optional
 
+from langchain_core.load import dumpd
+from langchain_core.load.serializable import Serializable
+from pydantic import BaseModel
+
 
 def extract_tag_text(html: str, tag: str, *, first: bool = False, strip_inner_html: bool = False) -> Optional[str] | List[str]:
     """
@@ -31,3 +35,18 @@ def extract_tag_text(html: str, tag: str, *, first: bool = False, strip_inner_ht
 
 def convert_to_sse_format(payload):
     return f"data: {json.dumps(payload)}\n\n"
+
+
+def _json_default(value):
+    """Encode the LangChain objects (messages, ...) found in graph states."""
+    if isinstance(value, Serializable):
+        return dumpd(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def convert_to_ndjson_format(payload):
+    return json.dumps(payload, ensure_ascii=False, default=_json_default) + "\n"